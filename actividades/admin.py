@@ -9,7 +9,7 @@ from .models import (
     ReporteDiarioMaquinaria, ReporteClima, Proyecto,
     MetaPorZona, AvancePorZona, TipoElemento, ProcesoConstructivo, PasoProcesoTipoElemento,
     ElementoConstructivo, AvanceProcesoElemento,
-    ElementoBIM_GUID, Cronograma, Observacion, CronogramaPorZona
+    ElementoBIM_GUID, Cronograma, Observacion, CronogramaPorZona, DiaNoLaborable
 )
 
 # --- PERSONALIZACIÓN GENERAL DEL ADMIN ---
@@ -51,12 +51,17 @@ class CronogramaPorZonaInline(admin.TabularInline):
     extra = 1
     autocomplete_fields = ['zona']
 
+class DiaNoLaborableInline(admin.TabularInline):
+    model = DiaNoLaborable
+    extra = 1
+
 # --- Configuraciones Avanzadas (WBS y Avances) ---
 
 @admin.register(Proyecto)
 class ProyectoAdmin(admin.ModelAdmin):
-    list_display = ('nombre', 'fecha_inicio', 'fecha_fin_estimada')
+    list_display = ('nombre', 'fecha_inicio', 'fecha_fin_estimada', 'dias_descanso')
     search_fields = ('nombre',)
+    inlines = [DiaNoLaborableInline]
 
 @admin.register(Actividad)
 class ActividadAdmin(admin.ModelAdmin):
@@ -66,16 +71,21 @@ class ActividadAdmin(admin.ModelAdmin):
         'padre',
         'nombre',
         'unidad_medida',
-        ('fecha_inicio_programada', 'fecha_fin_programada')
+        ('fecha_inicio_programada', 'fecha_fin_programada'),
+        ('meta_total', 'meta_subarbol'),
+        ('fecha_inicio_subarbol', 'fecha_fin_subarbol'),
     )
-    list_display = ('__str__', 'proyecto', 'partida', 'meta_total')
+    list_display = ('__str__', 'proyecto', 'partida', 'meta_propia', 'meta_subarbol', 'es_hoja')
     list_select_related = ('padre', 'proyecto', 'partida')
-    list_filter = ('proyecto', 'partida')
+    list_filter = ('proyecto', 'partida', 'es_hoja')
     search_fields = ('nombre', 'padre__nombre')
     autocomplete_fields = ['padre']
     list_per_page = 25
     inlines = [MetaPorZonaInline]
-    readonly_fields = ('meta_total',)
+    readonly_fields = ('meta_total', 'meta_subarbol', 'fecha_inicio_subarbol', 'fecha_fin_subarbol')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_totals()
 
 @admin.register(ReportePersonal)
 class ReportePersonalAdmin(admin.ModelAdmin):
@@ -90,6 +100,9 @@ class AvanceDiarioAdmin(admin.ModelAdmin):
     inlines = [AvancePorZonaInline]
     readonly_fields = ('cantidad_total',)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_totals()
+
 @admin.register(ReporteDiarioMaquinaria)
 class ReporteDiarioMaquinariaAdmin(admin.ModelAdmin):
     list_display = ('fecha', 'tipo_maquinaria', 'partida', 'empresa', 'cantidad_total', 'cantidad_activa')
@@ -131,8 +144,8 @@ class ElementoBIM_GUID_Inline(admin.TabularInline):
 
 @admin.register(ElementoConstructivo)
 class ElementoConstructivoAdmin(admin.ModelAdmin):
-    list_display = ('identificador_unico', 'tipo_elemento', 'descripcion')
-    list_filter = ('tipo_elemento',)
+    list_display = ('identificador_unico', 'tipo_elemento', 'descripcion', 'estado_avance')
+    list_filter = ('tipo_elemento', 'estado_avance')
     search_fields = ('identificador_unico', 'descripcion') 
     autocomplete_fields = ['tipo_elemento']
     inlines = [ElementoBIM_GUID_Inline]
@@ -0,0 +1,139 @@
+# actividades/calendario.py
+
+from bisect import bisect_left
+from datetime import date, timedelta
+from django.core.cache import cache
+
+# Por defecto solo se descansa en Domingo (weekday() == 6)
+DIAS_DESCANSO_DEFAULT = (6,)
+
+# Lunes de referencia para los conteos acumulados. Cualquier fecha sirve,
+# solo se usan diferencias entre acumulados.
+_EPOCA_ORDINAL = date(2000, 1, 3).toordinal()
+
+CALENDARIO_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def parsear_dias_descanso(valor):
+    """ Convierte '5,6' en (5, 6). Cadena vacía o None = sin días de descanso semanal. """
+    if not valor:
+        return ()
+    return tuple(sorted({int(dia) for dia in str(valor).split(',') if dia.strip() != ''}))
+
+
+class CalendarioLaboral:
+    """
+    Calendario de días laborables de un proyecto.
+
+    Precalcula los días laborables acumulados de una semana tipo y la lista
+    ordenada de días inhábiles (festivos, paros), de modo que contar los días
+    laborables entre dos fechas es una operación de tiempo constante (más una
+    búsqueda binaria sobre los inhábiles) en lugar de recorrer día por día.
+    """
+
+    def __init__(self, dias_descanso=DIAS_DESCANSO_DEFAULT, dias_inhabiles=()):
+        self.dias_descanso = frozenset(dias_descanso)
+
+        # acumulado_semana[i] = días laborables en los primeros i días de la semana (0 = Lunes)
+        self._acumulado_semana = [0]
+        for dia in range(7):
+            self._acumulado_semana.append(self._acumulado_semana[-1] + (dia not in self.dias_descanso))
+        self.laborables_por_semana = self._acumulado_semana[7]
+
+        # Solo restan los inhábiles que caen en un día que de otro modo sería laborable
+        self._inhabiles = sorted({
+            d.toordinal() for d in dias_inhabiles if d.weekday() not in self.dias_descanso
+        })
+        self._inhabiles_set = frozenset(self._inhabiles)
+
+    def _acumulado(self, ordinal):
+        """ Días laborables en [época, ordinal). Puede ser negativo antes de la época. """
+        semanas, resto = divmod(ordinal - _EPOCA_ORDINAL, 7)
+        return (
+            semanas * self.laborables_por_semana
+            + self._acumulado_semana[resto]
+            - bisect_left(self._inhabiles, ordinal)
+        )
+
+    def es_laborable(self, fecha: date):
+        return fecha.weekday() not in self.dias_descanso and fecha.toordinal() not in self._inhabiles_set
+
+    def dias_laborables(self, fecha_inicio: date, fecha_fin: date):
+        """ Días laborables en el rango cerrado [fecha_inicio, fecha_fin]. """
+        if not fecha_inicio or not fecha_fin or fecha_fin < fecha_inicio:
+            return 0
+        return self._acumulado(fecha_fin.toordinal() + 1) - self._acumulado(fecha_inicio.toordinal())
+
+    def indice_laborable(self, fecha: date):
+        """
+        Número de días laborables transcurridos desde la época hasta 'fecha' (exclusiva).
+        Útil para comparar o restar fechas en "días hábiles" sin volver a contar.
+        """
+        return self._acumulado(fecha.toordinal())
+
+    def sumar_dias_laborables(self, fecha: date, dias: int):
+        """
+        Fecha del 'dias'-ésimo día laborable posterior a 'fecha' (dias <= 0
+        devuelve la misma fecha). Búsqueda binaria sobre los acumulados, sin
+        recorrer día por día. None si el calendario no tiene días laborables
+        o si la fecha caería después de date.max (p. ej. un ritmo casi nulo).
+        """
+        if dias <= 0:
+            return fecha
+        if not self.laborables_por_semana:
+            return None
+        base = self._acumulado(fecha.toordinal() + 1)
+        if self._acumulado(date.max.toordinal() + 1) - base < dias:
+            return None
+        salto = 7 * (dias // self.laborables_por_semana + 1)
+        bajo, alto = fecha.toordinal() + 1, fecha.toordinal() + salto
+        # Los inhábiles pueden empujar la fecha más allá de la estimación
+        while self._acumulado(alto + 1) - base < dias:
+            bajo, alto = alto + 1, alto + salto
+        while bajo < alto:
+            medio = (bajo + alto) // 2
+            if self._acumulado(medio + 1) - base >= dias:
+                alto = medio
+            else:
+                bajo = medio + 1
+        return date.fromordinal(bajo)
+
+    def __repr__(self):
+        return f"CalendarioLaboral(descanso={sorted(self.dias_descanso)}, inhabiles={len(self._inhabiles)})"
+
+
+CALENDARIO_DEFAULT = CalendarioLaboral()
+
+
+def _clave_cache(proyecto_id, version):
+    return f"calendario_laboral:{proyecto_id}:{version}"
+
+
+def obtener_calendario(proyecto_id):
+    """
+    Devuelve el calendario laboral del proyecto, construyéndolo una sola vez
+    y guardándolo en caché. La clave lleva la versión del calendario
+    (VersionDatos, ver signals.py): al cambiar el proyecto o sus días
+    inhábiles todos los procesos del servidor dejan de usar la entrada vieja.
+    """
+    if proyecto_id is None:
+        return CALENDARIO_DEFAULT
+
+    # Importación local para evitar el ciclo models -> calendario -> models
+    from .models import Proyecto, DiaNoLaborable
+    from .versiones import obtener_version, clave_calendario
+
+    version, _ = obtener_version(clave_calendario(proyecto_id))
+    clave = _clave_cache(proyecto_id, version)
+    calendario = cache.get(clave)
+    if calendario is not None:
+        return calendario
+
+    dias_descanso = Proyecto.objects.filter(pk=proyecto_id).values_list('dias_descanso', flat=True).first()
+    if dias_descanso is None:
+        return CALENDARIO_DEFAULT
+
+    inhabiles = DiaNoLaborable.objects.filter(proyecto_id=proyecto_id).values_list('fecha', flat=True)
+    calendario = CalendarioLaboral(parsear_dias_descanso(dias_descanso), inhabiles)
+    cache.set(clave, calendario, CALENDARIO_CACHE_TIMEOUT)
+    return calendario
@@ -0,0 +1,89 @@
+# actividades/captura_avance.py
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+from .models import AvanceDiario, AvancePorZona
+from .evm import marcar_recalculo
+from .versiones import incrementar_version, clave_evm
+
+# Mismas reglas que el campo AvancePorZona.cantidad
+_CAMPO_CANTIDAD = forms.DecimalField(max_digits=12, decimal_places=2, min_value=0)
+
+
+def nombre_celda(actividad_id, zona_id):
+    return f"cantidad_{actividad_id}_{zona_id}"
+
+
+def leer_cuadricula(datos, actividades, zonas):
+    """
+    Convierte las celdas enviadas ('cantidad_<actividad>_<zona>') en
+    {(actividad_id, zona_id): cantidad}. Solo se leen las celdas de las
+    actividades y zonas dadas ({id: nombre}); las vacías no cambian nada.
+    Lanza ValidationError con los errores de todas las celdas juntos.
+    """
+    errores = []
+    cantidades = {}
+    for actividad_id, actividad in actividades.items():
+        for zona_id, zona in zonas.items():
+            valor = (datos.get(nombre_celda(actividad_id, zona_id)) or '').strip()
+            if not valor:
+                continue
+            try:
+                cantidades[(actividad_id, zona_id)] = _CAMPO_CANTIDAD.clean(valor)
+            except ValidationError as e:
+                errores.append(f"{actividad} / {zona}: {' '.join(e.messages)}")
+    if errores:
+        raise ValidationError(errores)
+    return cantidades
+
+
+def guardar_cuadricula(proyecto, fecha, empresa, cantidades, reemplazar_zonas=False):
+    """
+    Guarda de una vez el avance de muchas actividades y zonas para un día y
+    una empresa. En una transacción: crea los AvanceDiario que falten (los
+    existentes se conservan), trae sus IDs y hace upsert de todos los
+    AvancePorZona sobre (avance_diario, zona). Son 3 consultas sin importar
+    el tamaño de la cuadrícula.
+    Con reemplazar_zonas=True además se borran las zonas guardadas de esas
+    actividades (ese día y empresa) que no vienen en 'cantidades'.
+    Devuelve el número de celdas guardadas.
+    """
+    if not cantidades:
+        return 0
+    actividad_ids = sorted({actividad_id for actividad_id, _ in cantidades})
+
+    with transaction.atomic():
+        AvanceDiario.objects.bulk_create(
+            [AvanceDiario(actividad_id=pk, fecha_reporte=fecha, empresa=empresa) for pk in actividad_ids],
+            ignore_conflicts=True,
+        )
+        avances = dict(
+            AvanceDiario.objects.filter(
+                actividad_id__in=actividad_ids, fecha_reporte=fecha, empresa=empresa
+            ).values_list('actividad_id', 'id')
+        )
+        AvancePorZona.objects.bulk_create(
+            [
+                AvancePorZona(avance_diario_id=avances[actividad_id], zona_id=zona_id, cantidad=cantidad)
+                for (actividad_id, zona_id), cantidad in cantidades.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['avance_diario', 'zona'],
+            update_fields=['cantidad'],
+            batch_size=1000,
+        )
+        if reemplazar_zonas:
+            zonas_por_actividad = {}
+            for actividad_id, zona_id in cantidades:
+                zonas_por_actividad.setdefault(actividad_id, []).append(zona_id)
+            sobrantes = Q()
+            for actividad_id, zonas in zonas_por_actividad.items():
+                sobrantes |= Q(avance_diario_id=avances[actividad_id]) & ~Q(zona_id__in=zonas)
+            AvancePorZona.objects.filter(sobrantes).delete()
+        # Sin señales en bloque: ver 'ESCRITURAS EN BLOQUE' en signals.py
+        marcar_recalculo(proyecto.pk, fecha)
+        incrementar_version(clave_evm(proyecto.pk))
+
+    return len(cantidades)
@@ -0,0 +1,199 @@
+# actividades/estado_bim.py
+
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Count, Min, Max, Value, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import (
+    ElementoBIM_GUID, ElementoConstructivo, PasoProcesoTipoElemento, AvanceProcesoElemento, EliminacionBIM,
+)
+from .versiones import incrementar_version, CLAVE_BIM
+
+# La marca devuelta se retrasa este margen: una transacción que aún no
+# confirmaba al leer (con 'actualizado_en' anterior a la marca) entra en la
+# siguiente sincronización. Algunas filas se repiten, ninguna se pierde.
+MARGEN_MARCA_BIM = timedelta(minutes=5)
+MARCA_INICIAL_BIM = datetime(2000, 1, 1, tzinfo=dt_timezone.utc)
+
+CAMPOS_ESTADO_BIM = (
+    'id', 'identificador_bim', 'elemento_constructivo__identificador_unico', 'elemento_constructivo__estado_avance',
+    'elemento_constructivo__fecha_primer_avance', 'elemento_constructivo__fecha_ultimo_avance',
+)
+CAMPOS_RESUMEN = ('total_pasos', 'pasos_completados', 'fecha_primer_avance', 'fecha_ultimo_avance', 'estado_avance')
+ETIQUETAS_ESTADO = dict(ElementoConstructivo.ESTADOS_AVANCE)
+
+
+def guids_con_estado():
+    """
+    GUIDs con los datos de estado de su elemento, como dicts (values()).
+    El estado y las fechas son columnas materializadas del elemento (ver
+    actualizar_resumenes): un join por llave primaria, sin agregados.
+    """
+    return ElementoBIM_GUID.objects.values(*CAMPOS_ESTADO_BIM)
+
+
+def fila_estado_bim(fila):
+    """ Fila de guids_con_estado() con el formato que lee el plugin de Navisworks (Timeliner). """
+    return {
+        'id_navisworks': fila['identificador_bim'],
+        'identificador_unico': fila['elemento_constructivo__identificador_unico'],
+        'status': ETIQUETAS_ESTADO[fila['elemento_constructivo__estado_avance']],
+        'fecha_inicio': fila['elemento_constructivo__fecha_primer_avance'],
+        'fecha_fin': fila['elemento_constructivo__fecha_ultimo_avance'],
+    }
+
+
+# --- RESUMEN MATERIALIZADO POR ELEMENTO ---
+
+def _por_elemento(queryset, campo, agregado):
+    """ Subconsulta correlacionada con un solo valor agregado por elemento/tipo. """
+    return Subquery(queryset.order_by().values(campo).annotate(valor=agregado).values('valor')[:1])
+
+
+def actualizar_resumenes(elementos=None):
+    """
+    Recalcula el resumen de avance (pasos, fechas y estado) de los elementos
+    del queryset dado, o de todos. Se calcula en una consulta y solo se
+    escriben los elementos que cambiaron; a esos se les toca también
+    'actualizado_en' para la sincronización incremental. Devuelve cuántos
+    cambiaron.
+    """
+    if elementos is None:
+        elementos = ElementoConstructivo.objects.all()
+    pasos = PasoProcesoTipoElemento.objects.filter(tipo_elemento=OuterRef('tipo_elemento'))
+    avances = AvanceProcesoElemento.objects.filter(elemento=OuterRef('pk'))
+    filas = elementos.order_by().annotate(
+        nuevo_total=Coalesce(_por_elemento(pasos, 'tipo_elemento', Count('pk')), Value(0)),
+        nuevo_completados=Coalesce(_por_elemento(avances, 'elemento', Count('pk')), Value(0)),
+        nuevo_inicio=_por_elemento(avances, 'elemento', Min('fecha_finalizacion')),
+        nuevo_fin=_por_elemento(avances, 'elemento', Max('fecha_finalizacion')),
+    ).values('pk', *CAMPOS_RESUMEN, 'nuevo_total', 'nuevo_completados', 'nuevo_inicio', 'nuevo_fin')
+
+    ahora = timezone.now()
+    por_actualizar = []
+    for fila in filas:
+        nuevos = {
+            'total_pasos': fila['nuevo_total'],
+            'pasos_completados': fila['nuevo_completados'],
+            'fecha_primer_avance': fila['nuevo_inicio'],
+            'fecha_ultimo_avance': fila['nuevo_fin'],
+            'estado_avance': ElementoConstructivo.estado_desde_conteos(fila['nuevo_completados'], fila['nuevo_total']),
+        }
+        if any(nuevos[campo] != fila[campo] for campo in CAMPOS_RESUMEN):
+            por_actualizar.append(ElementoConstructivo(pk=fila['pk'], actualizado_en=ahora, **nuevos))
+
+    ElementoConstructivo.objects.bulk_update(por_actualizar, [*CAMPOS_RESUMEN, 'actualizado_en'], batch_size=500)
+    return len(por_actualizar)
+
+
+# --- CAPTURA POR LOTE ---
+
+def registrar_avances_lote(elemento_ids, fechas_por_paso):
+    """
+    Registra de una vez las fechas de varios pasos ({paso_id: fecha}) para
+    varios elementos del mismo tipo. Valida una sola vez que los pasos sean
+    del tipo de los elementos y hace un único upsert sobre (elemento,
+    paso_proceso); los avances que ya tenían esa fecha no se reescriben.
+    Lanza ValidationError si algo no es válido (no se guarda nada).
+    Devuelve {identificador_unico: {'insertados': n, 'actualizados': n}}.
+    """
+    if any(fecha > date.today() for fecha in fechas_por_paso.values()):
+        raise ValidationError("No se permiten fechas futuras.")
+
+    with transaction.atomic():
+        elementos = {
+            pk: (identificador, tipo_id)
+            for pk, identificador, tipo_id in ElementoConstructivo.objects.filter(pk__in=elemento_ids).values_list(
+                'pk', 'identificador_unico', 'tipo_elemento_id'
+            )
+        }
+        if not elementos:
+            raise ValidationError("Elementos no encontrados.")
+        tipos = {tipo_id for _, tipo_id in elementos.values()}
+        if len(tipos) > 1:
+            raise ValidationError("Todos los elementos deben ser del mismo tipo.")
+
+        validos = set(
+            PasoProcesoTipoElemento.objects.filter(pk__in=fechas_por_paso, tipo_elemento_id=tipos.pop())
+            .values_list('pk', flat=True)
+        )
+        invalidos = sorted(set(fechas_por_paso) - validos)
+        if invalidos:
+            raise ValidationError(
+                f"Los pasos {', '.join(map(str, invalidos))} no pertenecen al tipo de los elementos seleccionados."
+            )
+
+        existentes = {
+            (elemento_id, paso_id): fecha
+            for elemento_id, paso_id, fecha in AvanceProcesoElemento.objects.filter(
+                elemento_id__in=elementos, paso_proceso_id__in=fechas_por_paso
+            ).values_list('elemento_id', 'paso_proceso_id', 'fecha_finalizacion')
+        }
+        conteos = {identificador: {'insertados': 0, 'actualizados': 0} for identificador, _ in elementos.values()}
+        filas = []
+        for elemento_id, (identificador, _) in elementos.items():
+            for paso_id, fecha in fechas_por_paso.items():
+                anterior = existentes.get((elemento_id, paso_id))
+                if anterior == fecha:
+                    continue
+                conteos[identificador]['insertados' if anterior is None else 'actualizados'] += 1
+                filas.append(AvanceProcesoElemento(elemento_id=elemento_id, paso_proceso_id=paso_id, fecha_finalizacion=fecha))
+
+        if filas:
+            AvanceProcesoElemento.objects.bulk_create(
+                filas,
+                update_conflicts=True,
+                unique_fields=['elemento', 'paso_proceso'],
+                update_fields=['fecha_finalizacion', 'actualizado_en'],
+                batch_size=1000,
+            )
+            # Sin señales en bloque: ver 'ESCRITURAS EN BLOQUE' en signals.py
+            actualizar_resumenes(ElementoConstructivo.objects.filter(pk__in={fila.elemento_id for fila in filas}))
+            incrementar_version(CLAVE_BIM)
+
+    return conteos
+
+
+# --- SINCRONIZACIÓN INCREMENTAL ---
+
+def marca_sincronizacion(actualizado_en=None):
+    """
+    Marca (watermark) a devolver al cliente. Se basa en la hora del último
+    cambio de los datos BIM (VersionDatos) y no en la hora actual, así la
+    misma versión de los datos produce la misma respuesta (ETag fuerte).
+    Sin contador (nunca hubo cambios registrados) se usa una época fija: el
+    siguiente ?since= devuelve todo, que es lo correcto.
+    """
+    return (actualizado_en or MARCA_INICIAL_BIM) - MARGEN_MARCA_BIM
+
+
+def guids_modificados_desde(desde):
+    """
+    guids_con_estado() limitado a los GUIDs cuyo estado o fechas pudieron
+    cambiar después de 'desde': GUID nuevo o reasignado, elemento modificado
+    (incluye cambios de su resumen de avance), avance creado/editado o
+    avance eliminado.
+    """
+    avances = AvanceProcesoElemento.objects.filter(actualizado_en__gt=desde).values('elemento')
+    avances_eliminados = EliminacionBIM.objects.filter(
+        eliminado_en__gt=desde, elemento_id_afectado__isnull=False
+    ).values('elemento_id_afectado')
+    return guids_con_estado().filter(
+        Q(actualizado_en__gt=desde)
+        | Q(elemento_constructivo__actualizado_en__gt=desde)
+        | Q(elemento_constructivo__in=avances)
+        | Q(elemento_constructivo__in=avances_eliminados)
+    )
+
+
+def guids_eliminados_desde(desde):
+    """ GUIDs borrados después de 'desde' que no se volvieron a crear. """
+    return (
+        EliminacionBIM.objects.filter(eliminado_en__gt=desde)
+        .exclude(identificador_bim='')
+        .exclude(identificador_bim__in=ElementoBIM_GUID.objects.values('identificador_bim'))
+        .values_list('identificador_bim', flat=True)
+        .distinct()
+    )
@@ -0,0 +1,242 @@
+# actividades/evm.py
+
+from datetime import date, timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q, Sum
+from .models import AvancePorZona, SnapshotEVM, EstadoSnapshotEVM, Semana
+from .valor_planeado import CurvaValorPlaneado
+from .versiones import obtener_version, clave_evm
+
+CERO = Decimal('0')
+
+RESOLUCIONES_CURVA_S = ('diaria', 'semanal', 'mensual')
+CURVA_S_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def calcular_spi(ev, pv):
+    if pv and pv > 0:
+        return round(Decimal(ev) / Decimal(pv), 3)
+    return None
+
+
+def marcar_recalculo(proyecto_id, fecha):
+    """
+    Indica que los snapshots del proyecto desde 'fecha' quedaron obsoletos
+    (cambió una meta o un avance). Solo adelanta la marca, nunca la atrasa.
+    """
+    if proyecto_id is None or fecha is None:
+        return
+    EstadoSnapshotEVM.objects.filter(proyecto_id=proyecto_id).filter(
+        Q(recalcular_desde__isnull=True) | Q(recalcular_desde__gt=fecha)
+    ).update(recalcular_desde=fecha)
+
+
+def generar_snapshots(proyecto, hasta=None, completo=False):
+    """
+    Calcula los snapshots del proyecto de forma incremental: solo los días
+    posteriores al último snapshot y los que quedaron marcados para recalcular.
+    Devuelve (desde, hasta, filas_creadas); desde es None si no había nada que hacer.
+    """
+    hasta = hasta or date.today()
+    estado, _ = EstadoSnapshotEVM.objects.get_or_create(proyecto=proyecto)
+    marca_leida = estado.recalcular_desde
+
+    curva = CurvaValorPlaneado.para_proyecto(proyecto)
+    inicio_proyecto = min(f for f in [proyecto.fecha_inicio, curva.fecha_inicio] if f)
+
+    if completo or estado.ultima_fecha is None:
+        desde = inicio_proyecto
+    else:
+        desde = estado.ultima_fecha + timedelta(days=1)
+        if marca_leida:
+            desde = min(desde, marca_leida)
+        desde = max(desde, inicio_proyecto)
+
+    if desde > hasta:
+        return None, hasta, 0
+
+    # EV acumulado hasta el día anterior al rango y EV diario dentro del rango (2 consultas)
+    ev_previo = {
+        (f['avance_diario__actividad_id'], f['zona_id']): f['total']
+        for f in AvancePorZona.objects.filter(
+            avance_diario__actividad__proyecto=proyecto, avance_diario__fecha_reporte__lt=desde
+        ).values('avance_diario__actividad_id', 'zona_id').annotate(total=Sum('cantidad'))
+    }
+    ev_diario = {}
+    for f in (
+        AvancePorZona.objects.filter(
+            avance_diario__actividad__proyecto=proyecto, avance_diario__fecha_reporte__range=(desde, hasta)
+        ).values('avance_diario__actividad_id', 'zona_id', 'avance_diario__fecha_reporte')
+        .annotate(total=Sum('cantidad'))
+    ):
+        par = (f['avance_diario__actividad_id'], f['zona_id'])
+        ev_diario.setdefault(par, {})[f['avance_diario__fecha_reporte']] = f['total']
+
+    pares = {(f['actividad_id'], f['zona_id']) for f in curva.filas} | set(ev_previo) | set(ev_diario)
+    num_dias = (hasta - desde).days + 1
+    dias = [desde + timedelta(days=i) for i in range(num_dias)]
+
+    filas = []
+    total_pv_diario = [CERO] * num_dias
+    total_ev_diario = [CERO] * num_dias
+    total_ev_previo = CERO
+
+    for actividad_id, zona_id in sorted(pares):
+        ev_acumulado = ev_previo.get((actividad_id, zona_id)) or CERO
+        total_ev_previo += ev_acumulado
+        diarios = ev_diario.get((actividad_id, zona_id), {})
+        pv_anterior = curva.acumulado(desde - timedelta(days=1), actividad_id=actividad_id, zona_id=zona_id)
+
+        for i, dia in enumerate(dias):
+            pv_acumulado = curva.acumulado(dia, actividad_id=actividad_id, zona_id=zona_id)
+            ev_dia = diarios.get(dia) or CERO
+            ev_acumulado += ev_dia
+            pv_dia = pv_acumulado - pv_anterior
+            pv_anterior = pv_acumulado
+            total_pv_diario[i] += pv_dia
+            total_ev_diario[i] += ev_dia
+            # No se guardan los días previos a que el par tenga algo planeado o ejecutado
+            if not pv_acumulado and not ev_acumulado:
+                continue
+            filas.append(SnapshotEVM(
+                proyecto=proyecto, actividad_id=actividad_id, zona_id=zona_id, fecha=dia,
+                pv_diario=pv_dia, ev_diario=ev_dia, pv_acumulado=pv_acumulado, ev_acumulado=ev_acumulado,
+                spi=calcular_spi(ev_acumulado, pv_acumulado),
+            ))
+
+    # Filas de total del proyecto (actividad y zona nulas)
+    pv_acumulado = curva.acumulado(desde - timedelta(days=1))
+    ev_acumulado = total_ev_previo
+    for i, dia in enumerate(dias):
+        pv_acumulado += total_pv_diario[i]
+        ev_acumulado += total_ev_diario[i]
+        filas.append(SnapshotEVM(
+            proyecto=proyecto, actividad=None, zona=None, fecha=dia,
+            pv_diario=total_pv_diario[i], ev_diario=total_ev_diario[i],
+            pv_acumulado=pv_acumulado, ev_acumulado=ev_acumulado,
+            spi=calcular_spi(ev_acumulado, pv_acumulado),
+        ))
+
+    with transaction.atomic():
+        # Dos corridas del mismo proyecto se escriben una tras otra: la segunda borra
+        # lo que insertó la primera en lugar de chocar con las restricciones únicas
+        EstadoSnapshotEVM.objects.select_for_update().filter(pk=estado.pk).first()
+        SnapshotEVM.objects.filter(proyecto=proyecto, fecha__gte=desde).delete()
+        SnapshotEVM.objects.bulk_create(filas, batch_size=1000)
+        EstadoSnapshotEVM.objects.filter(pk=estado.pk).update(ultima_fecha=hasta)
+        # Si alguien marcó otra fecha mientras calculábamos, se respeta su marca
+        EstadoSnapshotEVM.objects.filter(pk=estado.pk, recalcular_desde=marca_leida).update(recalcular_desde=None)
+
+    return desde, hasta, len(filas)
+
+
+def obtener_snapshot(proyecto, fecha, actividad_id=None, zona_id=None):
+    """
+    Snapshot vigente de un día (una fila). Devuelve None si no existe o si sus
+    insumos cambiaron después de calcularlo; en ese caso hay que calcular en vivo.
+    """
+    estado = EstadoSnapshotEVM.objects.filter(proyecto=proyecto).first()
+    if estado is None or estado.ultima_fecha is None or fecha > estado.ultima_fecha:
+        return None
+    if estado.recalcular_desde and estado.recalcular_desde <= fecha:
+        return None
+    return SnapshotEVM.objects.filter(
+        proyecto=proyecto, fecha=fecha, actividad_id=actividad_id, zona_id=zona_id
+    ).first()
+
+
+# --- CURVA S (PV vs EV acumulados) ---
+
+def curva_s(proyecto, resolucion='diaria', partida_id=None, zona_id=None):
+    """
+    Serie acumulada de PV y EV para graficar la curva S. El resultado se guarda
+    en caché con la versión de datos del proyecto en la clave, así cualquier
+    cambio en metas o avances (ver signals.py) la invalida de inmediato. La
+    fecha de hoy también va en la clave: el EV se corta en hoy.
+    """
+    version, _ = obtener_version(clave_evm(proyecto.pk))
+    hoy = date.today()
+    clave = f"curva_s:{proyecto.pk}:{version}:{hoy.isoformat()}:{resolucion}:{partida_id}:{zona_id}"
+    puntos = cache.get(clave)
+    if puntos is None:
+        puntos = _calcular_curva_s(proyecto, resolucion, partida_id, zona_id, hoy)
+        cache.set(clave, puntos, CURVA_S_CACHE_TIMEOUT)
+    return puntos
+
+
+def _calcular_curva_s(proyecto, resolucion, partida_id, zona_id, hoy):
+    filtros_pv = {}
+    avances = AvancePorZona.objects.filter(avance_diario__actividad__proyecto=proyecto)
+    if partida_id is not None:
+        filtros_pv['partida_id'] = partida_id
+        avances = avances.filter(avance_diario__actividad__partida_id=partida_id)
+    if zona_id is not None:
+        filtros_pv['zona_id'] = zona_id
+        avances = avances.filter(zona_id=zona_id)
+
+    curva = proyecto.curva_valor_planeado
+    ev_por_dia = dict(
+        avances.values_list('avance_diario__fecha_reporte').annotate(total=Sum('cantidad'))
+    )
+
+    fechas = list(ev_por_dia)
+    if curva.num_dias:
+        fechas += [curva.fecha_inicio, curva.fecha_fin]
+    if not fechas:
+        return []
+    inicio, fin = min(fechas), max(fechas)
+
+    cierres_semana = {}
+    if resolucion == 'semanal':
+        cierres_semana = dict(
+            Semana.objects.filter(fecha_fin__range=(inicio, fin)).values_list('fecha_fin', 'numero_semana')
+        )
+
+    puntos = []
+    ev_acumulado = CERO
+    dia = inicio
+    while dia <= fin:
+        ev_acumulado += ev_por_dia.get(dia) or CERO
+        etiqueta = None
+        if resolucion == 'diaria':
+            etiqueta = dia.isoformat()
+        elif resolucion == 'semanal' and dia in cierres_semana:
+            etiqueta = f"Semana {cierres_semana[dia]}"
+        elif resolucion == 'mensual' and ((dia + timedelta(days=1)).day == 1 or dia == fin):
+            etiqueta = dia.strftime('%Y-%m')
+
+        if etiqueta:
+            puntos.append({
+                'fecha': dia.isoformat(),
+                'etiqueta': etiqueta,
+                'pv': float(curva.acumulado(dia, **filtros_pv)),
+                # El EV futuro no existe todavía
+                'ev': float(ev_acumulado) if dia <= hoy else None,
+            })
+        dia += timedelta(days=1)
+    return puntos
+
+
+# --- EV AGREGADO EN BD ---
+
+def _desglose_ev(avances, campo_id, campo_nombre):
+    return [
+        {'id': f[campo_id], 'nombre': f[campo_nombre], 'total': f['total']}
+        for f in avances.values(campo_id, campo_nombre).annotate(total=Sum('cantidad')).order_by('-total', campo_nombre)
+    ]
+
+
+def resumen_ev(avances):
+    """
+    EV de un queryset de AvancePorZona calculado por la BD: total y desglose
+    por zona, empresa y actividad. Son 4 consultas de agregación sin importar
+    cuántos avances haya; nunca se traen las filas a memoria.
+    """
+    return {
+        'total': avances.aggregate(total=Sum('cantidad'))['total'] or CERO,
+        'por_zona': _desglose_ev(avances, 'zona_id', 'zona__nombre'),
+        'por_empresa': _desglose_ev(avances, 'avance_diario__empresa_id', 'avance_diario__empresa__nombre'),
+        'por_actividad': _desglose_ev(avances, 'avance_diario__actividad_id', 'avance_diario__actividad__nombre'),
+    }
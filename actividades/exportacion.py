@@ -0,0 +1,97 @@
+# actividades/exportacion.py
+
+import csv
+from .calendario import obtener_calendario
+from .models import Actividad, AvancePorZona, MetaPorZona
+from .valor_planeado import pv_diario_de_metas
+
+EXPORTACION_CHUNK = 2000
+
+COLUMNAS_AVANCE = (
+    'Fecha', 'Actividad (WBS)', 'Partida', 'Unidad', 'Empresa', 'Zona',
+    'Cantidad Zona', 'Programado Zona', 'Programado Actividad',
+)
+
+
+class _Eco:
+    """ Pseudo-archivo para csv.writer: devuelve la línea en lugar de guardarla. """
+    def write(self, valor):
+        return valor
+
+
+def filas_avance_csv(proyecto, filtros=None):
+    """
+    Genera, línea por línea, el CSV del avance diario del proyecto desglosado
+    por zona, con el PV del día de la zona y de la actividad.
+
+    Las filas se leen con iterator() por bloques y se escriben conforme llegan,
+    así la memoria no depende del número de avances. Solo se cargan completos
+    el WBS y las metas del proyecto (acotados por el tamaño del proyecto, no
+    del historial).
+    """
+    filtros = filtros or {}
+    calendario = obtener_calendario(proyecto.pk)
+
+    actividades = {
+        a['id']: a for a in Actividad.objects.filter(proyecto=proyecto).values(
+            'id', 'nombre', 'padre_id', 'es_hoja', 'unidad_medida', 'partida__nombre',
+            'fecha_inicio_programada', 'fecha_fin_programada',
+        )
+    }
+    metas = {}
+    for meta in MetaPorZona.objects.filter(actividad__proyecto=proyecto).values(
+        'actividad_id', 'zona_id', 'meta', 'fecha_inicio_programada', 'fecha_fin_programada'
+    ):
+        metas.setdefault(meta['actividad_id'], {})[meta['zona_id']] = meta
+
+    nombres_wbs = {}
+    def nombre_wbs(actividad_id):
+        # Mismo formato que Actividad.__str__ ('Padre → Hijo'), sin consultas
+        if actividad_id not in nombres_wbs:
+            actividad = actividades[actividad_id]
+            padre_id = actividad['padre_id']
+            nombres_wbs[actividad_id] = (
+                f"{nombre_wbs(padre_id)} → {actividad['nombre']}" if padre_id in actividades else actividad['nombre']
+            )
+        return nombres_wbs[actividad_id]
+
+    def pv_dia(actividad, fecha, metas_dia):
+        if not actividad['es_hoja']:
+            return 0
+        return pv_diario_de_metas(
+            metas_dia, fecha, calendario, actividad['fecha_inicio_programada'], actividad['fecha_fin_programada']
+        )
+
+    avances = AvancePorZona.objects.filter(avance_diario__actividad__proyecto=proyecto, **filtros).order_by(
+        'avance_diario__fecha_reporte', 'avance_diario__actividad_id', 'avance_diario_id', 'zona__nombre'
+    ).values_list(
+        'avance_diario__fecha_reporte', 'avance_diario__actividad_id', 'avance_diario__empresa__nombre',
+        'zona_id', 'zona__nombre', 'cantidad',
+    )
+
+    escritor = csv.writer(_Eco())
+    # BOM para que Excel reconozca el UTF-8 (acentos) al abrir el archivo
+    yield '\ufeff' + escritor.writerow(COLUMNAS_AVANCE)
+
+    # El PV por actividad solo se recuerda durante el día en curso (memoria constante)
+    fecha_actual, pv_actividades = None, {}
+    for fecha, actividad_id, empresa, zona_id, zona, cantidad in avances.iterator(chunk_size=EXPORTACION_CHUNK):
+        if fecha != fecha_actual:
+            fecha_actual, pv_actividades = fecha, {}
+        actividad = actividades[actividad_id]
+        metas_actividad = metas.get(actividad_id, {})
+        if actividad_id not in pv_actividades:
+            pv_actividades[actividad_id] = pv_dia(actividad, fecha, list(metas_actividad.values()))
+        meta_zona = metas_actividad.get(zona_id)
+
+        yield escritor.writerow([
+            fecha.isoformat(),
+            nombre_wbs(actividad_id),
+            actividad['partida__nombre'] or '',
+            actividad['unidad_medida'],
+            empresa,
+            zona,
+            cantidad,
+            pv_dia(actividad, fecha, [meta_zona] if meta_zona else []),
+            pv_actividades[actividad_id],
+        ])
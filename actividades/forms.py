@@ -3,15 +3,48 @@
 from django import forms
 from django.forms import inlineformset_factory
 from datetime import date
-from django.db.models import Q
+from django.urls import reverse_lazy
 from .models import (
     ReporteDiarioMaquinaria, ReportePersonal, Actividad,
     PartidaActividad, AvanceDiario, ReporteClima,
     MetaPorZona, AvancePorZona, TipoElemento, ProcesoConstructivo, PasoProcesoTipoElemento,
     ElementoConstructivo, AvanceProcesoElemento,
-    AreaDeTrabajo, Cronograma, Observacion, CronogramaPorZona
+    AreaDeTrabajo, Cronograma, Observacion, CronogramaPorZona, Proyecto, Empresa
 )
 
+# ==========================================
+# WIDGETS
+# ==========================================
+
+class SelectAutocompletar(forms.Select):
+    """
+    Select para jerarquías grandes (WBS, Cronograma): solo pinta la opción
+    elegida y tom-select busca las demás en 'url' conforme se escribe (ver
+    partials/autocompletar_padre.html). Así la página no carga todos los
+    nodos del sistema ni arma el nombre completo de cada uno.
+    'url' lleva un 0 en lugar del ID del proyecto, que sale de 'proyecto'
+    (fijo) o del campo con id 'campo_proyecto' del mismo formulario.
+    """
+    def __init__(self, url, proyecto=None, campo_proyecto=None, attrs=None):
+        attrs = {'class': 'form-select', 'data-autocompletar': url, **(attrs or {})}
+        if proyecto is not None:
+            attrs['data-proyecto'] = proyecto
+        if campo_proyecto:
+            attrs['data-campo-proyecto'] = campo_proyecto
+        super().__init__(attrs=attrs)
+
+    def optgroups(self, name, value, attrs=None):
+        campo = self.choices.field
+        elegidos = [v for v in value if v not in (None, '')]
+        opciones = [('', campo.empty_label)] if campo.empty_label is not None else []
+        if elegidos:
+            nombres = campo.queryset.filter(pk__in=elegidos).nombres_completos()
+            opciones += list(nombres.items())
+        return [
+            (None, [self.create_option(name, pk, etiqueta, str(pk) in value, indice, attrs=attrs)], indice)
+            for indice, (pk, etiqueta) in enumerate(opciones)
+        ]
+
 # ==========================================
 # REPORTES Y OTROS (Sin cambios)
 # ==========================================
@@ -95,6 +128,9 @@ class ActividadForm(forms.ModelForm):
             'unidad_medida', 'fecha_inicio_programada', 'fecha_fin_programada'
         ]
         widgets = {
+            'padre': SelectAutocompletar(
+                reverse_lazy('actividades:api_buscar_wbs', args=[0]), campo_proyecto='id_proyecto'
+            ),
             'fecha_inicio_programada': forms.DateInput(attrs={'type': 'date'}),
             'fecha_fin_programada': forms.DateInput(attrs={'type': 'date'}),
         }
@@ -114,15 +150,39 @@ class ActividadForm(forms.ModelForm):
                  self.fields['fecha_fin_programada'].initial = date.today()
 
         if 'padre' in self.fields:
+            # El queryset solo valida el valor enviado; las opciones las busca el autocompletado
             queryset = Actividad.objects.all()
             if self.instance and self.instance.pk:
-                descendientes_pks = list(self.instance.sub_actividades.values_list('pk', flat=True))
-                pks_a_excluir = [self.instance.pk] + descendientes_pks
-                queryset = queryset.exclude(pk__in=pks_a_excluir)
-            
-            self.fields['padre'].queryset = queryset.order_by('padre__nombre', 'nombre')
+                # Se excluye el nodo y TODO su subárbol (no solo los hijos directos)
+                queryset = queryset.exclude(pk=self.instance.pk).exclude(ruta__startswith=self.instance.ruta_hijos)
+                self.fields['padre'].widget.attrs['data-excluir'] = self.instance.pk
+
+            self.fields['padre'].queryset = queryset
             self.fields['padre'].empty_label = "--- Ninguna (Categoría Raíz) ---"
 
+    def clean(self):
+        cleaned_data = super().clean()
+        padre = cleaned_data.get('padre')
+        proyecto = cleaned_data.get('proyecto')
+        # El autocompletado solo ofrece padres del proyecto elegido, pero el POST puede traer cualquier ID
+        if padre and proyecto and padre.proyecto_id != proyecto.pk:
+            self.add_error('padre', "La actividad padre debe pertenecer al mismo proyecto.")
+        return cleaned_data
+
+class ImportarWBSForm(forms.Form):
+    proyecto = forms.ModelChoiceField(
+        queryset=Proyecto.objects.order_by('nombre'),
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    archivo = forms.FileField(
+        label="Archivo CSV",
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv'}),
+    )
+    simular = forms.BooleanField(
+        label="Solo validar (no guardar)",
+        required=False,
+    )
+
 # ==========================================
 # AVANCE DIARIO
 # ==========================================
@@ -176,6 +236,30 @@ class AvanceDiarioForm(forms.ModelForm):
         if self.validate_uniqueness:
             super().validate_unique()
 
+class CapturaCuadriculaForm(forms.Form):
+    """ Encabezado de la captura en cuadrícula: un día, una empresa y (opcional) una partida. """
+    fecha = forms.DateField(
+        initial=date.today,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
+    )
+    empresa = forms.ModelChoiceField(
+        queryset=Empresa.objects.order_by('nombre'),
+        label="Empresa Contratista",
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+    partida = forms.ModelChoiceField(
+        queryset=PartidaActividad.objects.order_by('nombre'),
+        required=False,
+        empty_label="--- Todas las partidas ---",
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+
+    def clean_fecha(self):
+        fecha = self.cleaned_data['fecha']
+        if fecha > date.today():
+            raise forms.ValidationError("No puedes hacer registros para una fecha futura.")
+        return fecha
+
 # ==========================================
 # BIM
 # ==========================================
@@ -202,6 +286,9 @@ class AvanceProcesoElementoForm(forms.ModelForm):
 # CRONOGRAMA (CORREGIDO)
 # ==========================================
 
+# Un padre del cronograma puede ser de nivel 1 o 2 (profundidad 0 o 1), así no hay más de 3 niveles
+CRONOGRAMA_PROFUNDIDAD_MAXIMA_PADRE = 1
+
 class CronogramaForm(forms.ModelForm):
     """
     Formulario para CREAR una nueva actividad MAESTRA.
@@ -219,7 +306,7 @@ class CronogramaForm(forms.ModelForm):
         fields = ['nombre', 'padre']  
         widgets = {
             'nombre': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Nombre de la Actividad'}),
-            'padre': forms.Select(attrs={'class': 'form-select'}),
+            'padre': SelectAutocompletar(reverse_lazy('actividades:api_buscar_cronograma', args=[0])),
         }
 
     def __init__(self, *args, **kwargs):
@@ -231,14 +318,12 @@ class CronogramaForm(forms.ModelForm):
             # 2. IMPORTANTE: Eliminamos la línea "self.fields['proyecto'].initial = ..."
             #    porque el campo ya no existe en 'fields'.
 
-            # Filtramos el padre para que solo muestre tareas de ESTE proyecto
+            # Filtramos el padre para que solo acepte tareas de niveles 1 y 2 de ESTE proyecto
+            # (mismo filtro que aplica api_buscar_cronograma al autocompletar)
             self.fields['padre'].queryset = Cronograma.objects.filter(
-                proyecto=proyecto
-            ).filter(
-                Q(padre__isnull=True) | Q(padre__padre__isnull=True)
-            ).order_by('padre__nombre', 'nombre')
-            
-            self.fields['padre'].label_from_instance = lambda obj: f"{'📂 ' + obj.nombre if obj.padre is None else '↳ ' + obj.nombre}"
+                proyecto=proyecto, profundidad__lte=CRONOGRAMA_PROFUNDIDAD_MAXIMA_PADRE
+            )
+            self.fields['padre'].widget.attrs['data-proyecto'] = proyecto.pk
             self.fields['padre'].empty_label = "--- Sin Padre (Crear Nivel 1) ---"
 
 class CronogramaPorZonaForm(forms.ModelForm):
@@ -0,0 +1,187 @@
+# actividades/importacion.py
+
+import csv
+import io
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from .models import Actividad, MetaPorZona, PartidaActividad, AreaDeTrabajo
+from .wbs import recalcular_rollups
+from .evm import marcar_recalculo
+from .versiones import incrementar_version, clave_evm
+
+SEPARADOR_RUTA = '>'
+COLUMNAS_IMPORTACION = ('ruta', 'unidad', 'partida', 'fecha_inicio', 'fecha_fin', 'zona', 'meta')
+_SOBRANTES = '__sobrantes__'
+
+
+def _fecha(valor):
+    valor = (valor or '').strip()
+    if not valor:
+        return None
+    for formato in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(valor, formato).date()
+        except ValueError:
+            pass
+    raise ValueError(f"fecha '{valor}' no válida (use AAAA-MM-DD o DD/MM/AAAA)")
+
+
+def leer_csv(archivo):
+    """ Lee el CSV (archivo abierto, bytes o texto) y devuelve sus filas como dicts. """
+    if isinstance(archivo, (bytes, bytearray)):
+        archivo = archivo.decode('utf-8-sig')
+    if isinstance(archivo, str):
+        archivo = io.StringIO(archivo)
+    # Los valores de más (sin encabezado) quedan en una lista bajo _SOBRANTES
+    lector = csv.DictReader(archivo, restkey=_SOBRANTES, restval='')
+    faltantes = set(COLUMNAS_IMPORTACION) - {(c or '').strip().lower() for c in lector.fieldnames or []}
+    if faltantes:
+        raise ValidationError(f"Faltan columnas en el archivo: {', '.join(sorted(faltantes))}.")
+
+    filas = []
+    errores = []
+    for numero, fila in enumerate(lector, start=2):  # la fila 1 es el encabezado
+        # Las celdas vacías de más (p. ej. una coma final de Excel) se ignoran
+        if any(v.strip() for v in fila.pop(_SOBRANTES, [])):
+            errores.append(f"Fila {numero}: tiene más valores que columnas el encabezado.")
+        filas.append({(k or '').strip().lower(): (v or '').strip() for k, v in fila.items()})
+    if errores:
+        raise ValidationError(errores)
+    if not filas:
+        raise ValidationError("El archivo no tiene filas de datos, solo el encabezado.")
+    return filas
+
+
+def _validar_filas(filas, partidas, zonas):
+    """
+    Revisa todas las filas antes de tocar la BD y las convierte a tipos Python.
+    Devuelve (nodos, metas): nodos = {ruta (tupla de nombres): datos de la actividad}
+    y metas = {(ruta, zona_id): (meta, inicio, fin)}. Lanza ValidationError con todos los errores.
+    """
+    errores = []
+    nodos = {}
+    metas = {}
+    for numero, fila in enumerate(filas, start=2):  # la fila 1 es el encabezado
+        ruta = tuple(n.strip() for n in fila['ruta'].split(SEPARADOR_RUTA) if n.strip())
+        if not ruta:
+            errores.append(f"Fila {numero}: la ruta está vacía.")
+            continue
+        try:
+            fecha_inicio, fecha_fin = _fecha(fila['fecha_inicio']), _fecha(fila['fecha_fin'])
+        except ValueError as e:
+            errores.append(f"Fila {numero}: {e}.")
+            fecha_inicio = fecha_fin = None
+        if fecha_inicio and fecha_fin and fecha_fin < fecha_inicio:
+            errores.append(f"Fila {numero}: la fecha de fin es anterior a la de inicio.")
+        if fila['partida'] and fila['partida'].lower() not in partidas:
+            errores.append(f"Fila {numero}: no existe la partida '{fila['partida']}'.")
+
+        # Las categorías intermedias de la ruta se crean solo con su nombre
+        for nivel in range(1, len(ruta)):
+            nodos.setdefault(ruta[:nivel], {})
+        datos = nodos.setdefault(ruta, {})
+        for campo, valor in (
+            ('unidad_medida', fila['unidad']),
+            ('partida_id', partidas.get(fila['partida'].lower())),
+            ('fecha_inicio_programada', fecha_inicio),
+            ('fecha_fin_programada', fecha_fin),
+        ):
+            if valor and not datos.get(campo):
+                datos[campo] = valor
+
+        if fila['zona'] or fila['meta']:
+            zona_id = zonas.get(fila['zona'].lower())
+            if zona_id is None:
+                errores.append(f"Fila {numero}: no existe la zona '{fila['zona']}'.")
+                continue
+            try:
+                meta = Decimal(fila['meta'].replace(',', ''))
+            except InvalidOperation:
+                errores.append(f"Fila {numero}: la meta '{fila['meta']}' no es un número.")
+                continue
+            if meta < 0:
+                errores.append(f"Fila {numero}: la meta no puede ser negativa.")
+            if (ruta, zona_id) in metas:
+                errores.append(f"Fila {numero}: la zona '{fila['zona']}' está repetida para '{' > '.join(ruta)}'.")
+            metas[(ruta, zona_id)] = (meta, fecha_inicio, fecha_fin)
+
+    if errores:
+        raise ValidationError(errores)
+    return nodos, metas
+
+
+def importar_wbs(proyecto, filas, simular=False):
+    """
+    Crea en bloque las Actividades y MetaPorZona de un plan de obra.
+
+    Cada fila trae la ruta completa de la actividad ('Terracerías > Cortes >
+    Corte zona A'); las rutas que ya existen en el proyecto se reutilizan sin
+    modificarlas. Todo se valida antes de escribir y se inserta en una
+    transacción, nivel por nivel con bulk_create (los padres reciben su ID
+    antes que sus hijos), así un plan de miles de filas se carga en pocas
+    consultas.
+
+    Devuelve (actividades_creadas, metas_creadas).
+    """
+    partidas = {nombre.lower(): pk for pk, nombre in PartidaActividad.objects.values_list('pk', 'nombre')}
+    zonas = {nombre.lower(): pk for pk, nombre in AreaDeTrabajo.objects.values_list('pk', 'nombre')}
+    nodos, metas = _validar_filas(filas, partidas, zonas)
+
+    # Rutas por nombre de las actividades que ya existen en el proyecto
+    existentes = {a['id']: a for a in Actividad.objects.filter(proyecto=proyecto).values('id', 'nombre', 'padre_id', 'ruta')}
+    ids_por_ruta, rutas_bd = {}, {}
+    for actividad in sorted(existentes.values(), key=lambda a: a['ruta'].count('/')):
+        padre = existentes.get(actividad['padre_id'])
+        clave = (*rutas_bd[padre['id']], actividad['nombre']) if padre else (actividad['nombre'],)
+        rutas_bd[actividad['id']] = clave
+        ids_por_ruta.setdefault(clave, actividad['id'])
+    rutas_materializadas = {pk: a['ruta'] for pk, a in existentes.items()}
+
+    metas_existentes = set(MetaPorZona.objects.filter(
+        actividad_id__in=[ids_por_ruta[ruta] for ruta, _ in metas if ruta in ids_por_ruta]
+    ).values_list('actividad_id', 'zona_id'))
+    errores = [
+        f"'{' > '.join(ruta)}' ya tiene una meta para la zona indicada."
+        for ruta, zona_id in metas if (ids_por_ruta.get(ruta), zona_id) in metas_existentes
+    ]
+    if errores:
+        raise ValidationError(errores)
+    if simular:
+        return len([r for r in nodos if r not in ids_por_ruta]), len(metas)
+
+    creadas = 0
+    with transaction.atomic():
+        profundidad_maxima = max((len(ruta) for ruta in nodos), default=0)
+        for nivel in range(1, profundidad_maxima + 1):
+            nuevas = sorted(ruta for ruta in nodos if len(ruta) == nivel and ruta not in ids_por_ruta)
+            objetos = []
+            for ruta in nuevas:
+                padre_id = ids_por_ruta.get(ruta[:-1])
+                ruta_padre = f"{rutas_materializadas[padre_id]}{padre_id}/" if padre_id else ''
+                objetos.append(Actividad(
+                    nombre=ruta[-1], proyecto=proyecto, padre_id=padre_id,
+                    ruta=ruta_padre, profundidad=ruta_padre.count('/'), **nodos[ruta],
+                ))
+            for ruta, actividad in zip(nuevas, Actividad.objects.bulk_create(objetos, batch_size=500)):
+                ids_por_ruta[ruta] = actividad.pk
+                rutas_materializadas[actividad.pk] = actividad.ruta
+            creadas += len(objetos)
+
+        MetaPorZona.objects.bulk_create([
+            MetaPorZona(
+                actividad_id=ids_por_ruta[ruta], zona_id=zona_id, meta=meta,
+                fecha_inicio_programada=fecha_inicio, fecha_fin_programada=fecha_fin,
+            )
+            for (ruta, zona_id), (meta, fecha_inicio, fecha_fin) in metas.items()
+        ], batch_size=1000)
+
+        # Sin señales en bloque: ver 'ESCRITURAS EN BLOQUE' en signals.py
+        recalcular_rollups(proyecto.pk)
+        fechas = [d.get('fecha_inicio_programada') for d in nodos.values()] + [m[1] for m in metas.values()]
+        fechas = [f for f in fechas if f]
+        marcar_recalculo(proyecto.pk, min(fechas) if fechas else proyecto.fecha_inicio)
+        incrementar_version(clave_evm(proyecto.pk))
+
+    return creadas, len(metas)
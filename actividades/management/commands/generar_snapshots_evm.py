@@ -0,0 +1,28 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from actividades.models import Proyecto
+from actividades.evm import generar_snapshots
+
+class Command(BaseCommand):
+    help = 'Genera de forma incremental los snapshots diarios de PV/EV/SPI (pensado para correr cada noche).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--proyecto', type=int, help='ID del proyecto. Si se omite se procesan todos.')
+        parser.add_argument('--hasta', type=date.fromisoformat, help='Último día a calcular (AAAA-MM-DD). Por defecto, hoy.')
+        parser.add_argument('--completo', action='store_true', help='Ignora los snapshots existentes y recalcula todo.')
+
+    def handle(self, *args, **options):
+        proyectos = Proyecto.objects.all()
+        if options.get('proyecto') is not None:
+            proyectos = proyectos.filter(pk=options['proyecto'])
+            if not proyectos.exists():
+                raise CommandError(f"No existe el proyecto con ID={options['proyecto']}.")
+
+        for proyecto in proyectos:
+            desde, hasta, filas = generar_snapshots(proyecto, hasta=options.get('hasta'), completo=options['completo'])
+            if desde is None:
+                self.stdout.write(f"{proyecto}: sin cambios, snapshots al día hasta {hasta}.")
+            else:
+                self.stdout.write(f"{proyecto}: {desde} a {hasta}, {filas} filas generadas.")
+
+        self.stdout.write(self.style.SUCCESS('¡Proceso completado!'))
@@ -0,0 +1,39 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from actividades.models import Proyecto
+from actividades.importacion import leer_csv, importar_wbs, COLUMNAS_IMPORTACION
+
+class Command(BaseCommand):
+    help = (
+        'Carga en bloque el WBS de un proyecto desde un CSV con las columnas: '
+        + ', '.join(COLUMNAS_IMPORTACION) + ". La ruta separa los niveles con '>'."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo CSV (UTF-8).')
+        parser.add_argument('--proyecto', type=int, required=True, help='ID del proyecto destino.')
+        parser.add_argument('--simular', action='store_true', help='Solo valida el archivo, no guarda nada.')
+
+    def handle(self, *args, **options):
+        try:
+            proyecto = Proyecto.objects.get(pk=options['proyecto'])
+        except Proyecto.DoesNotExist:
+            raise CommandError(f"No existe el proyecto con ID={options['proyecto']}.")
+
+        try:
+            with open(options['archivo'], encoding='utf-8-sig', newline='') as archivo:
+                filas = leer_csv(archivo)
+            creadas, metas = importar_wbs(proyecto, filas, simular=options['simular'])
+        except OSError as e:
+            raise CommandError(f"No se pudo leer el archivo: {e}")
+        except ValidationError as e:
+            for mensaje in e.messages:
+                self.stderr.write(mensaje)
+            raise CommandError(f"El archivo tiene {len(e.messages)} error(es); no se importó nada.")
+
+        if options['simular']:
+            self.stdout.write(f"Simulación: se crearían {creadas} actividades y {metas} metas por zona.")
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'¡Proceso completado! Se crearon {creadas} actividades y {metas} metas por zona.'
+            ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from actividades.models import ElementoConstructivo, TipoElemento
+from actividades.estado_bim import actualizar_resumenes
+from actividades.versiones import incrementar_version, CLAVE_BIM
+
+class Command(BaseCommand):
+    help = 'Reconstruye el resumen materializado de avance de los elementos BIM (pasos, fechas y estado).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tipo', type=int, help='ID del tipo de elemento. Si se omite se recalculan todos.')
+
+    def handle(self, *args, **options):
+        tipo_id = options.get('tipo')
+        elementos = ElementoConstructivo.objects.all()
+        if tipo_id is not None:
+            if not TipoElemento.objects.filter(pk=tipo_id).exists():
+                raise CommandError(f'No existe el tipo de elemento con ID={tipo_id}.')
+            elementos = elementos.filter(tipo_elemento_id=tipo_id)
+
+        self.stdout.write("Recalculando resumen de avance BIM...")
+        actualizados = actualizar_resumenes(elementos)
+        if actualizados:
+            incrementar_version(CLAVE_BIM)
+        self.stdout.write(self.style.SUCCESS(f'¡Proceso completado! Se actualizaron {actualizados} elementos.'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+from actividades.models import Proyecto
+from actividades.wbs import recalcular_rollups
+
+class Command(BaseCommand):
+    help = 'Reconstruye los totales materializados del WBS (meta propia, meta del subárbol, hoja y fechas).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--proyecto', type=int, help='ID del proyecto. Si se omite se recalculan todos.')
+
+    def handle(self, *args, **options):
+        proyecto_id = options.get('proyecto')
+        if proyecto_id is not None and not Proyecto.objects.filter(pk=proyecto_id).exists():
+            raise CommandError(f'No existe el proyecto con ID={proyecto_id}.')
+
+        self.stdout.write("Recalculando totales del WBS...")
+        actualizadas = recalcular_rollups(proyecto_id)
+        self.stdout.write(self.style.SUCCESS(f'¡Proceso completado! Se actualizaron {actualizadas} actividades.'))
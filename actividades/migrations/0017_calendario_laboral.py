@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:38
+
+import django.core.validators
+import django.db.models.deletion
+import re
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('actividades', '0016_remove_observacion_fecha_resolucion_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proyecto',
+            name='dias_descanso',
+            field=models.CharField(blank=True, default='6', help_text='Días de la semana no laborables separados por coma (0=Lunes ... 6=Domingo).', max_length=13, validators=[django.core.validators.RegexValidator(re.compile('^\\d+(?:,\\d+)*\\Z'), code='invalid', message='Enter only digits separated by commas.')], verbose_name='Días de Descanso Semanal'),
+        ),
+        migrations.CreateModel(
+            name='DiaNoLaborable',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('descripcion', models.CharField(blank=True, help_text='Ej: Día de la Independencia', max_length=255)),
+                ('proyecto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dias_no_laborables', to='actividades.proyecto')),
+            ],
+            options={
+                'verbose_name': 'Día No Laborable',
+                'verbose_name_plural': 'Días No Laborables',
+                'ordering': ['fecha'],
+                'unique_together': {('proyecto', 'fecha')},
+            },
+        ),
+    ]
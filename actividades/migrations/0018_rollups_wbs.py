@@ -0,0 +1,92 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:41
+
+from django.db import migrations, models
+
+
+def poblar_rollups(apps, schema_editor):
+    # Versión autocontenida de wbs.recalcular_rollups() con los modelos históricos
+    Actividad = apps.get_model('actividades', 'Actividad')
+    MetaPorZona = apps.get_model('actividades', 'MetaPorZona')
+
+    actividades = {a['id']: a for a in Actividad.objects.values('id', 'padre_id', 'fecha_inicio_programada', 'fecha_fin_programada')}
+    hijos = {pk: [] for pk in actividades}
+    for a in actividades.values():
+        if a['padre_id'] in hijos:
+            hijos[a['padre_id']].append(a['id'])
+    metas = {pk: [] for pk in actividades}
+    for m in MetaPorZona.objects.values('actividad_id', 'meta', 'fecha_inicio_programada', 'fecha_fin_programada'):
+        metas[m['actividad_id']].append(m)
+
+    rollups = {}
+
+    def calcular(pk):
+        # Postorden iterativo para no depender de la profundidad del WBS
+        pila = [(pk, False)]
+        while pila:
+            actual, listo = pila.pop()
+            if actual in rollups:
+                continue
+            if not listo:
+                pila.append((actual, True))
+                pila.extend((h, False) for h in hijos[actual])
+                continue
+            act = actividades[actual]
+            propia = sum((m['meta'] for m in metas[actual]), 0)
+            inicios = [act['fecha_inicio_programada']] + [m['fecha_inicio_programada'] for m in metas[actual]]
+            fines = [act['fecha_fin_programada']] + [m['fecha_fin_programada'] for m in metas[actual]]
+            inicios += [rollups[h]['fecha_inicio_subarbol'] for h in hijos[actual]]
+            fines += [rollups[h]['fecha_fin_subarbol'] for h in hijos[actual]]
+            inicios = [f for f in inicios if f]
+            fines = [f for f in fines if f]
+            rollups[actual] = {
+                'meta_propia': propia,
+                'meta_subarbol': sum((rollups[h]['meta_subarbol'] for h in hijos[actual]), 0) if hijos[actual] else propia,
+                'es_hoja': not hijos[actual],
+                'fecha_inicio_subarbol': min(inicios) if inicios else None,
+                'fecha_fin_subarbol': max(fines) if fines else None,
+            }
+
+    for pk in actividades:
+        calcular(pk)
+
+    Actividad.objects.bulk_update(
+        [Actividad(pk=pk, **campos) for pk, campos in rollups.items()],
+        ['meta_propia', 'meta_subarbol', 'es_hoja', 'fecha_inicio_subarbol', 'fecha_fin_subarbol'],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('actividades', '0017_calendario_laboral'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='actividad',
+            name='es_hoja',
+            field=models.BooleanField(default=True, editable=False, verbose_name='Es Hoja'),
+        ),
+        migrations.AddField(
+            model_name='actividad',
+            name='fecha_fin_subarbol',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='actividad',
+            name='fecha_inicio_subarbol',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='actividad',
+            name='meta_propia',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14, verbose_name='Meta Propia'),
+        ),
+        migrations.AddField(
+            model_name='actividad',
+            name='meta_subarbol',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14, verbose_name='Meta del Subárbol'),
+        ),
+        migrations.RunPython(poblar_rollups, migrations.RunPython.noop),
+    ]
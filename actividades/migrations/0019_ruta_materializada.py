@@ -0,0 +1,63 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:42
+
+from django.db import migrations, models
+
+
+def _poblar(Modelo):
+    padres = dict(Modelo.objects.values_list('id', 'padre_id'))
+    rutas = {}
+    for pk in padres:
+        # Subimos hasta la raíz y luego asignamos las rutas de arriba hacia abajo
+        cadena = []
+        vistos = set()
+        actual = pk
+        while actual is not None and actual not in rutas and actual not in vistos:
+            cadena.append(actual)
+            vistos.add(actual)
+            actual = padres.get(actual)
+        ruta = rutas.get(actual, '') + (f"{actual}/" if actual is not None else '')
+        for nodo in reversed(cadena):
+            rutas[nodo] = ruta
+            ruta = f"{ruta}{nodo}/"
+
+    Modelo.objects.bulk_update(
+        [Modelo(pk=pk, ruta=ruta, profundidad=ruta.count('/')) for pk, ruta in rutas.items()],
+        ['ruta', 'profundidad'],
+        batch_size=500,
+    )
+
+
+def poblar_rutas(apps, schema_editor):
+    _poblar(apps.get_model('actividades', 'Actividad'))
+    _poblar(apps.get_model('actividades', 'Cronograma'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('actividades', '0018_rollups_wbs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='actividad',
+            name='profundidad',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='actividad',
+            name='ruta',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='cronograma',
+            name='profundidad',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='cronograma',
+            name='ruta',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=500),
+        ),
+        migrations.RunPython(poblar_rutas, migrations.RunPython.noop),
+    ]
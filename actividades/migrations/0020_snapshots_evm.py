@@ -0,0 +1,49 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('actividades', '0019_ruta_materializada'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadoSnapshotEVM',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ultima_fecha', models.DateField(blank=True, null=True)),
+                ('recalcular_desde', models.DateField(blank=True, null=True)),
+                ('proyecto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='estado_snapshot_evm', to='actividades.proyecto')),
+            ],
+            options={
+                'verbose_name': 'Estado de Snapshots EVM',
+                'verbose_name_plural': 'Estados de Snapshots EVM',
+            },
+        ),
+        migrations.CreateModel(
+            name='SnapshotEVM',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('pv_diario', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('ev_diario', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('pv_acumulado', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('ev_acumulado', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('spi', models.DecimalField(blank=True, decimal_places=3, max_digits=8, null=True)),
+                ('actividad', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='snapshots_evm', to='actividades.actividad')),
+                ('proyecto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots_evm', to='actividades.proyecto')),
+                ('zona', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='actividades.areadetrabajo')),
+            ],
+            options={
+                'verbose_name': 'Snapshot EVM',
+                'verbose_name_plural': 'Snapshots EVM',
+                'ordering': ['-fecha'],
+                'indexes': [models.Index(fields=['proyecto', 'fecha'], name='actividades_proyect_76e94c_idx')],
+                'unique_together': {('proyecto', 'actividad', 'zona', 'fecha')},
+            },
+        ),
+    ]
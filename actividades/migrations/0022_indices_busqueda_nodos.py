@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('actividades', '0021_version_datos'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='actividad',
+            index=models.Index(fields=['proyecto', 'nombre'], name='actividad_proyecto_nombre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cronograma',
+            index=models.Index(fields=['proyecto', 'nombre'], name='cronograma_proyecto_nombre_idx'),
+        ),
+    ]
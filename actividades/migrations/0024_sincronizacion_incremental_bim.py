@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('actividades', '0023_operacion_sincronizada'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EliminacionBIM',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('identificador_bim', models.CharField(blank=True, max_length=255, verbose_name='GUID eliminado')),
+                ('elemento_id_afectado', models.PositiveIntegerField(blank=True, null=True, verbose_name='Elemento con avance eliminado')),
+                ('eliminado_en', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Eliminado en')),
+            ],
+            options={
+                'verbose_name': 'Eliminación BIM',
+                'verbose_name_plural': 'Eliminaciones BIM',
+            },
+        ),
+        migrations.AddField(
+            model_name='avanceprocesoelemento',
+            name='actualizado_en',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Actualizado en'),
+        ),
+        migrations.AddField(
+            model_name='elementobim_guid',
+            name='actualizado_en',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Actualizado en'),
+        ),
+        migrations.AddField(
+            model_name='elementoconstructivo',
+            name='actualizado_en',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Actualizado en'),
+        ),
+    ]
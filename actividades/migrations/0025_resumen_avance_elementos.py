@@ -0,0 +1,79 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:12
+
+from django.db import migrations, models
+
+
+def poblar_resumenes(apps, schema_editor):
+    # Versión autocontenida de estado_bim.actualizar_resumenes() con los modelos históricos
+    ElementoConstructivo = apps.get_model('actividades', 'ElementoConstructivo')
+    PasoProcesoTipoElemento = apps.get_model('actividades', 'PasoProcesoTipoElemento')
+    AvanceProcesoElemento = apps.get_model('actividades', 'AvanceProcesoElemento')
+
+    pasos_por_tipo = {
+        fila['tipo_elemento_id']: fila['total']
+        for fila in PasoProcesoTipoElemento.objects.order_by().values('tipo_elemento_id').annotate(total=models.Count('id'))
+    }
+    avances = {
+        fila['elemento_id']: fila
+        for fila in AvanceProcesoElemento.objects.order_by().values('elemento_id').annotate(
+            completados=models.Count('id'), inicio=models.Min('fecha_finalizacion'), fin=models.Max('fecha_finalizacion'),
+        )
+    }
+
+    elementos = []
+    for pk, tipo_id in ElementoConstructivo.objects.values_list('pk', 'tipo_elemento_id'):
+        total = pasos_por_tipo.get(tipo_id, 0)
+        fila = avances.get(pk, {'completados': 0, 'inicio': None, 'fin': None})
+        completados = fila['completados']
+        if completados == 0:
+            estado = 'pendiente'
+        elif total > 0 and completados >= total:
+            estado = 'completado'
+        else:
+            estado = 'proceso'
+        elementos.append(ElementoConstructivo(
+            pk=pk, total_pasos=total, pasos_completados=completados,
+            fecha_primer_avance=fila['inicio'], fecha_ultimo_avance=fila['fin'], estado_avance=estado,
+        ))
+
+    ElementoConstructivo.objects.bulk_update(
+        elementos,
+        ['total_pasos', 'pasos_completados', 'fecha_primer_avance', 'fecha_ultimo_avance', 'estado_avance'],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('actividades', '0024_sincronizacion_incremental_bim'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='elementoconstructivo',
+            name='estado_avance',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('proceso', 'En Proceso'), ('completado', 'Completado')], default='pendiente', editable=False, max_length=12, verbose_name='Estado de Avance'),
+        ),
+        migrations.AddField(
+            model_name='elementoconstructivo',
+            name='fecha_primer_avance',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='elementoconstructivo',
+            name='fecha_ultimo_avance',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='elementoconstructivo',
+            name='pasos_completados',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Pasos Completados'),
+        ),
+        migrations.AddField(
+            model_name='elementoconstructivo',
+            name='total_pasos',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Total de Pasos'),
+        ),
+        migrations.RunPython(poblar_resumenes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:26
+
+from django.db import migrations
+
+
+def crear_contador_bim(apps, schema_editor):
+    # Con el contador creado la 'marca' de api/bim/status-general/ es estable desde
+    # la instalación (ver estado_bim.marca_sincronizacion). Mismo nombre que versiones.CLAVE_BIM.
+    VersionDatos = apps.get_model('actividades', 'VersionDatos')
+    VersionDatos.objects.get_or_create(nombre='bim')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('actividades', '0025_resumen_avance_elementos'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_contador_bim, migrations.RunPython.noop),
+    ]
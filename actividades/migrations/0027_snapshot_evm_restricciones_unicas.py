@@ -0,0 +1,46 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:35
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def borrar_snapshots_duplicados(apps, schema_editor):
+    # Corridas simultáneas de generar_snapshots_evm pudieron duplicar filas con
+    # actividad/zona nulas; se conserva una por llave (GROUP BY agrupa los NULL)
+    SnapshotEVM = apps.get_model('actividades', 'SnapshotEVM')
+    duplicados = (
+        SnapshotEVM.objects.values('proyecto_id', 'actividad_id', 'zona_id', 'fecha')
+        .annotate(primero=Min('id'), filas=Count('id')).filter(filas__gt=1)
+    )
+    for fila in duplicados:
+        SnapshotEVM.objects.filter(
+            proyecto_id=fila['proyecto_id'], actividad_id=fila['actividad_id'],
+            zona_id=fila['zona_id'], fecha=fila['fecha'],
+        ).exclude(pk=fila['primero']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('actividades', '0026_contador_version_bim'),
+    ]
+
+    operations = [
+        migrations.RunPython(borrar_snapshots_duplicados, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='snapshotevm',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='snapshotevm',
+            constraint=models.UniqueConstraint(fields=('proyecto', 'actividad', 'zona', 'fecha'), name='snapshot_evm_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='snapshotevm',
+            constraint=models.UniqueConstraint(condition=models.Q(('zona__isnull', True)), fields=('proyecto', 'actividad', 'fecha'), name='snapshot_evm_unico_sin_zona'),
+        ),
+        migrations.AddConstraint(
+            model_name='snapshotevm',
+            constraint=models.UniqueConstraint(condition=models.Q(('actividad__isnull', True), ('zona__isnull', True)), fields=('proyecto', 'fecha'), name='snapshot_evm_unico_total'),
+        ),
+    ]
@@ -3,10 +3,13 @@
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
+from django.core.validators import validate_comma_separated_integer_list
 from datetime import date, timedelta
-from django.db.models import Sum, Count, Max
+from django.db.models import Sum, Count, Max, F, Q, Value, DecimalField, IntegerField, Case, When
+from django.db.models.functions import Concat, Substr, Coalesce
 from functools import cached_property
 from django.contrib.auth.models import User
+from .calendario import obtener_calendario
 
 # --- CATÁLOGOS ---
 class Empresa(models.Model):
@@ -39,18 +42,42 @@ class Proyecto(models.Model):
     nombre = models.CharField(_("Nombre del Proyecto"), max_length=255, unique=True)
     fecha_inicio = models.DateField(_("Fecha de Inicio"))
     fecha_fin_estimada = models.DateField(_("Fecha de Finalización Estimada"))
+    dias_descanso = models.CharField(
+        _("Días de Descanso Semanal"), max_length=13, default='6', blank=True,
+        validators=[validate_comma_separated_integer_list],
+        help_text="Días de la semana no laborables separados por coma (0=Lunes ... 6=Domingo)."
+    )
+
+    @cached_property
+    def curva_valor_planeado(self):
+        # Se construye una vez por instancia; ver valor_planeado.CurvaValorPlaneado
+        from .valor_planeado import CurvaValorPlaneado
+        return CurvaValorPlaneado.para_proyecto(self)
 
     def get_valor_planeado_a_fecha(self, fecha_corte: date):
-        actividades_raiz = self.actividades.filter(padre__isnull=True)
-        return sum(act.get_valor_planeado_a_fecha(fecha_corte) for act in actividades_raiz)
+        return self.curva_valor_planeado.acumulado(fecha_corte)
 
     def get_valor_planeado_en_rango(self, fecha_inicio_rango: date, fecha_fin_rango: date):
-        actividades_raiz = self.actividades.filter(padre__isnull=True)
-        return sum(act.get_valor_planeado_en_rango(fecha_inicio_rango, fecha_fin_rango) for act in actividades_raiz)
+        return self.curva_valor_planeado.en_rango(fecha_inicio_rango, fecha_fin_rango)
 
     def __str__(self):
         return self.nombre
 
+class DiaNoLaborable(models.Model):
+    """ Festivos, paros u otros días sin trabajo propios de un proyecto. """
+    proyecto = models.ForeignKey(Proyecto, on_delete=models.CASCADE, related_name='dias_no_laborables')
+    fecha = models.DateField()
+    descripcion = models.CharField(max_length=255, blank=True, help_text="Ej: Día de la Independencia")
+
+    class Meta:
+        verbose_name = "Día No Laborable"
+        verbose_name_plural = "Días No Laborables"
+        unique_together = ('proyecto', 'fecha')
+        ordering = ['fecha']
+
+    def __str__(self):
+        return f"{self.fecha} ({self.descripcion})" if self.descripcion else str(self.fecha)
+
 class PartidaActividad(models.Model):
     nombre = models.CharField(max_length=255, unique=True)
     class Meta: verbose_name_plural = "Partidas de Actividades"
@@ -92,11 +119,12 @@ class MetaPorZona(models.Model):
             return 0
         if fecha_corte >= fecha_fin:
             return self.meta
-        dias_totales = sum(1 for i in range((fecha_fin - fecha_inicio).days + 1) if (fecha_inicio + timedelta(days=i)).weekday() != 6) # 6 = Domingo
+        calendario = obtener_calendario(self.actividad.proyecto_id)
+        dias_totales = calendario.dias_laborables(fecha_inicio, fecha_fin)
         if dias_totales == 0:
             return 0
         meta_diaria_zona = self.meta / dias_totales
-        dias_transcurridos = sum(1 for i in range((fecha_corte - fecha_inicio).days + 1) if (fecha_inicio + timedelta(days=i)).weekday() != 6)
+        dias_transcurridos = calendario.dias_laborables(fecha_inicio, fecha_corte)
         return round(dias_transcurridos * meta_diaria_zona, 2)
 
 class AvancePorZona(models.Model):
@@ -109,7 +137,127 @@ class AvancePorZona(models.Model):
         verbose_name_plural = "Avances por Zona"
         unique_together = ('avance_diario', 'zona')
 
-class Actividad(models.Model):
+# Separador del nombre completo de un nodo, igual que Actividad.__str__
+SEPARADOR_NOMBRE_COMPLETO = ' → '
+
+class NodoQuerySet(models.QuerySet):
+    def nombres_completos(self):
+        """
+        {id: 'Abuelo → Padre → Nodo'} de los nodos del queryset. Los nombres de
+        todos los ancestros salen de la ruta materializada en una sola consulta
+        extra, sin recorrer 'padre' nodo por nodo como hace __str__.
+        """
+        filas = list(self.values('id', 'nombre', 'ruta'))
+        ids = {int(pk) for fila in filas for pk in fila['ruta'].split('/') if pk}
+        nombres = dict(self.model.objects.filter(pk__in=ids).values_list('id', 'nombre')) if ids else {}
+        return {
+            fila['id']: SEPARADOR_NOMBRE_COMPLETO.join(
+                [nombres.get(int(pk), '?') for pk in fila['ruta'].split('/') if pk] + [fila['nombre']]
+            )
+            for fila in filas
+        }
+
+    def buscar(self, texto, limite=20):
+        """
+        Los primeros 'limite' nodos cuyo nombre contiene 'texto' (antes los que
+        empiezan así y los menos profundos) con su nombre completo, como
+        [{'id', 'text'}]. Son 2 consultas acotadas por 'limite', sin importar
+        el tamaño de la jerarquía.
+        """
+        nodos = self
+        orden = ['profundidad', 'nombre', 'pk']
+        if texto:
+            nodos = nodos.filter(nombre__icontains=texto).annotate(
+                _coincide_inicio=Case(
+                    When(nombre__istartswith=texto, then=Value(0)), default=Value(1), output_field=IntegerField()
+                )
+            )
+            orden.insert(0, '_coincide_inicio')
+        ids = list(nodos.order_by(*orden).values_list('pk', flat=True)[:limite])
+        nombres = self.model.objects.filter(pk__in=ids).nombres_completos()
+        return [{'id': pk, 'text': nombres[pk]} for pk in ids]
+
+class NodoJerarquico(models.Model):
+    """
+    Base abstracta para jerarquías padre/hijo (WBS y Cronograma) con "ruta
+    materializada": 'ruta' guarda los IDs de todos los ancestros ('1/5/12/'),
+    así descendientes, ancestros y profundidad se resuelven con una sola
+    consulta indexada en lugar de bajar nivel por nivel.
+    El modelo concreto debe definir el campo 'padre'.
+    """
+    ruta = models.CharField(max_length=500, default='', blank=True, editable=False, db_index=True)
+    profundidad = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def ruta_hijos(self):
+        """ Prefijo común de la ruta de todos los descendientes de este nodo. """
+        return f"{self.ruta}{self.pk}/"
+
+    @property
+    def ids_ancestros(self):
+        return [int(pk) for pk in self.ruta.split('/') if pk]
+
+    def descendientes(self):
+        return type(self).objects.filter(ruta__startswith=self.ruta_hijos)
+
+    def ancestros(self):
+        return type(self).objects.filter(pk__in=self.ids_ancestros).order_by('profundidad')
+
+    def es_descendiente_de(self, otro):
+        return self.ruta.startswith(otro.ruta_hijos)
+
+    @classmethod
+    def precargar_ancestros(cls, nodos):
+        """
+        Trae en una sola consulta los ancestros de todos los nodos dados y los
+        enlaza en memoria a través de 'padre', de modo que recorrer la cadena
+        (por ejemplo en __str__) ya no consulta la BD por cada nivel.
+        """
+        nodos = [nodo for nodo in nodos if nodo is not None]
+        ids = {pk for nodo in nodos for pk in nodo.ids_ancestros}
+        ancestros = cls.objects.in_bulk(ids)
+        for nodo in [*nodos, *ancestros.values()]:
+            if nodo.padre_id in ancestros:
+                nodo.padre = ancestros[nodo.padre_id]
+        return nodos
+
+    def save(self, *args, **kwargs):
+        modelo = type(self)
+        ruta_padre = ''
+        if self.padre_id:
+            ruta_padre = modelo.objects.filter(pk=self.padre_id).values_list('ruta', flat=True).first() or ''
+            if self.pk and (self.padre_id == self.pk or str(self.pk) in ruta_padre.split('/')):
+                raise ValidationError(_("Un elemento no puede depender de sí mismo ni de uno de sus descendientes."))
+            ruta_padre = f"{ruta_padre}{self.padre_id}/"
+
+        ruta_anterior = None
+        if self.pk:
+            ruta_anterior = modelo.objects.filter(pk=self.pk).values_list('ruta', flat=True).first()
+
+        self.ruta = ruta_padre
+        self.profundidad = ruta_padre.count('/')
+        super().save(*args, **kwargs)
+
+        if ruta_anterior is not None and ruta_anterior != self.ruta:
+            # Re-asignación de padre: se reescribe la ruta de todo el subárbol en un solo UPDATE
+            prefijo_anterior = f"{ruta_anterior}{self.pk}/"
+            modelo.objects.filter(ruta__startswith=prefijo_anterior).update(
+                ruta=Concat(Value(self.ruta_hijos), Substr('ruta', len(prefijo_anterior) + 1)),
+                profundidad=F('profundidad') + (self.ruta.count('/') - ruta_anterior.count('/')),
+            )
+
+def _suma_o_cero(campo):
+    return Coalesce(Sum(campo), Value(0, output_field=DecimalField(max_digits=14, decimal_places=2)))
+
+class ActividadQuerySet(NodoQuerySet):
+    def with_totals(self):
+        """ Anota la suma de metas por zona (_meta_total) en la misma consulta. """
+        return self.annotate(_meta_total=_suma_o_cero('metas_por_zona__meta'))
+
+class Actividad(NodoJerarquico):
     nombre = models.CharField(_("Nombre de Actividad/Categoría"), max_length=255)
     padre = models.ForeignKey(
         'self', on_delete=models.CASCADE, null=True, blank=True,
@@ -127,24 +275,47 @@ class Actividad(models.Model):
     fecha_inicio_programada = models.DateField(null=True, blank=True)
     fecha_fin_programada = models.DateField(null=True, blank=True)
 
+    # --- Totales materializados del WBS (los mantiene signals.py / wbs.actualizar_rollups) ---
+    meta_propia = models.DecimalField(_("Meta Propia"), max_digits=14, decimal_places=2, default=0, editable=False)
+    meta_subarbol = models.DecimalField(_("Meta del Subárbol"), max_digits=14, decimal_places=2, default=0, editable=False)
+    es_hoja = models.BooleanField(_("Es Hoja"), default=True, editable=False)
+    fecha_inicio_subarbol = models.DateField(null=True, blank=True, editable=False)
+    fecha_fin_subarbol = models.DateField(null=True, blank=True, editable=False)
+
+    objects = ActividadQuerySet.as_manager()
+
     @property
     def meta_total(self):
+        # Valor anotado por with_totals() o metas precargadas: no hace falta otra consulta
+        if hasattr(self, '_meta_total'):
+            return self._meta_total
+        if 'metas_por_zona' in getattr(self, '_prefetched_objects_cache', {}):
+            return sum((m.meta for m in self.metas_por_zona.all()), 0)
         metas_zonas = self.metas_por_zona.all()
         total = metas_zonas.aggregate(total=Sum('meta'))['total']
         return total or 0
 
     @cached_property
+    def arbol_wbs(self):
+        # WBS completo del proyecto en memoria (2 consultas), ver wbs.ArbolWBS
+        from .wbs import ArbolWBS
+        return ArbolWBS.cargar(self.proyecto_id)
+
+    @property
+    def nodo_wbs(self):
+        if not hasattr(self, '_nodo_wbs'):
+            self._nodo_wbs = self.arbol_wbs.nodo(self.pk)
+        return self._nodo_wbs
+
+    @property
     def cantidad_total_calculada(self):
-        sub_actividades = self.sub_actividades.all()
-        if sub_actividades.exists():
-            return sum(sub.cantidad_total_calculada for sub in sub_actividades)
-        return self.meta_total
+        return self.meta_subarbol
 
     @cached_property
     def dias_laborables_totales(self):
         if not self.fecha_inicio_programada or not self.fecha_fin_programada:
             return 0
-        return sum(1 for i in range((self.fecha_fin_programada - self.fecha_inicio_programada).days + 1) if (self.fecha_inicio_programada + timedelta(days=i)).weekday() != 6) # 6 = Domingo
+        return obtener_calendario(self.proyecto_id).dias_laborables(self.fecha_inicio_programada, self.fecha_fin_programada)
 
     @cached_property
     def meta_diaria(self):
@@ -154,54 +325,31 @@ class Actividad(models.Model):
         return self.meta_total / dias_totales
 
     def get_pv_diario(self, fecha: date):
-        sub_actividades = self.sub_actividades.all()
-        if sub_actividades.exists():
-            return 0
-        total_pv_diario_zonas = 0
-        metas_por_zona = self.metas_por_zona.all()
-        if metas_por_zona.exists():
-            for meta_zona in metas_por_zona:
-                fecha_inicio_zona = meta_zona.fecha_inicio_programada or self.fecha_inicio_programada
-                fecha_fin_zona = meta_zona.fecha_fin_programada or self.fecha_fin_programada
-                if not fecha_inicio_zona or not fecha_fin_zona:
-                    continue 
-                if (fecha_inicio_zona <= fecha <= fecha_fin_zona) and fecha.weekday() != 6: # 6 = Domingo
-                    dias_totales_zona = sum(1 for i in range((fecha_fin_zona - fecha_inicio_zona).days + 1) if (fecha_inicio_zona + timedelta(days=i)).weekday() != 6)
-                    if dias_totales_zona > 0:
-                        meta_diaria_zona = meta_zona.meta / dias_totales_zona
-                        total_pv_diario_zonas += meta_diaria_zona
-            return round(total_pv_diario_zonas, 2)
-        else:
+        # Importación local para evitar el ciclo models -> valor_planeado -> models
+        from .valor_planeado import pv_diario_de_metas
+
+        if self.sub_actividades.exists():
             return 0
+        metas_por_zona = self.metas_por_zona.values('meta', 'fecha_inicio_programada', 'fecha_fin_programada')
+        return pv_diario_de_metas(
+            list(metas_por_zona), fecha, obtener_calendario(self.proyecto_id),
+            self.fecha_inicio_programada, self.fecha_fin_programada,
+        )
 
     def get_valor_planeado_a_fecha(self, fecha_corte: date):
-        sub_actividades = self.sub_actividades.all()
-        if sub_actividades.exists():
-            return sum(sub.get_valor_planeado_a_fecha(fecha_corte) for sub in sub_actividades)
-        metas_por_zona = self.metas_por_zona.all()
-        if metas_por_zona.exists():
-            total_pv_zonas = 0
-            for meta_zona in metas_por_zona:
-                total_pv_zonas += meta_zona.get_valor_planeado_individual(fecha_corte)
-            return total_pv_zonas
-        else:
-            return 0
+        return self.nodo_wbs.get_valor_planeado_a_fecha(fecha_corte)
 
     def get_valor_planeado_en_rango(self, fecha_inicio_rango: date, fecha_fin_rango: date):
-        sub_actividades = self.sub_actividades.all()
-        if sub_actividades.exists():
-            return sum(sub.get_valor_planeado_en_rango(fecha_inicio_rango, fecha_fin_rango) for sub in sub_actividades)
-        total_pv_rango = 0
-        current_date = fecha_inicio_rango
-        while current_date <= fecha_fin_rango:
-            total_pv_rango += self.get_pv_diario(current_date)
-            current_date += timedelta(days=1)
-        return round(total_pv_rango, 2)
+        return self.nodo_wbs.get_valor_planeado_en_rango(fecha_inicio_rango, fecha_fin_rango)
 
     class Meta:
         verbose_name = "Actividad (WBS)"
         verbose_name_plural = "Actividades (WBS)"
         unique_together = ('nombre', 'padre', 'proyecto')
+        indexes = [
+            # Búsqueda del autocompletado, siempre acotada a un proyecto
+            models.Index(fields=['proyecto', 'nombre'], name='actividad_proyecto_nombre_idx'),
+        ]
 
     def __str__(self):
         if self.padre: return f"{self.padre} → {self.nombre}"
@@ -220,6 +368,11 @@ class ReportePersonal(models.Model):
         unique_together = ('proyecto', 'fecha', 'empresa', 'cargo', 'partida', 'area_de_trabajo')
     def __str__(self): return f"{self.fecha}: {self.cantidad} x {self.cargo.nombre}"
 
+class AvanceDiarioQuerySet(models.QuerySet):
+    def with_totals(self):
+        """ Anota la suma de cantidades por zona (_cantidad_total) en la misma consulta. """
+        return self.annotate(_cantidad_total=_suma_o_cero('avances_por_zona__cantidad'))
+
 class AvanceDiario(models.Model):
     actividad = models.ForeignKey(Actividad, on_delete=models.CASCADE, related_name="avances")
     fecha_reporte = models.DateField()
@@ -236,14 +389,23 @@ class AvanceDiario(models.Model):
         verbose_name=_("Desglose de Avance por Zona")
     )
 
+    objects = AvanceDiarioQuerySet.as_manager()
+
     @property
     def cantidad_total(self):
-        avances_zonas = self.avances_por_zona.all()
-        total = avances_zonas.aggregate(total=Sum('cantidad'))['total']
+        # Valor anotado por with_totals() o zonas precargadas: no hace falta otra consulta
+        if hasattr(self, '_cantidad_total'):
+            return self._cantidad_total
+        if 'avances_por_zona' in getattr(self, '_prefetched_objects_cache', {}):
+            return sum((a.cantidad for a in self.avances_por_zona.all()), 0)
+        total = self.avances_por_zona.aggregate(total=Sum('cantidad'))['total']
         return total or 0
 
     @property
     def cantidad_programada_dia(self):
+        # Si la vista ya lo calculó por lotes (anotar_programado_diario) no se vuelve a consultar
+        if hasattr(self, '_cantidad_programada_dia'):
+            return self._cantidad_programada_dia
         return self.actividad.get_pv_diario(self.fecha_reporte)
 
     class Meta:
@@ -293,6 +455,80 @@ class ReporteClima(models.Model):
     def __str__(self):
         return f"Clima del {self.fecha}"
     
+# --- SNAPSHOTS DIARIOS DE EVM ---
+
+class SnapshotEVM(models.Model):
+    """
+    Foto diaria precalculada de PV/EV/SPI. actividad y zona nulas = total del proyecto.
+    La llena el comando 'generar_snapshots_evm' (ver evm.py).
+    """
+    proyecto = models.ForeignKey(Proyecto, on_delete=models.CASCADE, related_name='snapshots_evm')
+    actividad = models.ForeignKey('Actividad', on_delete=models.CASCADE, null=True, blank=True, related_name='snapshots_evm')
+    zona = models.ForeignKey(AreaDeTrabajo, on_delete=models.CASCADE, null=True, blank=True)
+    fecha = models.DateField()
+    pv_diario = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    ev_diario = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    pv_acumulado = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    ev_acumulado = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    spi = models.DecimalField(max_digits=8, decimal_places=3, null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Snapshot EVM"
+        verbose_name_plural = "Snapshots EVM"
+        # En un UNIQUE los NULL nunca chocan: las filas con actividad o zona
+        # nulas necesitan su propia restricción parcial
+        constraints = [
+            models.UniqueConstraint(
+                fields=['proyecto', 'actividad', 'zona', 'fecha'], name='snapshot_evm_unico',
+            ),
+            models.UniqueConstraint(
+                fields=['proyecto', 'actividad', 'fecha'], condition=Q(zona__isnull=True),
+                name='snapshot_evm_unico_sin_zona',
+            ),
+            models.UniqueConstraint(
+                fields=['proyecto', 'fecha'], condition=Q(actividad__isnull=True, zona__isnull=True),
+                name='snapshot_evm_unico_total',
+            ),
+        ]
+        indexes = [models.Index(fields=['proyecto', 'fecha'])]
+        ordering = ['-fecha']
+
+    def __str__(self):
+        return f"EVM {self.proyecto} {self.fecha}"
+
+class EstadoSnapshotEVM(models.Model):
+    """
+    Control incremental de los snapshots de un proyecto: hasta qué día están
+    calculados y desde qué día hay que recalcular porque cambiaron sus insumos.
+    """
+    proyecto = models.OneToOneField(Proyecto, on_delete=models.CASCADE, related_name='estado_snapshot_evm')
+    ultima_fecha = models.DateField(null=True, blank=True)
+    recalcular_desde = models.DateField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Estado de Snapshots EVM"
+        verbose_name_plural = "Estados de Snapshots EVM"
+
+    def __str__(self):
+        return f"{self.proyecto}: hasta {self.ultima_fecha}"
+
+class VersionDatos(models.Model):
+    """
+    Contador de versión por conjunto de datos (ej. 'evm:3'). Se incrementa al
+    guardar/borrar los modelos de ese conjunto y sirve como clave de caché
+    compartida entre todos los procesos del servidor (ver versiones.py).
+    """
+    nombre = models.CharField(max_length=100, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Versión de Datos"
+        verbose_name_plural = "Versiones de Datos"
+
+    def __str__(self):
+        return f"{self.nombre} v{self.version}"
+
 # --- MODELOS BIM ---
     
 class TipoElemento(models.Model):
@@ -341,6 +577,12 @@ class ElementoConstructivo(models.Model):
     Representa cada objeto físico conceptual en la obra (el "código de ejes"). 
     Ej: Zapata Z-10. Este elemento puede tener MÚLTIPLES GUIDs asociados.
     """
+    # Las etiquetas son los textos que lee el plugin de Navisworks
+    ESTADOS_AVANCE = [
+        ('pendiente', 'Pendiente'),
+        ('proceso', 'En Proceso'),
+        ('completado', 'Completado'),
+    ]
     
     identificador_unico = models.CharField(
         _("Código de Ejes / ID Humano"), 
@@ -352,6 +594,17 @@ class ElementoConstructivo(models.Model):
 
     tipo_elemento = models.ForeignKey(TipoElemento, on_delete=models.PROTECT, related_name='elementos')
     descripcion = models.CharField(_("Descripción Adicional"), max_length=255, blank=True, null=True)
+    # También se toca cuando cambia su resumen de avance (estado_bim.actualizar_resumenes)
+    actualizado_en = models.DateTimeField(_("Actualizado en"), auto_now=True, db_index=True)
+
+    # --- Resumen materializado del avance (lo mantienen signals.py / estado_bim.actualizar_resumenes) ---
+    total_pasos = models.PositiveIntegerField(_("Total de Pasos"), default=0, editable=False)
+    pasos_completados = models.PositiveIntegerField(_("Pasos Completados"), default=0, editable=False)
+    fecha_primer_avance = models.DateField(null=True, blank=True, editable=False)
+    fecha_ultimo_avance = models.DateField(null=True, blank=True, editable=False)
+    estado_avance = models.CharField(
+        _("Estado de Avance"), max_length=12, choices=ESTADOS_AVANCE, default='pendiente', editable=False
+    )
 
     class Meta:
         verbose_name = _("Elemento Constructivo")
@@ -360,31 +613,18 @@ class ElementoConstructivo(models.Model):
 
     def __str__(self):
         return self.identificador_unico
-    
-    @property
-    def total_pasos(self):
-        if not hasattr(self, '_total_pasos'):
-            self._total_pasos = self.tipo_elemento.pasos_proceso.count()
-        return self._total_pasos
 
-    @property
-    def pasos_completados(self):
-        if not hasattr(self, '_pasos_completados'):
-            self._pasos_completados = self.avances_proceso.count()
-        return self._pasos_completados
+    @staticmethod
+    def estado_desde_conteos(completados, totales):
+        if completados == 0:
+            return 'pendiente'
+        if totales > 0 and completados >= totales:
+            return 'completado'
+        return 'proceso'
 
     @property
     def status(self):
-        # Usamos getattr para poder aprovechar los valores 'anotados' por el
-        # queryset de la API, y si no existen, los calculamos.
-        completados = getattr(self, 'pasos_completados', self.avances_proceso.count())
-        totales = getattr(self, 'total_pasos', self.tipo_elemento.pasos_proceso.count())
-
-        if completados == 0:
-            return "Pendiente"
-        if totales > 0 and completados >= totales:
-            return "Completado"
-        return "En Proceso"
+        return self.get_estado_avance_display()
 
 class ElementoBIM_GUID(models.Model):
     """
@@ -405,6 +645,7 @@ class ElementoBIM_GUID(models.Model):
         db_index=True,
         help_text=_("El GUID único inmutable del modelo BIM (ej. 1a2b3c4d-...).")
     )
+    actualizado_en = models.DateTimeField(_("Actualizado en"), auto_now=True, db_index=True)
     
     class Meta:
         verbose_name = _("GUID de Elemento BIM")
@@ -421,6 +662,7 @@ class AvanceProcesoElemento(models.Model):
     elemento = models.ForeignKey(ElementoConstructivo, on_delete=models.CASCADE, related_name='avances_proceso')
     paso_proceso = models.ForeignKey(PasoProcesoTipoElemento, on_delete=models.PROTECT)
     fecha_finalizacion = models.DateField(_("Fecha de Finalización"))
+    actualizado_en = models.DateTimeField(_("Actualizado en"), auto_now=True, db_index=True)
 
     class Meta:
         verbose_name = _("Avance de Proceso por Elemento")
@@ -443,8 +685,27 @@ class AvanceProcesoElemento(models.Model):
              raise ValidationError(
                  _("La fecha de finalización no puede ser una fecha futura."), code='fecha_futura'
              )
-             
-class Cronograma(models.Model):
+
+class EliminacionBIM(models.Model):
+    """
+    Registro de borrados para la sincronización incremental del Timeliner
+    (api/bim/status-general/?since=...). Un borrado ya no deja fila con
+    'actualizado_en': se anota aquí el GUID eliminado o el elemento cuyo
+    avance se eliminó (su estado y fechas cambian). Lo llenan las señales.
+    """
+    identificador_bim = models.CharField(_("GUID eliminado"), max_length=255, blank=True)
+    # Sin FK: el elemento puede haberse eliminado también
+    elemento_id_afectado = models.PositiveIntegerField(_("Elemento con avance eliminado"), null=True, blank=True)
+    eliminado_en = models.DateTimeField(_("Eliminado en"), auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = _("Eliminación BIM")
+        verbose_name_plural = _("Eliminaciones BIM")
+
+    def __str__(self):
+        return f"{self.identificador_bim or f'Elemento {self.elemento_id_afectado}'} ({self.eliminado_en:%Y-%m-%d %H:%M})"
+
+class Cronograma(NodoJerarquico):
     """
     Modelo MAESTRO. Solo define la jerarquía (WBS).
     Ya no guarda fechas ni zonas directamente.
@@ -456,10 +717,15 @@ class Cronograma(models.Model):
     # NOTA: Se han eliminado fecha_inicio_prog, fecha_fin_prog, etc.
     # y el campo 'zonas'. Ahora todo eso vive en CronogramaPorZona.
 
+    objects = NodoQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Actividad de Cronograma"
         verbose_name_plural = "Cronograma (Jerarquía)"
         ordering = ['id']
+        indexes = [
+            models.Index(fields=['proyecto', 'nombre'], name='cronograma_proyecto_nombre_idx'),
+        ]
 
     def __str__(self):
         return self.nombre
@@ -572,4 +838,26 @@ class Observacion(models.Model):
         ordering = ['-fecha', 'zona']
 
     def __str__(self):
-        return f"{self.fecha} - {self.zona}: {self.nombre} ({self.get_estado_display()})"
\ No newline at end of file
+        return f"{self.fecha} - {self.zona}: {self.nombre} ({self.get_estado_display()})"
+# --- SINCRONIZACIÓN DE CLIENTES MÓVILES ---
+
+class OperacionSincronizada(models.Model):
+    """
+    Registro de cada cambio aplicado desde un lote de sincronización móvil
+    (ver sincronizacion.py). La 'clave' la genera el teléfono al guardar el
+    cambio sin conexión; si el lote se reenvía (respuesta perdida, reintento)
+    la operación no se vuelve a aplicar y se devuelve el resultado guardado.
+    """
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='operaciones_sincronizadas')
+    clave = models.CharField(max_length=100)
+    tipo = models.CharField(max_length=30)
+    resultado = models.JSONField(default=dict)
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Operación Sincronizada"
+        verbose_name_plural = "Operaciones Sincronizadas"
+        unique_together = ('usuario', 'clave')
+
+    def __str__(self):
+        return f"{self.usuario} {self.tipo} [{self.clave}]"
@@ -0,0 +1,160 @@
+# actividades/pronostico.py
+
+from datetime import date, timedelta
+from decimal import Decimal
+from math import ceil
+from django.db.models import Sum, Min, Max
+from .models import Actividad, AvancePorZona
+from .valor_planeado import CurvaValorPlaneado
+
+CERO = Decimal('0')
+
+
+def _a_float(valor, decimales=2):
+    return None if valor is None else round(float(valor), decimales)
+
+
+def _pronostico_zona(meta, ev, primer_reporte, ultimo_reporte, fecha_corte, calendario):
+    """ Ritmo real de una zona (EV / días laborables trabajados) y su fecha de término a ese ritmo. """
+    restante = max(meta - ev, CERO)
+    dias_trabajados = calendario.dias_laborables(primer_reporte, fecha_corte) if primer_reporte else 0
+    tasa = ev / dias_trabajados if dias_trabajados and ev > 0 else None
+
+    if restante == 0:
+        fin = ultimo_reporte
+    elif tasa:
+        fin = calendario.sumar_dias_laborables(fecha_corte, ceil(restante / tasa))
+    else:
+        fin = None
+    return restante, tasa, fin
+
+
+def _tiempo_ganado(curva, actividad_id, ev, meta, inicio, duracion_planeada):
+    """
+    Earned Schedule: días laborables (desde el inicio programado) en los que
+    el plan preveía haber ganado el EV actual. Se busca en la curva PV de la
+    actividad con búsqueda binaria y se interpola dentro del día.
+    """
+    if ev <= 0:
+        return CERO
+    if ev >= meta:
+        return Decimal(duracion_planeada)
+    alcance = curva.fecha_en_que_alcanza(ev, actividad_id=actividad_id)
+    if alcance is None:
+        return Decimal(duracion_planeada)
+    fecha, fraccion = alcance
+    return curva.calendario.dias_laborables(inicio, fecha - timedelta(days=1)) + fraccion
+
+
+def pronosticar_proyecto(proyecto, fecha_corte=None, actividad_ids=None):
+    """
+    Pronóstico de término de cada actividad hoja del proyecto al ritmo actual.
+
+    Por cada (actividad, zona) calcula el ritmo real de producción y la fecha
+    en que terminaría la cantidad restante; la actividad termina cuando
+    termina su última zona. Además calcula el EVM en tiempo (Earned Schedule):
+    SPI(t) = ES / AT y la duración estimada = duración planeada / SPI(t).
+
+    Todo sale de la curva PV en memoria y de una consulta agregada de EV, así
+    que el número de consultas no depende de cuántas actividades haya. Con
+    'actividad_ids' solo se cargan y pronostican esas actividades (el
+    pronóstico de cada una no depende de las demás).
+    """
+    fecha_corte = fecha_corte or date.today()
+    if actividad_ids is None:
+        curva = proyecto.curva_valor_planeado
+    else:
+        curva = CurvaValorPlaneado.para_proyecto(proyecto, actividad_ids)
+    calendario = curva.calendario
+
+    metas = {}
+    ventanas = {}
+    for fila in curva.filas:
+        par = (fila['actividad_id'], fila['zona_id'])
+        metas[par] = metas.get(par, CERO) + fila['meta']
+        inicio, fin = ventanas.get(fila['actividad_id'], (fila['inicio'], fila['fin']))
+        ventanas[fila['actividad_id']] = (min(inicio, fila['inicio']), max(fin, fila['fin']))
+
+    avances_ev = AvancePorZona.objects.filter(
+        avance_diario__actividad__proyecto=proyecto, avance_diario__fecha_reporte__lte=fecha_corte
+    )
+    if actividad_ids is not None:
+        avances_ev = avances_ev.filter(avance_diario__actividad_id__in=actividad_ids)
+    avances = {
+        (f['avance_diario__actividad_id'], f['zona_id']): f
+        for f in avances_ev.values('avance_diario__actividad_id', 'zona_id').annotate(
+            total=Sum('cantidad'),
+            primer_reporte=Min('avance_diario__fecha_reporte'),
+            ultimo_reporte=Max('avance_diario__fecha_reporte'),
+        )
+    }
+
+    zonas_por_actividad = {}
+    for par in metas:
+        zonas_por_actividad.setdefault(par[0], []).append(par)
+
+    datos_actividades = Actividad.objects.filter(pk__in=ventanas).values('id', 'nombre', 'unidad_medida')
+
+    resultados = []
+    for datos in datos_actividades:
+        actividad_id = datos['id']
+        inicio, fin_programado = ventanas[actividad_id]
+
+        meta_total = ev_total = restante_total = CERO
+        tasa_total = None
+        fines = []
+        zonas = []
+        for par in sorted(zonas_por_actividad[actividad_id], key=lambda p: (p[1] is None, p[1])):
+            avance = avances.get(par, {})
+            meta = metas[par]
+            ev = avance.get('total') or CERO
+            restante, tasa, fin = _pronostico_zona(
+                meta, ev, avance.get('primer_reporte'), avance.get('ultimo_reporte'), fecha_corte, calendario
+            )
+            meta_total += meta
+            ev_total += ev
+            restante_total += restante
+            if tasa:
+                tasa_total = (tasa_total or CERO) + tasa
+            fines.append(fin)
+            zonas.append({
+                'zona_id': par[1],
+                'meta': _a_float(meta),
+                'ev': _a_float(ev),
+                'restante': _a_float(restante),
+                'tasa_diaria': _a_float(tasa, 3),
+                'fin_pronosticado': fin,
+            })
+
+        duracion_planeada = calendario.dias_laborables(inicio, fin_programado)
+        tiempo_actual = calendario.dias_laborables(inicio, fecha_corte)
+        tiempo_ganado = _tiempo_ganado(curva, actividad_id, ev_total, meta_total, inicio, duracion_planeada)
+        spi_t = tiempo_ganado / tiempo_actual if tiempo_actual else None
+        duracion_estimada = duracion_planeada / spi_t if spi_t else None
+
+        resultados.append({
+            'actividad_id': actividad_id,
+            'nombre': datos['nombre'],
+            'unidad_medida': datos['unidad_medida'],
+            'meta': _a_float(meta_total),
+            'ev': _a_float(ev_total),
+            'restante': _a_float(restante_total),
+            'porcentaje': _a_float(ev_total / meta_total * 100) if meta_total else None,
+            'tasa_diaria': _a_float(tasa_total, 3),
+            'fin_programado': fin_programado,
+            # Sin ritmo medible en alguna zona no se puede pronosticar el término
+            'fin_pronosticado': max(fines) if fines and None not in fines else None,
+            'duracion_planeada': duracion_planeada,
+            'tiempo_actual': tiempo_actual,
+            'tiempo_ganado': _a_float(tiempo_ganado),
+            'spi_t': _a_float(spi_t, 3),
+            'duracion_estimada': _a_float(duracion_estimada),
+            'fin_estimado_es': (
+                calendario.sumar_dias_laborables(inicio - timedelta(days=1), ceil(duracion_estimada))
+                if duracion_estimada else None
+            ),
+            'zonas': zonas,
+        })
+
+    resultados.sort(key=lambda r: (r['nombre'], r['actividad_id']))
+    return resultados
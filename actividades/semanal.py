@@ -0,0 +1,120 @@
+# actividades/semanal.py
+
+from datetime import date
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery, Sum
+from .models import Semana, AvancePorZona, ReportePersonal, ReporteDiarioMaquinaria
+from .versiones import obtener_versiones, clave_evm, clave_reportes, CLAVE_REPORTES_OBRA
+
+# Las semanas cerradas no cambian salvo correcciones. Una corrección incrementa
+# alguna de las versiones de la clave (ver signals.py), así la entrada vieja
+# deja de usarse en todos los procesos del servidor.
+RESUMEN_SEMANA_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+
+
+def _clave_cache(proyecto_id, numero_semana, versiones):
+    return f"resumen_semana:{proyecto_id}:{numero_semana}:{':'.join(map(str, versiones))}"
+
+
+def _agrupar_por_semana(queryset, campo_fecha, campos, sumas):
+    """
+    Asigna a cada hecho su Semana del catálogo con una subconsulta (en SQL, sin
+    repetir el filtro de fechas por semana) y agrupa por semana + campos.
+    'campos' es {nombre_salida: campo_orm}.
+    """
+    semana = Semana.objects.filter(
+        fecha_inicio__lte=OuterRef(campo_fecha), fecha_fin__gte=OuterRef(campo_fecha)
+    ).values('numero_semana')[:1]
+    filas = queryset.annotate(semana_num=Subquery(semana)).values(
+        'semana_num', *campos.values()
+    ).annotate(**sumas).order_by('semana_num', *campos.values())
+    for fila in filas:
+        datos = {nombre: fila[campo] for nombre, campo in campos.items()}
+        datos.update({nombre: fila[nombre] for nombre in sumas})
+        yield fila['semana_num'], datos
+
+
+def _calcular_semanas(proyecto, semanas):
+    """ Totales por partida y zona de las semanas indicadas (3 consultas agrupadas). """
+    resultado = {
+        s.numero_semana: {
+            'numero_semana': s.numero_semana,
+            'fecha_inicio': s.fecha_inicio,
+            'fecha_fin': s.fecha_fin,
+            'avance': [],
+            'personal': [],
+            'maquinaria': [],
+        }
+        for s in semanas
+    }
+    rango = (min(s.fecha_inicio for s in semanas), max(s.fecha_fin for s in semanas))
+
+    hechos = (
+        ('avance', _agrupar_por_semana(
+            AvancePorZona.objects.filter(
+                avance_diario__actividad__proyecto=proyecto, avance_diario__fecha_reporte__range=rango
+            ),
+            'avance_diario__fecha_reporte',
+            {
+                'partida_id': 'avance_diario__actividad__partida_id', 'partida': 'avance_diario__actividad__partida__nombre',
+                'zona_id': 'zona_id', 'zona': 'zona__nombre',
+            },
+            {'cantidad': Sum('cantidad')},
+        )),
+        ('personal', _agrupar_por_semana(
+            ReportePersonal.objects.filter(proyecto=proyecto, fecha__range=rango),
+            'fecha',
+            {
+                'partida_id': 'partida_id', 'partida': 'partida__nombre',
+                'zona_id': 'area_de_trabajo_id', 'zona': 'area_de_trabajo__nombre',
+            },
+            {'cantidad': Sum('cantidad')},
+        )),
+        # La maquinaria no está ligada a un proyecto: se reporta la de toda la obra
+        ('maquinaria', _agrupar_por_semana(
+            ReporteDiarioMaquinaria.objects.filter(fecha__range=rango),
+            'fecha',
+            {
+                'partida_id': 'partida_id', 'partida': 'partida__nombre',
+                'zona_id': 'zona_trabajo_id', 'zona': 'zona_trabajo__nombre',
+            },
+            {'cantidad_total': Sum('cantidad_total'), 'cantidad_activa': Sum('cantidad_activa')},
+        )),
+    )
+    for tipo, filas in hechos:
+        for numero_semana, datos in filas:
+            if numero_semana in resultado:
+                resultado[numero_semana][tipo].append(datos)
+    return resultado
+
+
+def resumen_semanal(proyecto, semana_desde, semana_hasta):
+    """
+    Totales semanales de avance, personal y maquinaria por partida y zona para
+    el rango de semanas [semana_desde, semana_hasta] (números del catálogo).
+    Las semanas cerradas se leen de caché; solo las que faltan (y la semana en
+    curso) se calculan, todas juntas en las mismas consultas.
+    """
+    semanas = list(Semana.objects.filter(numero_semana__range=(semana_desde, semana_hasta)).order_by('numero_semana'))
+    if not semanas:
+        return []
+
+    hoy = date.today()
+    cerradas = {s.numero_semana for s in semanas if s.fecha_fin < hoy}
+    # Avances y partidas (evm), reportes de personal, maquinaria y catálogo de semanas
+    versiones = obtener_versiones(clave_evm(proyecto.pk), clave_reportes(proyecto.pk), CLAVE_REPORTES_OBRA)
+    claves = {numero: _clave_cache(proyecto.pk, numero, versiones) for numero in cerradas}
+    en_cache = cache.get_many(claves.values())
+    resultado = {numero: en_cache[clave] for numero, clave in claves.items() if clave in en_cache}
+
+    faltantes = [s for s in semanas if s.numero_semana not in resultado]
+    if faltantes:
+        calculadas = _calcular_semanas(proyecto, faltantes)
+        cache.set_many(
+            {claves[numero]: datos for numero, datos in calculadas.items() if numero in cerradas},
+            RESUMEN_SEMANA_CACHE_TIMEOUT,
+        )
+        resultado.update(calculadas)
+
+    return [dict(resultado[s.numero_semana], cerrada=s.numero_semana in cerradas) for s in semanas]
+
@@ -1,36 +1,75 @@
 # actividades/serializers.py
 
+from datetime import date
+from decimal import Decimal
 from rest_framework import serializers
-from .models import ElementoConstructivo, ElementoBIM_GUID
-
-class ElementoBIM_GUID_Serializer(serializers.ModelSerializer):
-    
-    id_navisworks = serializers.CharField(source='identificador_bim')
-    identificador_unico = serializers.CharField(source='elemento_constructivo.identificador_unico')
-    status = serializers.CharField(source='elemento_constructivo.status')
-
-    # Campo existente (Fin)
-    fecha_fin = serializers.DateField(
-        source='ultima_fecha', 
-        read_only=True, 
-        format='%Y-%m-%d', 
-        allow_null=True
-    )
-
-    # [3] NUEVO CAMPO: Fecha de Inicio (Timeliner ActualStart)
-    fecha_inicio = serializers.DateField(
-        source='primera_fecha',   # Viene del annotate Min en la vista
-        read_only=True, 
-        format='%Y-%m-%d', 
-        allow_null=True
-    )
-
-    class Meta:
-        model = ElementoBIM_GUID 
-        fields = [
-            'id_navisworks',       
-            'identificador_unico', 
-            'status',              
-            'fecha_inicio', # <--- [4] NO OLVIDES AGREGARLO AQUI
-            'fecha_fin'            
-        ]
\ No newline at end of file
+from .models import Observacion
+
+# --- SINCRONIZACIÓN MÓVIL (ver sincronizacion.py) ---
+# Los IDs llegan como enteros y su existencia se valida después para todo el
+# lote junto, así validar 500 operaciones no cuesta 500 consultas.
+
+TIPOS_OPERACION = ('cronograma_fechas', 'avance_diario', 'observacion_crear', 'observacion_estado')
+
+class OperacionSincronizacionSerializer(serializers.Serializer):
+    clave = serializers.CharField(max_length=100)
+    tipo = serializers.ChoiceField(choices=TIPOS_OPERACION)
+    datos = serializers.DictField()
+
+class LoteSincronizacionSerializer(serializers.Serializer):
+    operaciones = OperacionSincronizacionSerializer(many=True, allow_empty=False, max_length=500)
+
+class FechasCronogramaSerializer(serializers.Serializer):
+    """ Fechas reales de una tarea en una zona. Solo se cambian las fechas enviadas (null las borra). """
+    tarea_id = serializers.IntegerField()
+    zona_id = serializers.IntegerField()
+    fecha_inicio_real = serializers.DateField(required=False, allow_null=True)
+    fecha_fin_real = serializers.DateField(required=False, allow_null=True)
+
+    def validate(self, datos):
+        if 'fecha_inicio_real' not in datos and 'fecha_fin_real' not in datos:
+            raise serializers.ValidationError("Envía al menos una fecha real.")
+        inicio, fin = datos.get('fecha_inicio_real'), datos.get('fecha_fin_real')
+        if inicio and fin and fin < inicio:
+            raise serializers.ValidationError("La fecha de fin real es anterior a la de inicio.")
+        return datos
+
+class CantidadZonaSerializer(serializers.Serializer):
+    zona_id = serializers.IntegerField()
+    cantidad = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0'))
+
+class AvanceDiarioSincronizacionSerializer(serializers.Serializer):
+    """
+    Avance de una actividad en un día. Las zonas enviadas reemplazan a las
+    guardadas: las que no vienen en 'zonas' se borran de ese día y empresa.
+    """
+    actividad_id = serializers.IntegerField()
+    fecha_reporte = serializers.DateField()
+    empresa_id = serializers.IntegerField(required=False)
+    zonas = CantidadZonaSerializer(many=True, allow_empty=False)
+
+    def validate_fecha_reporte(self, fecha):
+        if fecha > date.today():
+            raise serializers.ValidationError("No puedes hacer registros para una fecha futura.")
+        return fecha
+
+class ObservacionCrearSerializer(serializers.Serializer):
+    fecha = serializers.DateField(default=date.today)
+    zona_id = serializers.IntegerField()
+    nombre = serializers.CharField(max_length=255)
+    comentario = serializers.CharField()
+    estado = serializers.ChoiceField(choices=Observacion.ESTADOS, default='pendiente')
+
+class ObservacionEstadoSerializer(serializers.Serializer):
+    """
+    Cambio de estado de una observación, identificada por su ID o, si se creó
+    sin conexión, por la clave de la operación que la creó.
+    """
+    observacion_id = serializers.IntegerField(required=False)
+    clave_observacion = serializers.CharField(max_length=100, required=False)
+    estado = serializers.ChoiceField(choices=Observacion.ESTADOS)
+
+    def validate(self, datos):
+        if ('observacion_id' in datos) == ('clave_observacion' in datos):
+            raise serializers.ValidationError("Indica 'observacion_id' o 'clave_observacion' (solo uno).")
+        return datos
@@ -0,0 +1,217 @@
+# actividades/signals.py
+
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .wbs import actualizar_rollups
+from .estado_bim import actualizar_resumenes
+from .evm import marcar_recalculo
+from .versiones import (
+    incrementar_version, clave_evm, clave_reportes, clave_calendario, CLAVE_REPORTES_OBRA, CLAVE_BIM, CLAVE_CRONOGRAMA,
+)
+from .models import (
+    Proyecto, DiaNoLaborable, Actividad, MetaPorZona, AvanceDiario, AvancePorZona,
+    Semana, ReportePersonal, ReporteDiarioMaquinaria,
+    ElementoConstructivo, ElementoBIM_GUID, PasoProcesoTipoElemento, AvanceProcesoElemento, EliminacionBIM,
+    Cronograma, CronogramaPorZona,
+)
+
+# --- ESCRITURAS EN BLOQUE ---
+# bulk_create, bulk_update y update() no ejecutan save() ni disparan estas
+# señales. Las rutas que escriben en lote (captura en cuadrícula, importación
+# del WBS, registro BIM por lote, sincronización móvil) evitan así una
+# cascada de consultas por fila y, a cambio, hacen ellas mismas lo que harían
+# los receptores de abajo, una sola vez para todo el lote:
+#   - avances y metas: evm.marcar_recalculo() e incrementar_version(clave_evm(...))
+#   - actividades: ruta/profundidad y wbs.recalcular_rollups() o actualizar_rollups()
+#   - BIM: estado_bim.actualizar_resumenes() e incrementar_version(CLAVE_BIM)
+#   - cronograma: incrementar_version(CLAVE_CRONOGRAMA)
+# Si se agrega un receptor aquí, hay que revisar también esas rutas.
+
+def _datos_evm_modificados(proyecto_id, fecha):
+    """ Marca los snapshots a recalcular e invalida las cachés de PV/EV del proyecto. """
+    marcar_recalculo(proyecto_id, fecha)
+    if proyecto_id is not None:
+        incrementar_version(clave_evm(proyecto_id))
+
+# --- CALENDARIO LABORAL ---
+
+@receiver(post_save, sender=Proyecto)
+def proyecto_guardado(sender, instance, created, raw=False, **kwargs):
+    incrementar_version(clave_calendario(instance.pk))
+    if not created and not raw:
+        # Puede haber cambiado el calendario (días de descanso)
+        _datos_evm_modificados(instance.pk, instance.fecha_inicio)
+
+@receiver([post_save, post_delete], sender=DiaNoLaborable)
+def dia_no_laborable_modificado(sender, instance, raw=False, **kwargs):
+    incrementar_version(clave_calendario(instance.proyecto_id))
+    if not raw:
+        _datos_evm_modificados(instance.proyecto_id, instance.fecha)
+
+# --- TOTALES MATERIALIZADOS DEL WBS ---
+
+@receiver(pre_save, sender=Actividad)
+def actividad_antes_de_guardar(sender, instance, raw=False, **kwargs):
+    # Guardamos el padre anterior para poder actualizar también la rama que abandona
+    instance._padre_id_anterior = None
+    instance._fecha_inicio_anterior = None
+    if instance.pk and not raw:
+        anterior = Actividad.objects.filter(pk=instance.pk).values('padre_id', 'fecha_inicio_subarbol').first()
+        if anterior:
+            instance._padre_id_anterior = anterior['padre_id']
+            instance._fecha_inicio_anterior = anterior['fecha_inicio_subarbol']
+
+@receiver(post_save, sender=Actividad)
+def actividad_guardada(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    actualizar_rollups(instance.pk)
+    padre_anterior = getattr(instance, '_padre_id_anterior', None)
+    if created or padre_anterior != instance.padre_id:
+        # El nodo puede no cambiar, pero sus padres (nuevo y anterior) sí
+        actualizar_rollups(instance.padre_id)
+        actualizar_rollups(padre_anterior)
+    # Cambios de fechas o de jerarquía mueven el PV desde el inicio de la rama afectada
+    _datos_evm_modificados(instance.proyecto_id, getattr(instance, '_fecha_inicio_anterior', None))
+    for pk in {instance.pk, instance.padre_id, padre_anterior}:
+        _marcar_recalculo_actividad(pk)
+
+@receiver(post_delete, sender=Actividad)
+def actividad_eliminada(sender, instance, **kwargs):
+    actualizar_rollups(instance.padre_id)
+    _datos_evm_modificados(instance.proyecto_id, instance.fecha_inicio_subarbol)
+
+@receiver(pre_save, sender=MetaPorZona)
+def meta_por_zona_antes_de_guardar(sender, instance, raw=False, **kwargs):
+    instance._fecha_inicio_anterior = None
+    if instance.pk and not raw:
+        instance._fecha_inicio_anterior = (
+            MetaPorZona.objects.filter(pk=instance.pk).values_list('fecha_inicio_programada', flat=True).first()
+        )
+
+@receiver([post_save, post_delete], sender=MetaPorZona)
+def meta_por_zona_modificada(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    actualizar_rollups(instance.actividad_id)
+    actividad = Actividad.objects.filter(pk=instance.actividad_id).values('proyecto_id', 'fecha_inicio_programada').first()
+    if actividad:
+        fechas = [f for f in (
+            instance.fecha_inicio_programada, getattr(instance, '_fecha_inicio_anterior', None),
+            actividad['fecha_inicio_programada'],
+        ) if f]
+        _datos_evm_modificados(actividad['proyecto_id'], min(fechas) if fechas else None)
+
+# --- SNAPSHOTS EVM (marcar días a recalcular) ---
+
+def _marcar_recalculo_actividad(actividad_id):
+    if actividad_id is None:
+        return
+    actividad = Actividad.objects.filter(pk=actividad_id).values('proyecto_id', 'fecha_inicio_subarbol').first()
+    if actividad:
+        marcar_recalculo(actividad['proyecto_id'], actividad['fecha_inicio_subarbol'])
+
+@receiver(pre_save, sender=AvanceDiario)
+def avance_diario_antes_de_guardar(sender, instance, raw=False, **kwargs):
+    instance._fecha_reporte_anterior = None
+    if instance.pk and not raw:
+        instance._fecha_reporte_anterior = (
+            AvanceDiario.objects.filter(pk=instance.pk).values_list('fecha_reporte', flat=True).first()
+        )
+
+@receiver([post_save, post_delete], sender=AvanceDiario)
+def avance_diario_modificado(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    proyecto_id = Actividad.objects.filter(pk=instance.actividad_id).values_list('proyecto_id', flat=True).first()
+    fechas = [f for f in (instance.fecha_reporte, getattr(instance, '_fecha_reporte_anterior', None)) if f]
+    _datos_evm_modificados(proyecto_id, min(fechas) if fechas else None)
+
+@receiver([post_save, post_delete], sender=AvancePorZona)
+def avance_por_zona_modificado(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    avance = AvanceDiario.objects.filter(pk=instance.avance_diario_id).values(
+        'fecha_reporte', 'actividad__proyecto_id'
+    ).first()
+    if avance:
+        _datos_evm_modificados(avance['actividad__proyecto_id'], avance['fecha_reporte'])
+
+# --- RESÚMENES SEMANALES (caché de semanas cerradas) ---
+# Avances y cambios de partida ya incrementan la versión evm del proyecto
+
+@receiver([post_save, post_delete], sender=ReportePersonal)
+def reporte_personal_modificado(sender, instance, raw=False, **kwargs):
+    if not raw:
+        incrementar_version(clave_reportes(instance.proyecto_id))
+
+@receiver([post_save, post_delete], sender=ReporteDiarioMaquinaria)
+@receiver([post_save, post_delete], sender=Semana)
+def reportes_obra_modificados(sender, instance, raw=False, **kwargs):
+    # La maquinaria no pertenece a un proyecto y el catálogo de semanas es común: afectan a todos
+    if not raw:
+        incrementar_version(CLAVE_REPORTES_OBRA)
+
+# --- RESUMEN DE AVANCE POR ELEMENTO (BIM) ---
+
+@receiver(pre_save, sender=AvanceProcesoElemento)
+def avance_proceso_antes_de_guardar(sender, instance, raw=False, **kwargs):
+    instance._elemento_id_anterior = None
+    if instance.pk and not raw:
+        instance._elemento_id_anterior = (
+            AvanceProcesoElemento.objects.filter(pk=instance.pk).values_list('elemento_id', flat=True).first()
+        )
+
+@receiver([post_save, post_delete], sender=AvanceProcesoElemento)
+def avance_proceso_modificado(sender, instance, raw=False, **kwargs):
+    if not raw:
+        elementos = {instance.elemento_id, getattr(instance, '_elemento_id_anterior', None)} - {None}
+        actualizar_resumenes(ElementoConstructivo.objects.filter(pk__in=elementos))
+
+@receiver(post_save, sender=ElementoConstructivo)
+def elemento_constructivo_guardado(sender, instance, raw=False, **kwargs):
+    # Elemento nuevo o con otro tipo: cambia su total de pasos
+    if not raw:
+        actualizar_resumenes(ElementoConstructivo.objects.filter(pk=instance.pk))
+
+# --- SINCRONIZACIÓN INCREMENTAL BIM ---
+
+@receiver(post_delete, sender=ElementoBIM_GUID)
+def guid_bim_eliminado(sender, instance, **kwargs):
+    EliminacionBIM.objects.create(identificador_bim=instance.identificador_bim)
+
+@receiver(post_delete, sender=AvanceProcesoElemento)
+def avance_proceso_eliminado(sender, instance, **kwargs):
+    # El elemento pierde un paso completado: su estado y fechas cambian
+    EliminacionBIM.objects.create(elemento_id_afectado=instance.elemento_id)
+
+@receiver(pre_save, sender=PasoProcesoTipoElemento)
+def paso_proceso_antes_de_guardar(sender, instance, raw=False, **kwargs):
+    instance._tipo_elemento_id_anterior = None
+    if instance.pk and not raw:
+        instance._tipo_elemento_id_anterior = (
+            PasoProcesoTipoElemento.objects.filter(pk=instance.pk).values_list('tipo_elemento_id', flat=True).first()
+        )
+
+@receiver([post_save, post_delete], sender=PasoProcesoTipoElemento)
+def paso_proceso_modificado(sender, instance, raw=False, **kwargs):
+    # Cambia el total de pasos de todos los elementos del tipo (y del tipo anterior)
+    if not raw:
+        tipos = {instance.tipo_elemento_id, getattr(instance, '_tipo_elemento_id_anterior', None)} - {None}
+        actualizar_resumenes(ElementoConstructivo.objects.filter(tipo_elemento_id__in=tipos))
+        incrementar_version(CLAVE_BIM)
+
+# --- VERSIONES DE LAS APIS DE LECTURA (ETag / 304) ---
+
+@receiver([post_save, post_delete], sender=ElementoConstructivo)
+@receiver([post_save, post_delete], sender=ElementoBIM_GUID)
+@receiver([post_save, post_delete], sender=AvanceProcesoElemento)
+def datos_bim_modificados(sender, instance, raw=False, **kwargs):
+    if not raw:
+        incrementar_version(CLAVE_BIM)
+
+@receiver([post_save, post_delete], sender=Cronograma)
+@receiver([post_save, post_delete], sender=CronogramaPorZona)
+def cronograma_modificado(sender, instance, raw=False, **kwargs):
+    if not raw:
+        incrementar_version(CLAVE_CRONOGRAMA)
@@ -0,0 +1,224 @@
+# actividades/sincronizacion.py
+
+from datetime import date
+from django.db import transaction
+from .models import (
+    OperacionSincronizada, CronogramaPorZona, Actividad, AreaDeTrabajo, Empresa,
+    Proyecto, Observacion, get_default_empresa_pk,
+)
+from .captura_avance import guardar_cuadricula
+from .versiones import incrementar_version, CLAVE_CRONOGRAMA
+from .serializers import (
+    FechasCronogramaSerializer, AvanceDiarioSincronizacionSerializer,
+    ObservacionCrearSerializer, ObservacionEstadoSerializer,
+)
+
+SERIALIZADORES_OPERACION = {
+    'cronograma_fechas': FechasCronogramaSerializer,
+    'avance_diario': AvanceDiarioSincronizacionSerializer,
+    'observacion_crear': ObservacionCrearSerializer,
+    'observacion_estado': ObservacionEstadoSerializer,
+}
+
+
+def _errores_planos(errores):
+    """ Aplana los errores anidados de DRF a una lista de textos. """
+    if isinstance(errores, dict):
+        return [
+            f"{campo}: {mensaje}" if campo != 'non_field_errors' else mensaje
+            for campo, valor in errores.items() for mensaje in _errores_planos(valor)
+        ]
+    if isinstance(errores, list):
+        return [mensaje for valor in errores for mensaje in _errores_planos(valor)]
+    return [str(errores)]
+
+
+def sincronizar_lote(usuario, operaciones):
+    """
+    Aplica un lote de cambios capturados sin conexión en un teléfono.
+
+    Cada operación trae una 'clave' de idempotencia: las que ya se aplicaron
+    antes no se repiten (se devuelve su resultado guardado), así el teléfono
+    puede reenviar el lote completo si perdió la respuesta. Las operaciones
+    con errores se informan y no detienen a las demás.
+
+    Todo se valida y se aplica por tipo de operación en conjunto (pocas
+    consultas por lote, no por operación) dentro de una transacción.
+    Devuelve un resultado por operación, en el mismo orden del lote:
+    {'clave', 'estado': 'aplicada' | 'repetida' | 'error', ...}.
+    """
+    resultados = [None] * len(operaciones)
+    previas = dict(
+        OperacionSincronizada.objects.filter(
+            usuario=usuario, clave__in=[op['clave'] for op in operaciones]
+        ).values_list('clave', 'resultado')
+    )
+
+    lote = {tipo: [] for tipo in SERIALIZADORES_OPERACION}  # tipo -> [(índice, clave, datos validados)]
+    claves_vistas = set()
+    for indice, operacion in enumerate(operaciones):
+        clave = operacion['clave']
+        if clave in previas:
+            resultados[indice] = {'clave': clave, 'estado': 'repetida', **previas[clave]}
+            continue
+        if clave in claves_vistas:
+            resultados[indice] = {'clave': clave, 'estado': 'error', 'errores': ['Clave repetida dentro del lote.']}
+            continue
+        claves_vistas.add(clave)
+        serializer = SERIALIZADORES_OPERACION[operacion['tipo']](data=operacion['datos'])
+        if serializer.is_valid():
+            lote[operacion['tipo']].append((indice, clave, serializer.validated_data))
+        else:
+            resultados[indice] = {'clave': clave, 'estado': 'error', 'errores': _errores_planos(serializer.errors)}
+
+    def error(indice, clave, mensaje):
+        resultados[indice] = {'clave': clave, 'estado': 'error', 'errores': [mensaje]}
+
+    aplicadas = []
+
+    def aplicada(indice, clave, tipo, **resultado):
+        resultado = {'tipo': tipo, **resultado}
+        resultados[indice] = {'clave': clave, 'estado': 'aplicada', **resultado}
+        aplicadas.append(OperacionSincronizada(usuario=usuario, clave=clave, tipo=tipo, resultado=resultado))
+
+    with transaction.atomic():
+        _aplicar_fechas_cronograma(lote['cronograma_fechas'], error, aplicada)
+        _aplicar_avances(lote['avance_diario'], error, aplicada)
+        creadas = _aplicar_observaciones_nuevas(lote['observacion_crear'], error, aplicada)
+        _aplicar_estados_observacion(lote['observacion_estado'], usuario, creadas, error, aplicada)
+        OperacionSincronizada.objects.bulk_create(aplicadas)
+
+    return resultados
+
+
+# --- APLICACIÓN POR TIPO ---
+
+def _aplicar_fechas_cronograma(operaciones, error, aplicada):
+    if not operaciones:
+        return
+    detalles = {
+        (d.tarea_id, d.zona_id): d
+        for d in CronogramaPorZona.objects.filter(
+            tarea_id__in={datos['tarea_id'] for _, _, datos in operaciones},
+            zona_id__in={datos['zona_id'] for _, _, datos in operaciones},
+        )
+    }
+    modificados = {}
+    for indice, clave, datos in operaciones:
+        detalle = detalles.get((datos['tarea_id'], datos['zona_id']))
+        if detalle is None:
+            error(indice, clave, "La tarea no está asignada a esa zona.")
+            continue
+        for campo in ('fecha_inicio_real', 'fecha_fin_real'):
+            if campo in datos:
+                setattr(detalle, campo, datos[campo])
+        modificados[detalle.pk] = detalle
+        aplicada(indice, clave, 'cronograma_fechas', id=detalle.pk)
+    CronogramaPorZona.objects.bulk_update(modificados.values(), ['fecha_inicio_real', 'fecha_fin_real'])
+    if modificados:
+        # Sin señales en bloque: ver 'ESCRITURAS EN BLOQUE' en signals.py
+        incrementar_version(CLAVE_CRONOGRAMA)
+
+
+def _aplicar_avances(operaciones, error, aplicada):
+    if not operaciones:
+        return
+    actividades = Actividad.objects.only('pk', 'proyecto_id', 'es_hoja').in_bulk(
+        {datos['actividad_id'] for _, _, datos in operaciones}
+    )
+    zonas = set(AreaDeTrabajo.objects.values_list('pk', flat=True))
+    empresa_por_defecto = get_default_empresa_pk()
+    empresas = Empresa.objects.in_bulk(
+        {datos.get('empresa_id', empresa_por_defecto) for _, _, datos in operaciones}
+    )
+
+    # Se agrupan por (proyecto, día, empresa) y cada grupo se guarda como una cuadrícula
+    grupos = {}
+    for indice, clave, datos in operaciones:
+        actividad = actividades.get(datos['actividad_id'])
+        empresa_id = datos.get('empresa_id', empresa_por_defecto)
+        if actividad is None or not actividad.es_hoja:
+            error(indice, clave, "La actividad no existe o no es una actividad final (hoja) del WBS.")
+            continue
+        if empresa_id not in empresas:
+            error(indice, clave, f"No existe la empresa con ID={empresa_id}.")
+            continue
+        zonas_invalidas = [z['zona_id'] for z in datos['zonas'] if z['zona_id'] not in zonas]
+        if zonas_invalidas:
+            error(indice, clave, f"No existen las zonas: {', '.join(map(str, zonas_invalidas))}.")
+            continue
+        cantidades = grupos.setdefault((actividad.proyecto_id, datos['fecha_reporte'], empresa_id), {})
+        # Una operación posterior de la misma actividad y día reemplaza a la anterior
+        for par in [par for par in cantidades if par[0] == actividad.pk]:
+            del cantidades[par]
+        for zona in datos['zonas']:
+            cantidades[(actividad.pk, zona['zona_id'])] = zona['cantidad']
+        aplicada(indice, clave, 'avance_diario', actividad_id=actividad.pk, fecha_reporte=datos['fecha_reporte'].isoformat())
+
+    proyectos = Proyecto.objects.in_bulk({proyecto_id for proyecto_id, _, _ in grupos})
+    for (proyecto_id, fecha, empresa_id), cantidades in grupos.items():
+        guardar_cuadricula(proyectos[proyecto_id], fecha, empresas[empresa_id], cantidades, reemplazar_zonas=True)
+
+
+def _aplicar_observaciones_nuevas(operaciones, error, aplicada):
+    """ Crea las observaciones en bloque y devuelve {clave de la operación: observación}. """
+    if not operaciones:
+        return {}
+    zonas = set(AreaDeTrabajo.objects.values_list('pk', flat=True))
+    existentes = set(
+        Observacion.objects.filter(nombre__in={datos['nombre'] for _, _, datos in operaciones}).values_list(
+            'fecha', 'zona_id', 'nombre'
+        )
+    )
+    nuevas = {}
+    for indice, clave, datos in operaciones:
+        llave = (datos['fecha'], datos['zona_id'], datos['nombre'])
+        if datos['zona_id'] not in zonas:
+            error(indice, clave, f"No existe la zona con ID={datos['zona_id']}.")
+        elif llave in existentes:
+            error(indice, clave, "Ya existe una observación con esa fecha, zona y nombre.")
+        else:
+            existentes.add(llave)
+            nuevas[(indice, clave)] = Observacion(
+                fecha=datos['fecha'], zona_id=datos['zona_id'], nombre=datos['nombre'],
+                comentario=datos['comentario'], estado=datos['estado'],
+            )
+
+    Observacion.objects.bulk_create(nuevas.values())
+    for (indice, clave), observacion in nuevas.items():
+        aplicada(indice, clave, 'observacion_crear', id=observacion.pk)
+    return {clave: observacion for (_, clave), observacion in nuevas.items()}
+
+
+def _aplicar_estados_observacion(operaciones, usuario, creadas, error, aplicada):
+    if not operaciones:
+        return
+    # Observaciones creadas sin conexión: en este mismo lote o en uno anterior
+    claves = {datos['clave_observacion'] for _, _, datos in operaciones if 'clave_observacion' in datos}
+    ids_por_clave = {
+        clave: (resultado or {}).get('id')
+        for clave, resultado in OperacionSincronizada.objects.filter(
+            usuario=usuario, tipo='observacion_crear', clave__in=claves - set(creadas)
+        ).values_list('clave', 'resultado')
+    }
+    ids_por_clave.update({clave: observacion.pk for clave, observacion in creadas.items()})
+    ids = {
+        indice: datos['observacion_id'] if 'observacion_id' in datos else ids_por_clave.get(datos['clave_observacion'])
+        for indice, _, datos in operaciones
+    }
+
+    observaciones = Observacion.objects.in_bulk({pk for pk in ids.values() if pk})
+    hoy = date.today()
+    modificadas = {}
+    for indice, clave, datos in operaciones:
+        observacion = observaciones.get(ids[indice])
+        if observacion is None:
+            error(indice, clave, "No existe la observación indicada.")
+            continue
+        # Mismo registro de auditoría que cambiar_estado_observacion
+        observacion.estado = datos['estado']
+        observacion.actualizado_por = usuario
+        observacion.fecha_actualizacion = hoy
+        modificadas[observacion.pk] = observacion
+        aplicada(indice, clave, 'observacion_estado', id=observacion.pk)
+    Observacion.objects.bulk_update(modificadas.values(), ['estado', 'actualizado_por', 'fecha_actualizacion'])
@@ -1,3 +1,317 @@
+# actividades/tests.py
+
+from datetime import date, timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from .calendario import CalendarioLaboral
+from .evm import generar_snapshots
+from .models import (
+    Proyecto, AreaDeTrabajo, PartidaActividad, Empresa, Actividad, MetaPorZona,
+    AvanceDiario, AvancePorZona, SnapshotEVM, EstadoSnapshotEVM, Observacion, OperacionSincronizada,
+)
+from .pronostico import pronosticar_proyecto
+from .valor_planeado import CurvaValorPlaneado
+from .wbs import recalcular_rollups
+
+
+def crear_proyecto_base():
+    """
+    Proyecto con un WBS de tres niveles (Raíz > Cimentación > Excavación y
+    Raíz > Muros), dos zonas y avance de Excavación en días alternos de julio.
+    """
+    proyecto = Proyecto.objects.create(
+        nombre='CEDIS Huamantla', fecha_inicio=date(2025, 4, 1), fecha_fin_estimada=date(2026, 3, 31)
+    )
+    zona_a = AreaDeTrabajo.objects.create(nombre='Zona A')
+    zona_b = AreaDeTrabajo.objects.create(nombre='Zona B')
+    partida = PartidaActividad.objects.create(nombre='Terracerías')
+    empresa = Empresa.objects.create(nombre='PROSER')
+
+    raiz = Actividad.objects.create(nombre='Raíz', proyecto=proyecto, partida=partida)
+    cimentacion = Actividad.objects.create(nombre='Cimentación', proyecto=proyecto, padre=raiz, partida=partida)
+    excavacion = Actividad.objects.create(
+        nombre='Excavación', proyecto=proyecto, padre=cimentacion, partida=partida, unidad_medida='m3',
+        fecha_inicio_programada=date(2025, 5, 1), fecha_fin_programada=date(2025, 8, 31),
+    )
+    muros = Actividad.objects.create(
+        nombre='Muros', proyecto=proyecto, padre=raiz, partida=partida, unidad_medida='m2',
+        fecha_inicio_programada=date(2025, 6, 1), fecha_fin_programada=date(2025, 12, 31),
+    )
+    MetaPorZona.objects.create(actividad=excavacion, zona=zona_a, meta=Decimal('1000'))
+    MetaPorZona.objects.create(
+        actividad=excavacion, zona=zona_b, meta=Decimal('500'),
+        fecha_inicio_programada=date(2025, 7, 1), fecha_fin_programada=date(2025, 7, 31),
+    )
+    MetaPorZona.objects.create(actividad=muros, zona=zona_a, meta=Decimal('2000'))
+
+    for dia in range(1, 31, 2):
+        avance = AvanceDiario.objects.create(actividad=excavacion, fecha_reporte=date(2025, 7, dia), empresa=empresa)
+        AvancePorZona.objects.create(avance_diario=avance, zona=zona_a, cantidad=Decimal('10'))
+        AvancePorZona.objects.create(avance_diario=avance, zona=zona_b, cantidad=Decimal('5'))
+
+    return {
+        'proyecto': proyecto, 'zona_a': zona_a, 'zona_b': zona_b, 'empresa': empresa,
+        'raiz': raiz, 'cimentacion': cimentacion, 'excavacion': excavacion, 'muros': muros,
+    }
+
+
+def _recargar(*actividades):
+    for actividad in actividades:
+        actividad.refresh_from_db()
+
+
+# --- CALENDARIO LABORAL ---
+
+class CalendarioLaboralTests(TestCase):
+    def setUp(self):
+        # Sábado y domingo de descanso; el 16 de septiembre de 2025 (martes) es festivo
+        self.festivo = date(2025, 9, 16)
+        self.calendario = CalendarioLaboral((5, 6), [self.festivo, date(2025, 9, 20)])
+
+    def _contar_dia_por_dia(self, inicio, fin):
+        return sum(
+            1 for i in range((fin - inicio).days + 1)
+            if (inicio + timedelta(days=i)).weekday() not in (5, 6) and inicio + timedelta(days=i) != self.festivo
+        )
+
+    def test_dias_laborables_descuenta_fines_de_semana_y_festivos(self):
+        # Lunes 15 a domingo 21: 5 días hábiles menos el festivo
+        self.assertEqual(self.calendario.dias_laborables(date(2025, 9, 15), date(2025, 9, 21)), 4)
+        self.assertEqual(self.calendario.dias_laborables(date(2025, 9, 16), date(2025, 9, 16)), 0)
+        self.assertEqual(self.calendario.dias_laborables(date(2025, 9, 20), date(2025, 9, 21)), 0)
+        self.assertEqual(self.calendario.dias_laborables(date(2025, 9, 21), date(2025, 9, 15)), 0)
+
+    def test_dias_laborables_coincide_con_conteo_dia_por_dia(self):
+        inicio = date(2025, 8, 1)
+        for desfase in range(0, 120, 7):
+            for largo in (0, 1, 5, 6, 13, 40):
+                desde = inicio + timedelta(days=desfase)
+                hasta = desde + timedelta(days=largo)
+                self.assertEqual(
+                    self.calendario.dias_laborables(desde, hasta), self._contar_dia_por_dia(desde, hasta),
+                    (desde, hasta),
+                )
+
+    def test_sumar_dias_laborables_salta_festivo_y_fin_de_semana(self):
+        # Viernes 12 + 1 día hábil = lunes 15; lunes 15 + 1 = miércoles 17 (el martes es festivo)
+        self.assertEqual(self.calendario.sumar_dias_laborables(date(2025, 9, 12), 1), date(2025, 9, 15))
+        self.assertEqual(self.calendario.sumar_dias_laborables(date(2025, 9, 15), 1), date(2025, 9, 17))
+        self.assertEqual(self.calendario.sumar_dias_laborables(date(2025, 9, 15), 0), date(2025, 9, 15))
+
+    def test_sumar_dias_laborables_es_inverso_de_dias_laborables(self):
+        inicio = date(2025, 9, 1)
+        for dias in range(1, 60):
+            fin = self.calendario.sumar_dias_laborables(inicio, dias)
+            self.assertTrue(self.calendario.es_laborable(fin))
+            self.assertEqual(self.calendario.dias_laborables(inicio + timedelta(days=1), fin), dias)
+
+    def test_sumar_dias_laborables_sin_fecha_posible_devuelve_none(self):
+        self.assertIsNone(CalendarioLaboral(range(7)).sumar_dias_laborables(date(2025, 9, 1), 3))
+        self.assertIsNone(self.calendario.sumar_dias_laborables(date(2025, 9, 1), 10 ** 7))
+
+
+# --- VALOR PLANEADO ---
+
+class CurvaValorPlaneadoTests(TestCase):
+    def setUp(self):
+        self.datos = crear_proyecto_base()
+
+    def _pv_por_meta(self, fecha):
+        # Cálculo por meta (MetaPorZona.get_valor_planeado_individual), sin la curva
+        metas = MetaPorZona.objects.filter(actividad__sub_actividades__isnull=True).select_related('actividad')
+        return sum(meta.get_valor_planeado_individual(fecha) for meta in metas)
+
+    def test_acumulado_coincide_con_pv_por_meta(self):
+        curva = CurvaValorPlaneado.para_proyecto(self.datos['proyecto'])
+        fecha = date(2025, 4, 20)
+        while fecha <= date(2026, 1, 10):
+            # El cálculo por meta redondea cada meta a centavos
+            self.assertAlmostEqual(float(curva.acumulado(fecha)), float(self._pv_por_meta(fecha)), delta=0.03)
+            fecha += timedelta(days=5)
+
+    def test_diario_suma_el_acumulado(self):
+        curva = CurvaValorPlaneado.para_proyecto(self.datos['proyecto'])
+        inicio, fin = date(2025, 6, 25), date(2025, 7, 20)
+        self.assertAlmostEqual(
+            float(curva.en_rango(inicio, fin)),
+            float(curva.acumulado(fin) - curva.acumulado(inicio - timedelta(days=1))),
+            places=2,
+        )
+        self.assertEqual(curva.acumulado(date(2026, 6, 1)), Decimal('3500'))
+
+
+# --- TOTALES MATERIALIZADOS DEL WBS ---
+
+class RollupsWBSTests(TestCase):
+    def setUp(self):
+        self.datos = crear_proyecto_base()
+
+    def test_reasignar_padre_actualiza_ambas_ramas(self):
+        raiz, cimentacion, excavacion, muros = (
+            self.datos[n] for n in ('raiz', 'cimentacion', 'excavacion', 'muros')
+        )
+        excavacion.padre = muros
+        excavacion.save()
+        _recargar(raiz, cimentacion, muros)
+
+        self.assertTrue(cimentacion.es_hoja)
+        self.assertEqual(cimentacion.meta_subarbol, 0)
+        self.assertFalse(muros.es_hoja)
+        self.assertEqual(muros.meta_subarbol, Decimal('1500'))
+        self.assertEqual(raiz.meta_subarbol, Decimal('1500'))
+        self.assertEqual(muros.fecha_inicio_subarbol, date(2025, 5, 1))
+        # Lo materializado es lo mismo que se obtiene recalculando todo
+        self.assertEqual(recalcular_rollups(self.datos['proyecto'].pk), 0)
+
+    def test_borrar_actividad_actualiza_ancestros(self):
+        raiz, cimentacion = self.datos['raiz'], self.datos['cimentacion']
+        self.datos['excavacion'].delete()
+        _recargar(raiz, cimentacion)
+
+        self.assertTrue(cimentacion.es_hoja)
+        self.assertEqual(raiz.meta_subarbol, Decimal('2000'))
+        self.assertEqual(raiz.fecha_inicio_subarbol, date(2025, 6, 1))
+        self.assertEqual(recalcular_rollups(self.datos['proyecto'].pk), 0)
+
+
+# --- SNAPSHOTS EVM ---
+
+class SnapshotsEVMTests(TestCase):
+    def setUp(self):
+        self.datos = crear_proyecto_base()
+        self.proyecto = self.datos['proyecto']
+
+    def _snapshots(self):
+        return list(
+            SnapshotEVM.objects.filter(proyecto=self.proyecto).order_by('fecha', 'actividad_id', 'zona_id')
+            .values_list('fecha', 'actividad_id', 'zona_id', 'pv_acumulado', 'ev_acumulado')
+        )
+
+    def test_editar_avance_pasado_recalcula_desde_su_fecha(self):
+        generar_snapshots(self.proyecto, hasta=date(2025, 8, 31))
+        self.assertIsNone(EstadoSnapshotEVM.objects.get(proyecto=self.proyecto).recalcular_desde)
+
+        avance = AvancePorZona.objects.get(
+            avance_diario__fecha_reporte=date(2025, 7, 9), zona=self.datos['zona_a']
+        )
+        avance.cantidad = Decimal('50')
+        avance.save()
+        self.assertEqual(EstadoSnapshotEVM.objects.get(proyecto=self.proyecto).recalcular_desde, date(2025, 7, 9))
+
+        desde, _, _ = generar_snapshots(self.proyecto, hasta=date(2025, 8, 31))
+        self.assertEqual(desde, date(2025, 7, 9))
+        total = SnapshotEVM.objects.get(proyecto=self.proyecto, actividad=None, zona=None, fecha=date(2025, 8, 31))
+        self.assertEqual(total.ev_acumulado, Decimal('15') * 15 + 40)
+
+        incremental = self._snapshots()
+        generar_snapshots(self.proyecto, hasta=date(2025, 8, 31), completo=True)
+        self.assertEqual(self._snapshots(), incremental)
+
+    def test_sin_cambios_no_hay_nada_que_recalcular(self):
+        generar_snapshots(self.proyecto, hasta=date(2025, 8, 31))
+        self.assertEqual(generar_snapshots(self.proyecto, hasta=date(2025, 8, 31)), (None, date(2025, 8, 31), 0))
+
+
+# --- PRONÓSTICO ---
+
+class PronosticoTests(TestCase):
+    def setUp(self):
+        self.datos = crear_proyecto_base()
+        self.proyecto = self.datos['proyecto']
+
+    def _pronostico(self, actividad, fecha_corte=date(2025, 8, 15)):
+        resultados = pronosticar_proyecto(self.proyecto, fecha_corte)
+        return next(r for r in resultados if r['actividad_id'] == actividad.pk)
+
+    def test_sin_avance_no_hay_fecha_pronosticada(self):
+        pronostico = self._pronostico(self.datos['muros'])
+        self.assertIsNone(pronostico['tasa_diaria'])
+        self.assertIsNone(pronostico['fin_pronosticado'])
+        self.assertEqual(pronostico['restante'], 2000)
+
+    def test_ritmo_casi_nulo_no_desborda_el_calendario(self):
+        MetaPorZona.objects.filter(actividad=self.datos['muros']).update(meta=Decimal('50000'))
+        avance = AvanceDiario.objects.create(
+            actividad=self.datos['muros'], fecha_reporte=date(2025, 6, 2), empresa=self.datos['empresa']
+        )
+        AvancePorZona.objects.create(avance_diario=avance, zona=self.datos['zona_a'], cantidad=Decimal('0.01'))
+
+        pronostico = self._pronostico(self.datos['muros'], date(2025, 12, 15))
+        self.assertIsNone(pronostico['fin_pronosticado'])
+        self.assertIsNone(pronostico['fin_estimado_es'])
+
+        respuesta = self.client.get(
+            reverse('actividades:historial_avance', args=[self.proyecto.pk]),
+            {'fecha_desde': '2025-06-01', 'fecha_corte': '2025-12-15'},
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, 'Sin estimación')
+
+    def test_actividad_terminada_termina_en_su_ultimo_reporte(self):
+        # Julio ya trae 150 (zona A) y 75 (zona B); este reporte completa las metas
+        avance = AvanceDiario.objects.create(
+            actividad=self.datos['excavacion'], fecha_reporte=date(2025, 7, 31), empresa=self.datos['empresa']
+        )
+        AvancePorZona.objects.create(avance_diario=avance, zona=self.datos['zona_a'], cantidad=Decimal('850'))
+        AvancePorZona.objects.create(avance_diario=avance, zona=self.datos['zona_b'], cantidad=Decimal('425'))
+
+        pronostico = self._pronostico(self.datos['excavacion'])
+        self.assertEqual(pronostico['restante'], 0)
+        self.assertEqual(pronostico['porcentaje'], 100)
+        self.assertEqual(pronostico['fin_pronosticado'], date(2025, 7, 31))
+
+
+# --- SINCRONIZACIÓN MÓVIL ---
+
+class SincronizacionTests(TestCase):
+    def setUp(self):
+        self.datos = crear_proyecto_base()
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(User.objects.create_user('residente'))
+        self.url = reverse('actividades:api_sincronizar')
+
+    def _lote(self):
+        datos = self.datos
+        return {'operaciones': [
+            {'clave': 'avance-1', 'tipo': 'avance_diario', 'datos': {
+                'actividad_id': datos['muros'].pk, 'fecha_reporte': '2025-07-02', 'empresa_id': datos['empresa'].pk,
+                'zonas': [{'zona_id': datos['zona_a'].pk, 'cantidad': '12.5'}],
+            }},
+            {'clave': 'obs-1', 'tipo': 'observacion_crear', 'datos': {
+                'fecha': '2025-07-02', 'zona_id': datos['zona_a'].pk, 'nombre': 'Fuga', 'comentario': 'Tubería rota',
+            }},
+            {'clave': 'obs-2', 'tipo': 'observacion_estado', 'datos': {'clave_observacion': 'obs-1', 'estado': 'resuelto'}},
+        ]}
+
+    def test_reenviar_el_lote_no_repite_cambios(self):
+        primera = self.cliente.post(self.url, self._lote(), format='json')
+        self.assertEqual(primera.status_code, 200)
+        self.assertEqual([r['estado'] for r in primera.json()['resultados']], ['aplicada'] * 3)
+        avances = list(AvancePorZona.objects.order_by('pk').values_list('avance_diario_id', 'zona_id', 'cantidad'))
+        operaciones = OperacionSincronizada.objects.count()
+
+        segunda = self.cliente.post(self.url, self._lote(), format='json')
+        self.assertEqual(segunda.status_code, 200)
+        resultados = segunda.json()['resultados']
+        self.assertEqual([r['estado'] for r in resultados], ['repetida'] * 3)
+        self.assertEqual(resultados[1]['id'], primera.json()['resultados'][1]['id'])
+        self.assertEqual(
+            list(AvancePorZona.objects.order_by('pk').values_list('avance_diario_id', 'zona_id', 'cantidad')), avances
+        )
+        self.assertEqual(OperacionSincronizada.objects.count(), operaciones)
+        self.assertEqual(Observacion.objects.get().estado, 'resuelto')
 
-# Create your tests here.
+    def test_zonas_no_enviadas_se_borran(self):
+        datos = self.datos
+        operacion = lambda clave, zona: {'clave': clave, 'tipo': 'avance_diario', 'datos': {
+            'actividad_id': datos['excavacion'].pk, 'fecha_reporte': '2025-07-01', 'empresa_id': datos['empresa'].pk,
+            'zonas': [{'zona_id': zona.pk, 'cantidad': '7'}],
+        }}
+        self.cliente.post(self.url, {'operaciones': [operacion('z-1', datos['zona_b'])]}, format='json')
+        zonas = AvancePorZona.objects.filter(
+            avance_diario__actividad=datos['excavacion'], avance_diario__fecha_reporte=date(2025, 7, 1)
+        )
+        self.assertEqual(dict(zonas.values_list('zona_id', 'cantidad')), {datos['zona_b'].pk: Decimal('7')})
@@ -11,6 +11,7 @@ urlpatterns = [
 
     # --- URLS PARA AVANCES, REPORTES, ETC. ---
     path('avance/registrar/', views.registrar_avance, name='registrar_avance'),
+    path('avance/registrar/cuadricula/', views.registrar_avance_cuadricula, name='registrar_avance_cuadricula'),
     path('avance/editar/<int:pk>/', views.editar_avance, name='editar_avance'),
     path('avance/borrar/<int:pk>/', views.borrar_avance, name='borrar_avance'),
     path('maquinaria/reporte/nuevo/', views.registrar_reporte_maquinaria, name='registrar_reporte_maquinaria'),
@@ -20,11 +21,18 @@ urlpatterns = [
     
     # --- URLS PARA GESTIONAR LA JERARQUÍA (WBS - Legacy/General) ---
     path('wbs/', views.ActividadListView.as_view(), name='actividad_list'),
+    path('proyecto/<int:proyecto_id>/wbs/', views.ActividadListView.as_view(), name='actividad_list_proyecto'),
     path('wbs/crear/', views.ActividadCreateView.as_view(), name='actividad_create'),
     path('wbs/<int:pk>/editar/', views.ActividadUpdateView.as_view(), name='actividad_update'),
+    path('wbs/importar/', views.importar_wbs_view, name='importar_wbs'),
 
     # --- URL PARA EL HISTORIAL UNIFICADO ---
     path('proyecto/<int:proyecto_id>/historial/', views.historial_avance_view, name='historial_avance'),
+    path('proyecto/<int:proyecto_id>/historial/tabla/', views.historial_tabla_view, name='historial_tabla'),
+    path('proyecto/<int:proyecto_id>/historial/exportar/', views.exportar_avance_csv, name='exportar_avance_csv'),
+    path('api/proyecto/<int:proyecto_id>/curva-s/', views.api_curva_s, name='api_curva_s'),
+    path('api/proyecto/<int:proyecto_id>/pronostico/', views.api_pronostico, name='api_pronostico'),
+    path('api/proyecto/<int:proyecto_id>/semanas/', views.api_resumen_semanal, name='api_resumen_semanal'),
     
     # --- URLs PARA REGISTRO DE AVANCE BIM ---
     path('bim/registrar/', views.registrar_avance_bim, name='registrar_avance_bim'),
@@ -41,6 +49,7 @@ urlpatterns = [
          views.obtener_pasos_y_avance_elemento,
          name='api_obtener_pasos'),
     
+    path('api/sincronizar/', views.SincronizacionLoteAPIView.as_view(), name='api_sincronizar'),
     path('api/generar-rango/', views.api_generar_rango, name='api_generar_rango'),
     
     # --- URLs CRONOGRAMA (NUEVO SISTEMA POR ZONA) ---
@@ -55,6 +64,10 @@ urlpatterns = [
     
     # APIs internas para los selectores dinámicos
     path('api/cronograma/hijos/<int:padre_id>/', views.api_hijos_cronograma, name='api_hijos_cronograma'),
+    path('api/proyecto/<int:proyecto_id>/cronograma/buscar/', views.api_buscar_cronograma, name='api_buscar_cronograma'),
+    path('api/wbs/hijos/<int:padre_id>/', views.api_wbs_hijos, name='api_wbs_hijos'),
+    path('api/proyecto/<int:proyecto_id>/wbs/raices/', views.api_wbs_raices, name='api_wbs_raices'),
+    path('api/proyecto/<int:proyecto_id>/wbs/buscar/', views.api_buscar_wbs, name='api_buscar_wbs'),
     path('api/cronograma/detalle/<int:tarea_id>/', views.api_detalle_tarea, name='api_detalle_tarea'),
 
 # --- OBSERVACIONES ---
@@ -1,21 +1,14 @@
 # En el nuevo archivo actividades/utils.py
 
-from datetime import date, timedelta
+from .calendario import CALENDARIO_DEFAULT
 
-def calcular_avance_diario(fecha_inicio, fecha_fin, meta_total):
-    dias_habiles = 0
-    dias_totales = (fecha_fin - fecha_inicio).days + 1
-    
-    if dias_totales <= 0:
-        return 0
+def calcular_avance_diario(fecha_inicio, fecha_fin, meta_total, calendario=None):
+    # Sin calendario de proyecto se usa el estándar (solo se descansa en Domingo)
+    calendario = calendario or CALENDARIO_DEFAULT
+    dias_habiles = calendario.dias_laborables(fecha_inicio, fecha_fin)
 
-    for i in range(dias_totales):
-        dia_actual = fecha_inicio + timedelta(days=i)
-        if dia_actual.weekday() != 6: # 6 es Domingo
-            dias_habiles += 1
-            
     if dias_habiles == 0:
         return 0
 
     meta_diaria = meta_total / dias_habiles
-    return round(meta_diaria, 2)
\ No newline at end of file
+    return round(meta_diaria, 2)
@@ -0,0 +1,222 @@
+# actividades/valor_planeado.py
+
+from bisect import bisect_left
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import accumulate
+from .calendario import obtener_calendario
+
+CERO = Decimal('0')
+
+
+class CurvaValorPlaneado:
+    """
+    Curva de Valor Planeado (PV) diario y acumulado de un proyecto completo.
+
+    Carga todas las MetaPorZona de las actividades hoja en UNA sola consulta y
+    construye las series diarias con un arreglo de diferencias (cada meta suma su
+    tasa diaria al inicio y la resta después del fin), así que el costo es
+    O(días + metas) en lugar de recorrer el WBS y consultar la BD por cada día.
+
+    Las series se pueden filtrar por actividad, zona o partida; cada serie se
+    construye la primera vez que se pide y se reutiliza después.
+    """
+
+    def __init__(self, filas, calendario):
+        # filas: dicts con actividad_id, zona_id, partida_id, meta, inicio, fin
+        self.calendario = calendario
+        self.filas = [f for f in filas if f['inicio'] and f['fin']]
+        self._series = {}
+
+        if self.filas:
+            self.fecha_inicio = min(min(f['inicio'], f['fin']) for f in self.filas)
+            self.fecha_fin = max(max(f['inicio'], f['fin']) for f in self.filas)
+            self.num_dias = (self.fecha_fin - self.fecha_inicio).days + 1
+            self._laborables = [
+                calendario.es_laborable(self.fecha_inicio + timedelta(days=i)) for i in range(self.num_dias)
+            ]
+        else:
+            self.fecha_inicio = self.fecha_fin = None
+            self.num_dias = 0
+            self._laborables = []
+
+    @classmethod
+    def para_proyecto(cls, proyecto, actividad_ids=None):
+        """ Curva del proyecto; con 'actividad_ids' solo con las metas de esas actividades. """
+        # Importación local para evitar el ciclo models -> valor_planeado -> models
+        from .models import MetaPorZona
+
+        # Solo las metas de actividades hoja cuentan para el PV: las categorías
+        # padre suman el de sus hijos (mismo criterio que Actividad.get_valor_planeado_a_fecha).
+        metas = MetaPorZona.objects.filter(
+            actividad__proyecto=proyecto, actividad__sub_actividades__isnull=True
+        ).values(
+            'actividad_id', 'zona_id', 'meta', 'fecha_inicio_programada', 'fecha_fin_programada',
+            'actividad__partida_id', 'actividad__fecha_inicio_programada', 'actividad__fecha_fin_programada',
+        )
+        if actividad_ids is not None:
+            metas = metas.filter(actividad_id__in=actividad_ids)
+        filas = [
+            {
+                'actividad_id': m['actividad_id'],
+                'zona_id': m['zona_id'],
+                'partida_id': m['actividad__partida_id'],
+                'meta': m['meta'],
+                'inicio': m['fecha_inicio_programada'] or m['actividad__fecha_inicio_programada'],
+                'fin': m['fecha_fin_programada'] or m['actividad__fecha_fin_programada'],
+            }
+            for m in metas
+        ]
+        return cls(filas, obtener_calendario(proyecto.pk))
+
+    # --- Construcción de series ---
+
+    def _indice(self, fecha: date):
+        return (fecha - self.fecha_inicio).days
+
+    def _construir_serie(self, filas):
+        """ Devuelve (diaria, acumulada) para el subconjunto de metas indicado. """
+        n = self.num_dias
+        delta = [CERO] * (n + 1)
+        puntual = {}
+
+        for fila in filas:
+            inicio, fin = fila['inicio'], fila['fin']
+            dias = self.calendario.dias_laborables(inicio, fin)
+            if dias == 0:
+                # Sin días laborables la meta completa se considera planeada al cierre
+                indice = self._indice(max(inicio, fin))
+                puntual[indice] = puntual.get(indice, CERO) + fila['meta']
+                continue
+            tasa = fila['meta'] / dias
+            delta[self._indice(inicio)] += tasa
+            delta[self._indice(fin) + 1] -= tasa
+
+        diaria = []
+        for i, tasa_vigente in enumerate(accumulate(delta[:n])):
+            valor = tasa_vigente if self._laborables[i] else CERO
+            diaria.append(valor + puntual.get(i, CERO))
+        return diaria, list(accumulate(diaria))
+
+    def _serie(self, actividad_id=None, zona_id=None, partida_id=None, actividades=None):
+        clave = (actividad_id, zona_id, partida_id, actividades)
+        if clave not in self._series:
+            filas = [
+                f for f in self.filas
+                if (actividad_id is None or f['actividad_id'] == actividad_id)
+                and (zona_id is None or f['zona_id'] == zona_id)
+                and (partida_id is None or f['partida_id'] == partida_id)
+                and (actividades is None or f['actividad_id'] in actividades)
+            ]
+            self._series[clave] = self._construir_serie(filas)
+        return self._series[clave]
+
+    # --- Consultas ---
+
+    def acumulado(self, fecha_corte: date, **filtros):
+        """ PV acumulado al cierre de 'fecha_corte'. Filtros: actividad_id, zona_id, partida_id, actividades. """
+        if not self.num_dias or fecha_corte < self.fecha_inicio:
+            return 0
+        _, acumulada = self._serie(**filtros)
+        indice = min(self._indice(fecha_corte), self.num_dias - 1)
+        return round(acumulada[indice], 2)
+
+    def diario(self, fecha: date, **filtros):
+        if not self.num_dias or not (self.fecha_inicio <= fecha <= self.fecha_fin):
+            return 0
+        diaria, _ = self._serie(**filtros)
+        return round(diaria[self._indice(fecha)], 2)
+
+    def en_rango(self, fecha_inicio_rango: date, fecha_fin_rango: date, **filtros):
+        if fecha_fin_rango < fecha_inicio_rango:
+            return 0
+        return (
+            self.acumulado(fecha_fin_rango, **filtros)
+            - self.acumulado(fecha_inicio_rango - timedelta(days=1), **filtros)
+        )
+
+    def serie_acumulada(self, **filtros):
+        """ Lista de (fecha, pv_acumulado) día por día, del inicio al fin de la curva. """
+        if not self.num_dias:
+            return []
+        _, acumulada = self._serie(**filtros)
+        return [(self.fecha_inicio + timedelta(days=i), valor) for i, valor in enumerate(acumulada)]
+
+    def fecha_en_que_alcanza(self, valor, **filtros):
+        """
+        Primer día en que el PV acumulado llega a 'valor' y la fracción de ese
+        día necesaria para alcanzarlo (búsqueda binaria sobre la serie).
+        None si la curva nunca llega a ese valor.
+        """
+        if not self.num_dias:
+            return None
+        _, acumulada = self._serie(**filtros)
+        indice = bisect_left(acumulada, valor)
+        if indice >= self.num_dias:
+            return None
+        anterior = acumulada[indice - 1] if indice else CERO
+        incremento = acumulada[indice] - anterior
+        fraccion = (valor - anterior) / incremento if incremento else Decimal('1')
+        return self.fecha_inicio + timedelta(days=indice), fraccion
+
+
+# --- PV DIARIO POR LOTES ---
+
+def pv_diario_de_metas(metas, fecha, calendario, inicio_actividad=None, fin_actividad=None):
+    """
+    PV de un día de una actividad hoja: suma la tasa diaria (meta / días
+    laborables) de cada meta vigente en 'fecha'. Las metas son dicts con meta,
+    fecha_inicio_programada y fecha_fin_programada; sin fechas propias se usan
+    las de la actividad.
+    """
+    if not metas or not calendario.es_laborable(fecha):
+        return 0
+    total = 0
+    for meta in metas:
+        inicio = meta['fecha_inicio_programada'] or inicio_actividad
+        fin = meta['fecha_fin_programada'] or fin_actividad
+        if not inicio or not fin or not (inicio <= fecha <= fin):
+            continue
+        dias = calendario.dias_laborables(inicio, fin)
+        if dias > 0:
+            total += meta['meta'] / dias
+    return round(total, 2)
+
+
+def anotar_programado_diario(avances):
+    """
+    Calcula el PV diario de todos los avances indicados en un solo lote y lo
+    deja en avance._cantidad_programada_dia. Usa una consulta para las metas de
+    todas las actividades involucradas y un calendario compartido por proyecto,
+    así que el costo no depende del número de filas. Los avances deben traer
+    su actividad cargada (select_related('actividad')).
+    """
+    # Importación local para evitar el ciclo models -> valor_planeado -> models
+    from .models import MetaPorZona
+
+    avances = list(avances)
+    actividades = {avance.actividad_id: avance.actividad for avance in avances}
+    metas = {}
+    for meta in MetaPorZona.objects.filter(actividad_id__in=actividades).values(
+        'actividad_id', 'meta', 'fecha_inicio_programada', 'fecha_fin_programada'
+    ):
+        metas.setdefault(meta['actividad_id'], []).append(meta)
+
+    calendarios = {}
+    resultados = {}
+    for avance in avances:
+        clave = (avance.actividad_id, avance.fecha_reporte)
+        if clave not in resultados:
+            actividad = actividades[avance.actividad_id]
+            if not actividad.es_hoja:
+                # Las categorías no tienen PV propio (mismo criterio que get_pv_diario)
+                resultados[clave] = 0
+            else:
+                if actividad.proyecto_id not in calendarios:
+                    calendarios[actividad.proyecto_id] = obtener_calendario(actividad.proyecto_id)
+                resultados[clave] = pv_diario_de_metas(
+                    metas.get(avance.actividad_id), avance.fecha_reporte, calendarios[actividad.proyecto_id],
+                    actividad.fecha_inicio_programada, actividad.fecha_fin_programada,
+                )
+        avance._cantidad_programada_dia = resultados[clave]
+    return avances
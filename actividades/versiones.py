@@ -0,0 +1,92 @@
+# actividades/versiones.py
+
+import hashlib
+from datetime import date, datetime, time
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.views.decorators.http import condition
+from .models import VersionDatos
+
+# Estado de los elementos BIM (GUIDs, elementos, pasos y avances por elemento)
+CLAVE_BIM = "bim"
+# Jerarquía del Cronograma y fechas por zona
+CLAVE_CRONOGRAMA = "cronograma"
+
+
+# Reportes sin proyecto (maquinaria) y catálogo de semanas
+CLAVE_REPORTES_OBRA = "reportes"
+
+
+def clave_evm(proyecto_id):
+    """ Conjunto de datos de avance y metas (PV/EV) de un proyecto. """
+    return f"evm:{proyecto_id}"
+
+
+def clave_reportes(proyecto_id):
+    """ Reportes de personal de un proyecto (resúmenes semanales). """
+    return f"reportes:{proyecto_id}"
+
+
+def clave_calendario(proyecto_id):
+    """ Días de descanso y días inhábiles de un proyecto. """
+    return f"calendario:{proyecto_id}"
+
+
+def obtener_version(nombre):
+    """ Devuelve (version, actualizado_en). Un conjunto nunca modificado es la versión 0. """
+    fila = VersionDatos.objects.filter(nombre=nombre).values_list('version', 'actualizado_en').first()
+    return fila or (0, None)
+
+
+def obtener_versiones(*nombres):
+    """ Como obtener_version() para varios conjuntos en una consulta; devuelve solo los números. """
+    versiones = dict(VersionDatos.objects.filter(nombre__in=nombres).values_list('nombre', 'version'))
+    return [versiones.get(nombre, 0) for nombre in nombres]
+
+
+def incrementar_version(*nombres):
+    ahora = timezone.now()
+    for nombre in nombres:
+        if VersionDatos.objects.filter(nombre=nombre).update(version=F('version') + 1, actualizado_en=ahora):
+            continue
+        try:
+            with transaction.atomic():
+                VersionDatos.objects.create(nombre=nombre, version=1)
+        except IntegrityError:
+            # Otro proceso la creó al mismo tiempo
+            VersionDatos.objects.filter(nombre=nombre).update(version=F('version') + 1, actualizado_en=ahora)
+
+
+def condicion_version(clave, por_dia=False):
+    """
+    Decorador para vistas de lectura (GET condicional). El contador de
+    'clave' da un ETag fuerte y Last-Modified; si el cliente ya tiene esa
+    versión se responde 304 sin ejecutar la vista (una consulta en total).
+    El ETag incluye la URL completa, así cada página o filtro tiene el suyo.
+
+    Con por_dia=True la respuesta depende también de la fecha de hoy (ej.
+    estados "Atrasado"): el ETag cambia cada día y Last-Modified nunca es
+    anterior a la medianoche.
+
+    La versión leída queda en request.version_datos = (version, actualizado_en).
+    """
+    def version(request):
+        if not hasattr(request, 'version_datos'):
+            request.version_datos = obtener_version(clave)
+        return request.version_datos
+
+    def etag(request, *args, **kwargs):
+        numero, _ = version(request)
+        ruta = hashlib.md5(request.get_full_path().encode()).hexdigest()[:12]
+        hoy = f"-{date.today():%Y%m%d}" if por_dia else ""
+        return f"{clave}-{numero}-{ruta}{hoy}"
+
+    def ultima_modificacion(request, *args, **kwargs):
+        _, actualizado_en = version(request)
+        if por_dia:
+            medianoche = timezone.make_aware(datetime.combine(date.today(), time.min))
+            return max(actualizado_en, medianoche) if actualizado_en else medianoche
+        return actualizado_en
+
+    return condition(etag_func=etag, last_modified_func=ultima_modificacion)
@@ -1,6 +1,8 @@
 # actividades/views.py
 
-from django.http import JsonResponse
+import json
+from itertools import chain
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_GET
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
@@ -9,29 +11,52 @@ from django.db.models import Sum, Q, Prefetch, Count, Max, Min
 from django.views.generic import ListView, CreateView, UpdateView
 from django.urls import reverse_lazy, reverse
 from datetime import date, timedelta
+from urllib.parse import urlencode
 from django.db import IntegrityError, transaction
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_datetime
+from django.utils import timezone
+from django.utils.decorators import method_decorator
 
 # --- REST FRAMEWORK ---
 from rest_framework.generics import ListAPIView
+from rest_framework.pagination import CursorPagination
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.authentication import TokenAuthentication
+from rest_framework.authentication import TokenAuthentication, SessionAuthentication
 
 # --- IMPORTS LOCALES ---
-from .serializers import ElementoBIM_GUID_Serializer
+from .serializers import LoteSincronizacionSerializer
+from .sincronizacion import sincronizar_lote
+from .estado_bim import (
+    guids_con_estado, fila_estado_bim, marca_sincronizacion, guids_modificados_desde, guids_eliminados_desde,
+    registrar_avances_lote,
+)
 from .forms import (
     ReporteMaquinariaForm, ReportePersonalForm, ActividadForm,
     ConsultaClimaForm, AvanceDiarioForm, AvancePorZonaFormSet,
     MetaPorZonaFormSet, SeleccionarElementoForm, CronogramaPorZonaForm, CronogramaForm,
-    ObservacionForm
+    ObservacionForm, ImportarWBSForm, CapturaCuadriculaForm, CRONOGRAMA_PROFUNDIDAD_MAXIMA_PADRE
 )
 from .services import obtener_y_guardar_clima
+from .wbs import ArbolWBS
+from .valor_planeado import anotar_programado_diario
+from .pronostico import pronosticar_proyecto
+from .exportacion import filas_avance_csv
+from .captura_avance import nombre_celda, leer_cuadricula, guardar_cuadricula
+from .importacion import leer_csv, importar_wbs, COLUMNAS_IMPORTACION, SEPARADOR_RUTA
+from .semanal import resumen_semanal
+from .evm import obtener_snapshot, curva_s, resumen_ev, RESOLUCIONES_CURVA_S
+from .versiones import condicion_version, CLAVE_BIM, CLAVE_CRONOGRAMA
 from .models import (
     Actividad, AvanceDiario, Semana, PartidaActividad, ReportePersonal,
     Empresa, Cargo, AreaDeTrabajo, ReporteDiarioMaquinaria, Proyecto,
     AvancePorZona, MetaPorZona, ElementoConstructivo, 
     PasoProcesoTipoElemento, AvanceProcesoElemento, TipoElemento,
-    ElementoBIM_GUID, Cronograma, Observacion, CronogramaPorZona
+    ElementoBIM_GUID, Cronograma, Observacion, CronogramaPorZona, get_default_empresa_pk
 )
 
 def es_staff(user):
@@ -54,75 +79,283 @@ def pagina_principal(request):
 # AVANCES E HISTORIAL (Lógica Compleja)
 # ==========================================
 
-def historial_avance_view(request, proyecto_id):
-    proyecto = get_object_or_404(Proyecto, pk=proyecto_id)
-    semanas = Semana.objects.all()
-    actividades_filtrables = Actividad.objects.filter(proyecto=proyecto, sub_actividades__isnull=True).order_by('nombre')
-
-    fecha_corte_total = date.today()
-    total_programado_pv_acumulado = proyecto.get_valor_planeado_a_fecha(fecha_corte_total)
+HISTORIAL_FILAS_POR_PAGINA = 50
 
-    prefetch_zonas_anidadas = Prefetch(
-        'avances_por_zona',
-        queryset=AvancePorZona.objects.select_related('zona')
-    )
-
-    avances_totales_acumulados = AvanceDiario.objects.filter(
-        actividad__proyecto=proyecto,
-        fecha_reporte__lte=fecha_corte_total
-    ).prefetch_related(prefetch_zonas_anidadas) 
-
-    total_real_ev_acumulado = sum(avance.cantidad_total for avance in avances_totales_acumulados)
+def _id_o_none(valor):
+    try:
+        return int(valor) if valor else None
+    except ValueError:
+        return None
 
-    if total_programado_pv_acumulado and total_programado_pv_acumulado > 0:
-        spi_calculado = total_real_ev_acumulado / total_programado_pv_acumulado
-        spi_acumulado = min(spi_calculado, 2.0) 
-    else:
-        spi_acumulado = 0
+def _fecha_o_none(valor):
+    try:
+        return date.fromisoformat(valor) if valor else None
+    except ValueError:
+        return None
+
+def _fecha_corte_historial(request):
+    fecha_corte = date.today()
+    fecha_corte_param = request.GET.get('fecha_corte')
+    if fecha_corte_param:
+        try:
+            fecha_corte = min(date.fromisoformat(fecha_corte_param), date.today())
+        except ValueError:
+            messages.warning(request, "La fecha de corte no es válida.")
+    return fecha_corte
 
+def _contexto_tabla_historial(request, proyecto, fecha_corte):
+    """
+    Filas del historial filtradas en SQL y paginadas por cursor sobre
+    (fecha_reporte, id): cada página pide solo las filas siguientes al último
+    registro mostrado, sin OFFSET, así el costo no crece con el historial.
+    """
     semana_seleccionada_id = request.GET.get('semana_filtro')
     actividad_seleccionada_id = request.GET.get('actividad_filtro')
+    empresa_id = _id_o_none(request.GET.get('empresa_filtro'))
+    zona_id = _id_o_none(request.GET.get('zona_filtro'))
+    fecha_desde = _fecha_o_none(request.GET.get('fecha_desde'))
+    fecha_hasta = _fecha_o_none(request.GET.get('fecha_hasta'))
 
-    avances_para_tabla = AvanceDiario.objects.filter(
+    # Sin semana ni rango de fechas la tabla muestra las últimas dos semanas
+    if semana_seleccionada_id:
+        semana_obj = Semana.objects.filter(pk=_id_o_none(semana_seleccionada_id)).first()
+        if semana_obj:
+            fecha_desde, fecha_hasta = semana_obj.fecha_inicio, semana_obj.fecha_fin
+        else:
+            messages.warning(request, "La semana seleccionada no es válida.")
+            semana_seleccionada_id = None
+    if not semana_seleccionada_id and not fecha_desde and not fecha_hasta:
+        fecha_desde = date.today() - timedelta(weeks=2)
+
+    avances_para_tabla = AvanceDiario.objects.with_totals().filter(
         actividad__proyecto=proyecto
     ).select_related(
         'actividad', 'empresa'
     ).prefetch_related(
-        prefetch_zonas_anidadas
+        Prefetch('avances_por_zona', queryset=AvancePorZona.objects.select_related('zona'))
     )
+    # El desglose de EV usa exactamente los mismos filtros que la tabla
+    avances_zona_filtrados = AvancePorZona.objects.filter(avance_diario__actividad__proyecto=proyecto)
 
-    if actividad_seleccionada_id:
+    if _id_o_none(actividad_seleccionada_id):
         avances_para_tabla = avances_para_tabla.filter(actividad_id=actividad_seleccionada_id)
+        avances_zona_filtrados = avances_zona_filtrados.filter(avance_diario__actividad_id=actividad_seleccionada_id)
+    if empresa_id:
+        avances_para_tabla = avances_para_tabla.filter(empresa_id=empresa_id)
+        avances_zona_filtrados = avances_zona_filtrados.filter(avance_diario__empresa_id=empresa_id)
+    if zona_id:
+        avances_para_tabla = avances_para_tabla.filter(avances_por_zona__zona_id=zona_id)
+        avances_zona_filtrados = avances_zona_filtrados.filter(zona_id=zona_id)
+    if fecha_desde:
+        avances_para_tabla = avances_para_tabla.filter(fecha_reporte__gte=fecha_desde)
+        avances_zona_filtrados = avances_zona_filtrados.filter(avance_diario__fecha_reporte__gte=fecha_desde)
+    if fecha_hasta:
+        avances_para_tabla = avances_para_tabla.filter(fecha_reporte__lte=fecha_hasta)
+        avances_zona_filtrados = avances_zona_filtrados.filter(avance_diario__fecha_reporte__lte=fecha_hasta)
+
+    # Cursor 'AAAA-MM-DD.id' del último registro de la página anterior
+    cursor = request.GET.get('cursor', '')
+    fecha_cursor, _, id_cursor = cursor.partition('.')
+    fecha_cursor, id_cursor = _fecha_o_none(fecha_cursor), _id_o_none(id_cursor)
+    if fecha_cursor and id_cursor:
+        avances_para_tabla = avances_para_tabla.filter(
+            Q(fecha_reporte__lt=fecha_cursor) | Q(fecha_reporte=fecha_cursor, id__lt=id_cursor)
+        )
 
-    if semana_seleccionada_id:
-        try:
-            semana_obj = Semana.objects.get(pk=semana_seleccionada_id)
-            avances_para_tabla = avances_para_tabla.filter(fecha_reporte__range=[semana_obj.fecha_inicio, semana_obj.fecha_fin])
-        except Semana.DoesNotExist:
-            messages.warning(request, "La semana seleccionada no es válida.")
-            semana_seleccionada_id = None
-            fecha_inicio_filtro_tabla = date.today() - timedelta(weeks=2)
-            avances_para_tabla = avances_para_tabla.filter(fecha_reporte__gte=fecha_inicio_filtro_tabla)
+    avances_reales = list(avances_para_tabla.order_by('-fecha_reporte', '-id')[:HISTORIAL_FILAS_POR_PAGINA + 1])
+    hay_mas = len(avances_reales) > HISTORIAL_FILAS_POR_PAGINA
+    avances_reales = avances_reales[:HISTORIAL_FILAS_POR_PAGINA]
+
+    # El PV diario y el nombre completo (con categorías) de todas las filas se
+    # resuelven en lote, así el número de consultas no depende de las filas
+    anotar_programado_diario(avances_reales)
+    Actividad.precargar_ancestros([avance.actividad for avance in avances_reales])
+    # Solo las actividades de esta página: no hace falta la curva PV de todo el proyecto
+    pronosticos = {
+        p['actividad_id']: p
+        for p in pronosticar_proyecto(proyecto, fecha_corte, {avance.actividad_id for avance in avances_reales})
+    }
+    for avance in avances_reales:
+        avance.pronostico = pronosticos.get(avance.actividad_id)
+
+    parametros = request.GET.copy()
+    parametros.pop('cursor', None)
+    parametros_siguiente = None
+    if hay_mas:
+        ultimo = avances_reales[-1]
+        parametros_siguiente = parametros.copy()
+        parametros_siguiente['cursor'] = f"{ultimo.fecha_reporte.isoformat()}.{ultimo.pk}"
+        parametros_siguiente = parametros_siguiente.urlencode()
+
+    return {
+        'proyecto': proyecto,
+        'semana_seleccionada_id': semana_seleccionada_id,
+        'actividad_seleccionada_id': actividad_seleccionada_id,
+        'empresa_seleccionada_id': request.GET.get('empresa_filtro', ''),
+        'zona_seleccionada_id': request.GET.get('zona_filtro', ''),
+        'fecha_desde': request.GET.get('fecha_desde', ''),
+        'fecha_hasta': request.GET.get('fecha_hasta', ''),
+        'resumen_ev_filtrado': resumen_ev(avances_zona_filtrados),
+        'avances_reales': avances_reales,
+        'es_primera_pagina': not cursor,
+        'parametros_primera_pagina': parametros.urlencode(),
+        'parametros_siguiente': parametros_siguiente,
+    }
 
-    elif not semana_seleccionada_id:
-        fecha_inicio_filtro_tabla = date.today() - timedelta(weeks=2)
-        avances_para_tabla = avances_para_tabla.filter(fecha_reporte__gte=fecha_inicio_filtro_tabla)
+def historial_avance_view(request, proyecto_id):
+    proyecto = get_object_or_404(Proyecto, pk=proyecto_id)
+    semanas = Semana.objects.all()
+    actividades_filtrables = Actividad.precargar_ancestros(
+        Actividad.objects.filter(proyecto=proyecto, sub_actividades__isnull=True).order_by('nombre')
+    )
+    fecha_corte_total = _fecha_corte_historial(request)
 
-    context = {
-        'proyecto': proyecto,
+    # Para fechas ya cerradas el snapshot nocturno da PV/EV en una sola fila
+    snapshot = obtener_snapshot(proyecto, fecha_corte_total)
+    if snapshot:
+        total_programado_pv_acumulado = snapshot.pv_acumulado
+        total_real_ev_acumulado = snapshot.ev_acumulado
+    else:
+        total_programado_pv_acumulado = proyecto.get_valor_planeado_a_fecha(fecha_corte_total)
+        total_real_ev_acumulado = AvancePorZona.objects.filter(
+            avance_diario__actividad__proyecto=proyecto,
+            avance_diario__fecha_reporte__lte=fecha_corte_total
+        ).aggregate(total=Sum('cantidad'))['total'] or 0
+
+    if total_programado_pv_acumulado and total_programado_pv_acumulado > 0:
+        spi_calculado = total_real_ev_acumulado / total_programado_pv_acumulado
+        spi_acumulado = min(spi_calculado, 2.0) 
+    else:
+        spi_acumulado = 0
+
+    context = _contexto_tabla_historial(request, proyecto, fecha_corte_total)
+    context.update({
         'semanas': semanas,
         'actividades_filtrables': actividades_filtrables,
-        'semana_seleccionada_id': semana_seleccionada_id,
-        'actividad_seleccionada_id': actividad_seleccionada_id,
+        'empresas': Empresa.objects.order_by('nombre'),
+        'zonas': AreaDeTrabajo.objects.order_by('nombre'),
         'total_programado_pv': total_programado_pv_acumulado,
         'total_real_ev': total_real_ev_acumulado,
         'rendimiento_spi': spi_acumulado, 
         'fecha_corte': fecha_corte_total,
-        'avances_reales': avances_para_tabla.order_by('-fecha_reporte')
-    }
+        'desde_snapshot': snapshot is not None,
+    })
 
     return render(request, 'actividades/historial_avance.html', context)
 
+@require_GET
+def historial_tabla_view(request, proyecto_id):
+    """
+    Solo el fragmento de la tabla (con su desglose de EV) para cuando cambian
+    los filtros o la página: no recalcula las tarjetas de PV/EV acumulados.
+    """
+    proyecto = get_object_or_404(Proyecto, pk=proyecto_id)
+    context = _contexto_tabla_historial(request, proyecto, _fecha_corte_historial(request))
+    return render(request, 'actividades/partials/historial_tabla.html', context)
+
+@require_GET
+def exportar_avance_csv(request, proyecto_id):
+    """
+    Descarga del avance diario completo (desglosado por zona) en CSV. Se envía
+    en streaming, así exportaciones grandes no agotan memoria ni el timeout.
+    Acepta los mismos filtros que la tabla del historial (sin la ventana de
+    dos semanas por defecto).
+    """
+    proyecto = get_object_or_404(Proyecto, pk=proyecto_id)
+    filtros = {}
+    semana = Semana.objects.filter(pk=_id_o_none(request.GET.get('semana_filtro'))).first()
+    fecha_desde = semana.fecha_inicio if semana else _fecha_o_none(request.GET.get('fecha_desde'))
+    fecha_hasta = semana.fecha_fin if semana else _fecha_o_none(request.GET.get('fecha_hasta'))
+    if fecha_desde:
+        filtros['avance_diario__fecha_reporte__gte'] = fecha_desde
+    if fecha_hasta:
+        filtros['avance_diario__fecha_reporte__lte'] = fecha_hasta
+    if _id_o_none(request.GET.get('actividad_filtro')):
+        filtros['avance_diario__actividad_id'] = _id_o_none(request.GET.get('actividad_filtro'))
+    if _id_o_none(request.GET.get('empresa_filtro')):
+        filtros['avance_diario__empresa_id'] = _id_o_none(request.GET.get('empresa_filtro'))
+    if _id_o_none(request.GET.get('zona_filtro')):
+        filtros['zona_id'] = _id_o_none(request.GET.get('zona_filtro'))
+
+    response = StreamingHttpResponse(filas_avance_csv(proyecto, filtros), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="avance_{proyecto.pk}_{date.today().isoformat()}.csv"'
+    return response
+
+@require_GET
+def api_curva_s(request, proyecto_id):
+    """
+    Curva S (PV y EV acumulados) del proyecto. Parámetros opcionales:
+    resolucion=diaria|semanal|mensual, partida=<id>, zona=<id>.
+    """
+    proyecto = get_object_or_404(Proyecto, pk=proyecto_id)
+    resolucion = request.GET.get('resolucion', 'diaria')
+    if resolucion not in RESOLUCIONES_CURVA_S:
+        return JsonResponse({'error': f"Resolución no válida. Opciones: {', '.join(RESOLUCIONES_CURVA_S)}."}, status=400)
+
+    try:
+        partida_id = int(request.GET['partida']) if request.GET.get('partida') else None
+        zona_id = int(request.GET['zona']) if request.GET.get('zona') else None
+    except ValueError:
+        return JsonResponse({'error': 'Los filtros partida y zona deben ser IDs numéricos.'}, status=400)
+
+    return JsonResponse({
+        'proyecto': proyecto.nombre,
+        'resolucion': resolucion,
+        'partida': partida_id,
+        'zona': zona_id,
+        'puntos': curva_s(proyecto, resolucion, partida_id, zona_id),
+    })
+
+@require_GET
+def api_resumen_semanal(request, proyecto_id):
+    """
+    Totales por semana del catálogo (avance, personal y maquinaria por partida
+    y zona). Parámetros opcionales: desde=<n° semana>, hasta=<n° semana>;
+    por defecto las últimas 8 semanas hasta la actual.
+    """
+    proyecto = get_object_or_404(Proyecto, pk=proyecto_id)
+    hoy = date.today()
+    semana_actual = (
+        Semana.objects.filter(fecha_inicio__lte=hoy, fecha_fin__gte=hoy).first()
+        or Semana.objects.filter(fecha_fin__lt=hoy).order_by('-numero_semana').first()
+    )
+    numero_actual = semana_actual.numero_semana if semana_actual else 1
+
+    try:
+        hasta = int(request.GET.get('hasta') or numero_actual)
+        desde = int(request.GET.get('desde') or max(hasta - 7, 1))
+    except ValueError:
+        return JsonResponse({'error': 'Los parámetros desde y hasta deben ser números de semana.'}, status=400)
+    if desde > hasta:
+        return JsonResponse({'error': 'La semana inicial no puede ser posterior a la final.'}, status=400)
+
+    return JsonResponse({
+        'proyecto': proyecto.nombre,
+        'desde': desde,
+        'hasta': hasta,
+        'semanas': resumen_semanal(proyecto, desde, hasta),
+    })
+
+@require_GET
+def api_pronostico(request, proyecto_id):
+    """
+    Pronóstico de término de las actividades hoja al ritmo actual, con SPI(t)
+    y duración estimada (Earned Schedule). Parámetro opcional: fecha_corte=AAAA-MM-DD.
+    """
+    proyecto = get_object_or_404(Proyecto, pk=proyecto_id)
+    fecha_corte = date.today()
+    if request.GET.get('fecha_corte'):
+        try:
+            fecha_corte = date.fromisoformat(request.GET['fecha_corte'])
+        except ValueError:
+            return JsonResponse({'error': 'La fecha de corte debe tener el formato AAAA-MM-DD.'}, status=400)
+
+    return JsonResponse({
+        'proyecto': proyecto.nombre,
+        'fecha_corte': fecha_corte,
+        'actividades': pronosticar_proyecto(proyecto, fecha_corte),
+    })
+
 def registrar_avance(request):
     proyecto = Proyecto.objects.first()
     if not proyecto:
@@ -207,6 +440,85 @@ def registrar_avance(request):
     }
     return render(request, 'actividades/registrar_avance.html', contexto)
 
+def registrar_avance_cuadricula(request):
+    """
+    Captura en cuadrícula: actividades (filas) × zonas (columnas) de un día y
+    una empresa, guardadas de una vez. Las celdas ya capturadas aparecen
+    llenas, así la misma pantalla sirve para corregir el día.
+    """
+    proyecto = Proyecto.objects.first()
+    if not proyecto:
+        messages.error(request, 'Error: No hay ningún proyecto registrado en el sistema.')
+        return redirect('actividades:pagina_principal')
+
+    datos = request.POST if request.method == 'POST' else request.GET
+    if 'fecha' not in datos:
+        datos = {'fecha': date.today(), 'empresa': get_default_empresa_pk()}
+    encabezado = CapturaCuadriculaForm(datos)
+    if encabezado.is_valid():
+        fecha = encabezado.cleaned_data['fecha']
+        empresa = encabezado.cleaned_data['empresa']
+        partida = encabezado.cleaned_data['partida']
+    else:
+        fecha, empresa, partida = None, None, None
+
+    actividades_qs = Actividad.objects.filter(proyecto=proyecto, es_hoja=True)
+    if partida:
+        actividades_qs = actividades_qs.filter(partida=partida)
+    actividades = dict(sorted(actividades_qs.nombres_completos().items(), key=lambda item: item[1]))
+    zonas = dict(AreaDeTrabajo.objects.order_by('nombre').values_list('id', 'nombre'))
+
+    errores = []
+    if request.method == 'POST' and fecha:
+        try:
+            cantidades = leer_cuadricula(request.POST, actividades, zonas)
+        except ValidationError as e:
+            errores = e.messages
+        else:
+            if not cantidades:
+                errores = ['Captura al menos una cantidad.']
+            else:
+                guardadas = guardar_cuadricula(proyecto, fecha, empresa, cantidades)
+                messages.success(request, f'¡Avance guardado! {guardadas} celdas registradas para el {fecha:%d/%m/%Y}.')
+                parametros = {'fecha': fecha.isoformat(), 'empresa': empresa.pk, 'partida': partida.pk if partida else ''}
+                return redirect(f"{reverse('actividades:registrar_avance_cuadricula')}?{urlencode(parametros)}")
+
+    # Valores de las celdas: lo recién enviado (si hubo errores) o lo ya guardado ese día
+    if errores:
+        valores = request.POST
+    else:
+        valores = {}
+        if fecha:
+            for actividad_id, zona_id, cantidad in AvancePorZona.objects.filter(
+                avance_diario__actividad_id__in=actividades, avance_diario__fecha_reporte=fecha, avance_diario__empresa=empresa
+            ).values_list('avance_diario__actividad_id', 'zona_id', 'cantidad'):
+                valores[nombre_celda(actividad_id, zona_id)] = cantidad
+    con_meta = set(MetaPorZona.objects.filter(actividad_id__in=actividades).values_list('actividad_id', 'zona_id'))
+
+    filas = [
+        {
+            'nombre': nombre,
+            'celdas': [
+                {
+                    'nombre': nombre_celda(actividad_id, zona_id),
+                    'valor': valores.get(nombre_celda(actividad_id, zona_id), ''),
+                    'con_meta': (actividad_id, zona_id) in con_meta,
+                }
+                for zona_id in zonas
+            ],
+        }
+        for actividad_id, nombre in actividades.items()
+    ]
+    contexto = {
+        'proyecto': proyecto,
+        'encabezado': encabezado,
+        'fecha': fecha,
+        'zonas': zonas.values(),
+        'filas': filas,
+        'errores': errores,
+    }
+    return render(request, 'actividades/registrar_avance_cuadricula.html', contexto)
+
 @login_required
 @user_passes_test(es_staff)
 def editar_avance(request, pk):
@@ -263,13 +575,50 @@ def borrar_avance(request, pk):
 # ACTIVIDADES (Vistas Basadas en Clases - CRUD)
 # ==========================================
 
+# Por encima de este tamaño el WBS se muestra solo con sus raíces y se expande bajo demanda
+WBS_NODOS_CARGA_COMPLETA = 1000
+
+def _nodos_wbs(**filtros):
+    """ Nodos del WBS con sus totales materializados y cuántos hijos directos tienen (1 consulta). """
+    return list(
+        Actividad.objects.filter(**filtros).annotate(num_hijos=Count('sub_actividades')).order_by('nombre', 'pk').values(
+            'id', 'nombre', 'unidad_medida', 'profundidad', 'meta_subarbol', 'es_hoja',
+            'fecha_inicio_subarbol', 'fecha_fin_subarbol', 'num_hijos',
+        )
+    )
+
 class ActividadListView(ListView):
     model = Actividad
     template_name = 'actividades/actividad_list.html'
     context_object_name = 'actividades'
-    
+
+    def get_proyecto(self):
+        if not hasattr(self, '_proyecto'):
+            proyecto_id = self.kwargs.get('proyecto_id')
+            self._proyecto = (
+                get_object_or_404(Proyecto, pk=proyecto_id) if proyecto_id else Proyecto.objects.first()
+            )
+        return self._proyecto
+
     def get_queryset(self):
-        return Actividad.objects.filter(padre__isnull=True).order_by('nombre')
+        # WBS del proyecto en 1 consulta (totales materializados), aplanado en
+        # preorden con su profundidad: la plantilla lo pinta sin includes recursivos
+        proyecto = self.get_proyecto()
+        self.carga_diferida = False
+        if proyecto is None:
+            return []
+        if Actividad.objects.filter(proyecto=proyecto).count() > WBS_NODOS_CARGA_COMPLETA:
+            # WBS muy grande: solo las raíces, los hijos se piden a api_wbs_hijos al expandir
+            self.carga_diferida = True
+            return _nodos_wbs(proyecto=proyecto, padre__isnull=True)
+        return list(ArbolWBS.cargar(proyecto.pk, con_metas=False).recorrer())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['proyecto'] = self.get_proyecto()
+        context['carga_diferida'] = self.carga_diferida
+        context['proyectos'] = Proyecto.objects.order_by('nombre')
+        return context
 
 class ActividadCreateView(CreateView):
     model = Actividad
@@ -309,8 +658,11 @@ class ActividadCreateView(CreateView):
         if padre_id:
             try:
                 initial['padre'] = Actividad.objects.get(pk=padre_id)
-            except Actividad.DoesNotExist:
+                initial['proyecto'] = initial['padre'].proyecto_id
+            except (Actividad.DoesNotExist, ValueError):
                 pass
+        elif self.request.GET.get('proyecto'):
+            initial['proyecto'] = self.request.GET.get('proyecto')
         return initial
 
 class ActividadUpdateView(UpdateView):
@@ -344,6 +696,36 @@ class ActividadUpdateView(UpdateView):
              return self.form_invalid(form)
         return super().form_valid(form)
 
+@login_required
+@user_passes_test(es_staff)
+def importar_wbs_view(request):
+    form = ImportarWBSForm(request.POST or None, request.FILES or None, initial={'proyecto': request.GET.get('proyecto')})
+    errores = []
+    if request.method == 'POST' and form.is_valid():
+        proyecto = form.cleaned_data['proyecto']
+        simular = form.cleaned_data['simular']
+        try:
+            filas = leer_csv(form.cleaned_data['archivo'].read())
+            creadas, metas = importar_wbs(proyecto, filas, simular=simular)
+        except UnicodeDecodeError:
+            errores = ['El archivo no está en UTF-8. Guárdalo como "CSV UTF-8" e inténtalo de nuevo.']
+        except ValidationError as e:
+            errores = e.messages
+        else:
+            if simular:
+                messages.info(request, f'Archivo válido: se crearían {creadas} actividades y {metas} metas por zona.')
+            else:
+                messages.success(request, f'Importación completada: {creadas} actividades y {metas} metas por zona.')
+                return redirect('actividades:actividad_list_proyecto', proyecto_id=proyecto.pk)
+
+    contexto = {
+        'form': form,
+        'errores': errores,
+        'columnas': COLUMNAS_IMPORTACION,
+        'separador': SEPARADOR_RUTA,
+    }
+    return render(request, 'actividades/importar_wbs.html', contexto)
+
 # ==========================================
 # REPORTES (MAQUINARIA, PERSONAL, CLIMA)
 # ==========================================
@@ -503,41 +885,33 @@ def registrar_avance_bim(request):
              messages.error(request, "Datos corruptos.")
              return redirect('actividades:registrar_avance_bim')
 
-        cant_ok = 0
         try:
-            with transaction.atomic():
-                elementos = ElementoConstructivo.objects.filter(pk__in=ids_list)
-                if not elementos.exists():
-                     raise ValidationError("Elementos no encontrados.")
-
-                # Verificar mismo tipo
-                primer_tipo = elementos.first().tipo_elemento
-                if elementos.exclude(tipo_elemento=primer_tipo).exists():
-                     raise ValidationError("Todos los elementos deben ser del mismo tipo.")
-
-                for elemento in elementos:
-                    hubo_cambio = False
-                    for p_id, f_str in zip(pasos_ids, fechas):
-                        if f_str:
-                            fecha_obj = date.fromisoformat(f_str)
-                            if fecha_obj > date.today():
-                                 raise ValidationError("No se permiten fechas futuras.")
-
-                            paso = PasoProcesoTipoElemento.objects.get(pk=p_id)
-                            AvanceProcesoElemento.objects.update_or_create(
-                                elemento=elemento, paso_proceso=paso,
-                                defaults={'fecha_finalizacion': fecha_obj}
-                            )
-                            hubo_cambio = True
-                    if hubo_cambio: cant_ok += 1
-            
-            if cant_ok > 0:
-                messages.success(request, f"Actualizados {cant_ok} elementos.")
-            else:
-                messages.warning(request, "Sin cambios.")
-                
-        except Exception as e:
-            messages.error(request, f"Error: {e}")
+            fechas_por_paso = {
+                int(p_id): date.fromisoformat(f_str) for p_id, f_str in zip(pasos_ids, fechas) if f_str
+            }
+        except ValueError:
+            messages.error(request, "Datos corruptos.")
+            return redirect('actividades:registrar_avance_bim')
+
+        try:
+            conteos = registrar_avances_lote(ids_list, fechas_por_paso)
+        except ValidationError as e:
+            messages.error(request, f"Error: {' '.join(e.messages)}")
+            return redirect('actividades:registrar_avance_bim')
+
+        insertados = sum(c['insertados'] for c in conteos.values())
+        actualizados = sum(c['actualizados'] for c in conteos.values())
+        if insertados or actualizados:
+            con_cambios = [(nombre, c) for nombre, c in conteos.items() if c['insertados'] or c['actualizados']]
+            messages.success(
+                request,
+                f"Actualizados {len(con_cambios)} elementos: {insertados} pasos nuevos y {actualizados} fechas corregidas."
+            )
+            messages.info(request, "; ".join(
+                f"{nombre}: {c['insertados']} nuevos, {c['actualizados']} actualizados" for nombre, c in con_cambios
+            ))
+        else:
+            messages.warning(request, "Sin cambios.")
 
         return redirect('actividades:registrar_avance_bim')
 
@@ -546,20 +920,104 @@ def registrar_avance_bim(request):
     context['form'] = form
     return render(request, 'actividades/registrar_avance_bim.html', context)
 
+class ElementoStatusCursorPagination(CursorPagination):
+    # El ID es único e indexado: cada página es un rango del índice, sin OFFSET
+    ordering = 'id'
+    page_size = 1000
+    page_size_query_param = 'page_size'
+    max_page_size = 5000
+
+# Tamaño de bloque del cursor de BD en el modo streaming
+ESTADO_BIM_CHUNK = 2000
+
 class ElementoStatusAPIView(ListAPIView):
-    # Restaurado del archivo original
-    serializer_class = ElementoBIM_GUID_Serializer
+    """
+    Estado de cada GUID para el Timeliner de Navisworks.
+
+    Por defecto se pagina con cursor (?cursor=..., ?page_size=...). Con
+    ?formato=ndjson se emite un objeto JSON por línea conforme se leen las
+    filas del cursor de la BD: la memoria no crece con el modelo y los
+    primeros datos llegan de inmediato.
+
+    Sincronización incremental: cada respuesta trae una 'marca' (también en
+    la cabecera X-Marca-Sincronizacion). Enviándola después como ?since=
+    solo se devuelven los GUIDs cuyo estado o fechas pudieron cambiar desde
+    entonces, más la lista 'eliminados' de GUIDs borrados (en NDJSON, líneas
+    {"id_navisworks": ..., "eliminado": true}). Al paginar se guarda la
+    marca de la primera página.
+
+    GET condicional: con If-None-Match / If-Modified-Since se responde 304
+    mientras no cambien los datos BIM (ver versiones.condicion_version).
+    """
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = ElementoStatusCursorPagination
 
     def get_queryset(self):
-        return ElementoBIM_GUID.objects.select_related(
-            'elemento_constructivo', 'elemento_constructivo__tipo_elemento'
-        ).annotate(
-            total_pasos=Count('elemento_constructivo__tipo_elemento__pasos_proceso', distinct=True),
-            pasos_completados=Count('elemento_constructivo__avances_proceso', distinct=True),
-            ultima_fecha=Max('elemento_constructivo__avances_proceso__fecha_finalizacion')
-        )
+        return guids_con_estado()
+
+    @method_decorator(condicion_version(CLAVE_BIM))
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        _, actualizado_en = request.version_datos
+        marca = marca_sincronizacion(actualizado_en).isoformat().replace('+00:00', 'Z')
+        queryset = self.get_queryset()
+        eliminados = []
+        since = request.query_params.get('since')
+        if since:
+            # Un '+' sin codificar en la URL llega como espacio
+            desde = parse_datetime(since.replace(' ', '+'))
+            if desde is None:
+                return Response(
+                    {'error': "Parámetro 'since' inválido: usa la 'marca' de la respuesta anterior."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            if timezone.is_naive(desde):
+                desde = timezone.make_aware(desde)
+            queryset = guids_modificados_desde(desde)
+            eliminados = list(guids_eliminados_desde(desde))
+
+        if request.query_params.get('formato') == 'ndjson':
+            filas = queryset.order_by('id').iterator(chunk_size=ESTADO_BIM_CHUNK)
+            lineas = [json.dumps({'id_navisworks': guid, 'eliminado': True}) + '\n' for guid in eliminados]
+            respuesta = StreamingHttpResponse(
+                chain(lineas, (json.dumps(fila_estado_bim(fila), cls=DjangoJSONEncoder) + '\n' for fila in filas)),
+                content_type='application/x-ndjson',
+            )
+        else:
+            pagina = self.paginate_queryset(queryset)
+            respuesta = self.get_paginated_response([fila_estado_bim(fila) for fila in pagina])
+            respuesta.data['marca'] = marca
+            if since:
+                respuesta.data['eliminados'] = eliminados
+        respuesta['X-Marca-Sincronizacion'] = marca
+        return respuesta
+
+class SincronizacionLoteAPIView(APIView):
+    """
+    Sincronización de la app de campo: recibe en una sola petición todos los
+    cambios que el teléfono acumuló sin conexión y devuelve el resultado de
+    cada uno (ver sincronizacion.sincronizar_lote).
+
+    POST {"operaciones": [{"clave": "<uuid>", "tipo": "...", "datos": {...}}, ...]}
+    """
+    authentication_classes = [TokenAuthentication, SessionAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = LoteSincronizacionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            resultados = sincronizar_lote(request.user, serializer.validated_data['operaciones'])
+        except IntegrityError:
+            # Otro envío del mismo lote se aplicó al mismo tiempo: al reintentar saldrán como 'repetida'
+            return Response(
+                {'error': 'El lote se está procesando en otra petición. Reintenta en unos segundos.'},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return Response({'resultados': resultados})
 
 @require_GET
 def api_generar_rango(request):
@@ -735,11 +1193,49 @@ def vista_cronograma_movil(request):
     })
 
 @require_GET
+def api_wbs_hijos(request, padre_id):
+    """ Hijos directos de una Actividad, con totales, bandera de hoja y número de hijos. """
+    return JsonResponse(_nodos_wbs(padre_id=padre_id), safe=False)
+
+@require_GET
+def api_wbs_raices(request, proyecto_id):
+    """ Categorías raíz del WBS de un proyecto (mismo formato que api_wbs_hijos). """
+    return JsonResponse(_nodos_wbs(proyecto_id=proyecto_id, padre__isnull=True), safe=False)
+
+# Máximo de sugerencias que devuelve el autocompletado de padres
+AUTOCOMPLETAR_LIMITE = 20
+
+@require_GET
+def api_buscar_wbs(request, proyecto_id):
+    """
+    Autocompletado del padre de una Actividad: las primeras coincidencias del
+    proyecto con su nombre completo. 'excluir' quita un nodo y su subárbol
+    (al editar, una actividad no puede colgar de sí misma ni de sus hijos).
+    """
+    actividades = Actividad.objects.filter(proyecto_id=proyecto_id)
+    excluir = _id_o_none(request.GET.get('excluir'))
+    if excluir:
+        nodo = Actividad.objects.filter(pk=excluir).only('pk', 'ruta').first()
+        if nodo:
+            actividades = actividades.exclude(pk=nodo.pk).exclude(ruta__startswith=nodo.ruta_hijos)
+    resultados = actividades.buscar(request.GET.get('q', '').strip(), AUTOCOMPLETAR_LIMITE)
+    return JsonResponse({'results': resultados})
+
+@require_GET
+def api_buscar_cronograma(request, proyecto_id):
+    """ Autocompletado del padre de una tarea del Cronograma (solo niveles 1 y 2, ver CronogramaForm). """
+    tareas = Cronograma.objects.filter(proyecto_id=proyecto_id, profundidad__lte=CRONOGRAMA_PROFUNDIDAD_MAXIMA_PADRE)
+    resultados = tareas.buscar(request.GET.get('q', '').strip(), AUTOCOMPLETAR_LIMITE)
+    return JsonResponse({'results': resultados})
+
+@require_GET
+@condicion_version(CLAVE_CRONOGRAMA)
 def api_hijos_cronograma(request, padre_id):
     hijos = Cronograma.objects.filter(padre_id=padre_id).values('id', 'nombre').order_by('id')
     return JsonResponse(list(hijos), safe=False)
 
 @require_GET
+@condicion_version(CLAVE_CRONOGRAMA, por_dia=True)
 def api_detalle_tarea(request, tarea_id):
     """
     Retorna detalles. Si se pasa 'zona_id', retorna fechas específicas.
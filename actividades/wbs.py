@@ -0,0 +1,265 @@
+# actividades/wbs.py
+
+from django.db.models import Sum, Min, Max, Count
+from .calendario import obtener_calendario
+from .valor_planeado import CurvaValorPlaneado
+
+
+class NodoWBS:
+    """
+    Nodo compacto del WBS en memoria. Expone los mismos nombres que el modelo
+    Actividad (pk, nombre, unidad_medida, cantidad_total_calculada...) para que
+    las plantillas puedan usarlo sin cambios de fondo.
+    """
+    __slots__ = (
+        'arbol', 'pk', 'nombre', 'padre_id', 'proyecto_id', 'partida_id', 'unidad_medida',
+        'fecha_inicio_programada', 'fecha_fin_programada', 'meta_subarbol', 'hijos', 'metas',
+        'profundidad', '_cantidad_total', '_hojas',
+    )
+
+    def __init__(self, arbol, datos):
+        self.arbol = arbol
+        self.pk = datos['id']
+        self.nombre = datos['nombre']
+        self.padre_id = datos['padre_id']
+        self.proyecto_id = datos['proyecto_id']
+        self.partida_id = datos['partida_id']
+        self.unidad_medida = datos['unidad_medida']
+        self.fecha_inicio_programada = datos['fecha_inicio_programada']
+        self.fecha_fin_programada = datos['fecha_fin_programada']
+        # Total materializado en BD; cantidad_total_calculada lo recalcula desde las metas
+        self.meta_subarbol = datos.get('meta_subarbol')
+        self.hijos = []
+        self.metas = []
+        self.profundidad = 0
+        self._cantidad_total = None
+        self._hojas = None
+
+    @property
+    def id(self):
+        return self.pk
+
+    @property
+    def es_hoja(self):
+        return not self.hijos
+
+    @property
+    def meta_total(self):
+        return sum((m['meta'] for m in self.metas), 0)
+
+    @property
+    def cantidad_total_calculada(self):
+        # Mismo criterio que Actividad.cantidad_total_calculada: la hoja aporta su
+        # meta y la categoría suma la de sus hijos (ignora metas propias).
+        if self._cantidad_total is None:
+            for nodo in reversed(list(self.recorrer())):
+                if nodo.hijos:
+                    nodo._cantidad_total = sum((h._cantidad_total for h in nodo.hijos), 0)
+                else:
+                    nodo._cantidad_total = nodo.meta_total
+        return self._cantidad_total
+
+    def recorrer(self):
+        """ Recorrido en preorden (iterativo) del subárbol, incluyendo este nodo. """
+        pila = [self]
+        while pila:
+            nodo = pila.pop()
+            yield nodo
+            pila.extend(reversed(nodo.hijos))
+
+    def hojas(self):
+        if self._hojas is None:
+            self._hojas = frozenset(n.pk for n in self.recorrer() if not n.hijos)
+        return self._hojas
+
+    def get_valor_planeado_a_fecha(self, fecha_corte):
+        return self.arbol.curva_valor_planeado.acumulado(fecha_corte, actividades=self.hojas())
+
+    def get_valor_planeado_en_rango(self, fecha_inicio_rango, fecha_fin_rango):
+        return self.arbol.curva_valor_planeado.en_rango(fecha_inicio_rango, fecha_fin_rango, actividades=self.hojas())
+
+    def __str__(self):
+        return self.nombre
+
+
+class ArbolWBS:
+    """
+    Jerarquía completa de Actividades de un proyecto cargada en memoria con un
+    número fijo de consultas (una para las actividades y otra para sus metas).
+    Evita las consultas por nodo de sub_actividades/metas_por_zona al calcular
+    totales, PV u hojas.
+    """
+
+    def __init__(self, actividades, metas, proyecto_id=None):
+        self.proyecto_id = proyecto_id
+        self.nodos = {datos['id']: NodoWBS(self, datos) for datos in actividades}
+        self.raices = []
+        self._curva = None
+
+        for nodo in self.nodos.values():
+            padre = self.nodos.get(nodo.padre_id)
+            if padre is None:
+                self.raices.append(nodo)
+            else:
+                padre.hijos.append(nodo)
+
+        for meta in metas:
+            nodo = self.nodos.get(meta['actividad_id'])
+            if nodo is not None:
+                nodo.metas.append(meta)
+
+        # El preorden visita al padre antes que a sus hijos
+        for nodo in self.recorrer():
+            for hijo in nodo.hijos:
+                hijo.profundidad = nodo.profundidad + 1
+
+    @classmethod
+    def cargar(cls, proyecto_id=None, con_metas=True):
+        """
+        Carga el WBS de un proyecto (o de todos si no se indica) en 2 consultas.
+        Con con_metas=False basta una: los totales se leen de las columnas materializadas.
+        """
+        # Importación local para evitar el ciclo models -> wbs -> models
+        from .models import Actividad, MetaPorZona
+
+        actividades = Actividad.objects.order_by('nombre', 'pk')
+        if proyecto_id is not None:
+            actividades = actividades.filter(proyecto_id=proyecto_id)
+        actividades = actividades.values(
+            'id', 'nombre', 'padre_id', 'proyecto_id', 'partida_id', 'unidad_medida',
+            'fecha_inicio_programada', 'fecha_fin_programada', 'meta_subarbol',
+        )
+
+        metas = []
+        if con_metas:
+            metas = MetaPorZona.objects.all()
+            if proyecto_id is not None:
+                metas = metas.filter(actividad__proyecto_id=proyecto_id)
+            metas = metas.values(
+                'actividad_id', 'zona_id', 'meta', 'fecha_inicio_programada', 'fecha_fin_programada'
+            )
+        return cls(list(actividades), list(metas), proyecto_id=proyecto_id)
+
+    def nodo(self, pk):
+        return self.nodos[pk]
+
+    def recorrer(self):
+        """ Todos los nodos en preorden, raíz por raíz. """
+        for raiz in self.raices:
+            yield from raiz.recorrer()
+
+    def hojas(self):
+        return [nodo for nodo in self.nodos.values() if not nodo.hijos]
+
+    @property
+    def curva_valor_planeado(self):
+        """ Curva PV construida con las metas ya cargadas (sin consultas extra). """
+        if self._curva is None:
+            filas = [
+                {
+                    'actividad_id': nodo.pk,
+                    'zona_id': meta['zona_id'],
+                    'partida_id': nodo.partida_id,
+                    'meta': meta['meta'],
+                    'inicio': meta['fecha_inicio_programada'] or nodo.fecha_inicio_programada,
+                    'fin': meta['fecha_fin_programada'] or nodo.fecha_fin_programada,
+                }
+                for nodo in self.hojas() for meta in nodo.metas
+            ]
+            self._curva = CurvaValorPlaneado(filas, obtener_calendario(self.proyecto_id))
+        return self._curva
+
+    def calcular_rollups(self):
+        """
+        Totales de cada nodo a partir de las metas cargadas, con los mismos
+        criterios que actualizar_rollups(). Devuelve {pk: dict de campos}.
+        """
+        rollups = {}
+        for raiz in self.raices:
+            for nodo in reversed(list(raiz.recorrer())):
+                meta_propia = nodo.meta_total
+                fechas_inicio = [nodo.fecha_inicio_programada] + [m['fecha_inicio_programada'] for m in nodo.metas]
+                fechas_fin = [nodo.fecha_fin_programada] + [m['fecha_fin_programada'] for m in nodo.metas]
+                for hijo in nodo.hijos:
+                    fechas_inicio.append(rollups[hijo.pk]['fecha_inicio_subarbol'])
+                    fechas_fin.append(rollups[hijo.pk]['fecha_fin_subarbol'])
+                rollups[nodo.pk] = {
+                    'meta_propia': meta_propia,
+                    'meta_subarbol': (
+                        sum((rollups[h.pk]['meta_subarbol'] for h in nodo.hijos), 0) if nodo.hijos else meta_propia
+                    ),
+                    'es_hoja': not nodo.hijos,
+                    'fecha_inicio_subarbol': _minimo(fechas_inicio),
+                    'fecha_fin_subarbol': _maximo(fechas_fin),
+                }
+        return rollups
+
+
+CAMPOS_ROLLUP = ('meta_propia', 'meta_subarbol', 'es_hoja', 'fecha_inicio_subarbol', 'fecha_fin_subarbol')
+
+
+def _minimo(fechas):
+    fechas = [f for f in fechas if f]
+    return min(fechas) if fechas else None
+
+
+def _maximo(fechas):
+    fechas = [f for f in fechas if f]
+    return max(fechas) if fechas else None
+
+
+def actualizar_rollups(actividad_id):
+    """
+    Recalcula los totales materializados de una actividad y sube por su cadena
+    de ancestros. Se detiene en cuanto un nivel no cambia, porque entonces
+    ninguno de sus ancestros puede cambiar tampoco.
+    """
+    from .models import Actividad, MetaPorZona
+
+    while actividad_id is not None:
+        actual = Actividad.objects.filter(pk=actividad_id).values(
+            'padre_id', 'fecha_inicio_programada', 'fecha_fin_programada', *CAMPOS_ROLLUP
+        ).first()
+        if actual is None:
+            return
+
+        propias = MetaPorZona.objects.filter(actividad_id=actividad_id).aggregate(
+            total=Sum('meta'), inicio=Min('fecha_inicio_programada'), fin=Max('fecha_fin_programada')
+        )
+        hijos = Actividad.objects.filter(padre_id=actividad_id).aggregate(
+            cantidad=Count('id'), total=Sum('meta_subarbol'),
+            inicio=Min('fecha_inicio_subarbol'), fin=Max('fecha_fin_subarbol')
+        )
+
+        es_hoja = hijos['cantidad'] == 0
+        meta_propia = propias['total'] or 0
+        nuevos = {
+            'meta_propia': meta_propia,
+            'meta_subarbol': meta_propia if es_hoja else (hijos['total'] or 0),
+            'es_hoja': es_hoja,
+            'fecha_inicio_subarbol': _minimo([actual['fecha_inicio_programada'], propias['inicio'], hijos['inicio']]),
+            'fecha_fin_subarbol': _maximo([actual['fecha_fin_programada'], propias['fin'], hijos['fin']]),
+        }
+        if all(nuevos[campo] == actual[campo] for campo in CAMPOS_ROLLUP):
+            return
+
+        Actividad.objects.filter(pk=actividad_id).update(**nuevos)
+        actividad_id = actual['padre_id']
+
+
+def recalcular_rollups(proyecto_id=None):
+    """ Reconstruye todos los totales materializados (de un proyecto o de todos). Devuelve cuántos cambió. """
+    from .models import Actividad
+
+    arbol = ArbolWBS.cargar(proyecto_id)
+    rollups = arbol.calcular_rollups()
+    actuales = Actividad.objects.filter(pk__in=rollups.keys()).values('pk', *CAMPOS_ROLLUP)
+
+    por_actualizar = []
+    for actual in actuales:
+        nuevos = rollups[actual['pk']]
+        if any(nuevos[campo] != actual[campo] for campo in CAMPOS_ROLLUP):
+            por_actualizar.append(Actividad(pk=actual['pk'], **nuevos))
+
+    Actividad.objects.bulk_update(por_actualizar, CAMPOS_ROLLUP, batch_size=500)
+    return len(por_actualizar)